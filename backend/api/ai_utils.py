@@ -1,8 +1,18 @@
 # AI utilities for Smart Note Organizer
 import os
 import json
+import asyncio
+import time
+import random
+import hashlib
+import queue
+import threading
+import weakref
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from .disk_cache import DiskCache
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,10 +30,168 @@ HEADERS = {
     "X-Title": "Smart Note Organizer",
 }
 
+# Bump these when a prompt changes so stale cached answers are not reused
+SUMMARY_PROMPT_VERSION = 1
+TAG_PROMPT_VERSION = 1
+
+# Persistent cache of LLM summaries and tags
+LLM_CACHE = DiskCache(
+    os.getenv(
+        "LLM_CACHE_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llm_cache.sqlite3"),
+    ),
+    ttl=int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60)),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000)),
+)
+
+def llm_cache_key(kind, text, model, prompt_version):
+    """Cache key for an LLM result: what was asked, of which model, with which prompt"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{kind}:v{prompt_version}:{model}:{digest}"
+
+# OpenRouter endpoint and HTTP client settings
+OPENROUTER_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 60))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 8))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 20))
+# Upstream connections one ASGI worker may hold open at once
+LLM_ASYNC_MAX_CONNECTIONS = int(os.getenv("LLM_ASYNC_MAX_CONNECTIONS", 500))
+
+# Upstream responses worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream for a while.
+
+    After `failure_threshold` consecutive failed calls the circuit opens and
+    calls are refused for `reset_timeout` seconds. After that one trial call
+    is let through; success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: re-arm the timer so only this caller gets through
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+LLM_CIRCUIT = CircuitBreaker(
+    failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURES", 5)),
+    reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET", 30)),
+)
+
+def _create_session():
+    """Shared keep-alive session so LLM calls reuse pooled connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LLM_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+HTTP_SESSION = _create_session()
+
+# Thread pool for fanning out independent LLM calls made by one request,
+# shared by the whole process. Requests keep one call in their own thread and
+# send only the others here, so with one pool thread per server thread
+# (WEB_THREADS) no request waits for another's calls; a smaller pool makes
+# the fan-out wait under load, though never for longer than doing the calls
+# one after another.
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", os.getenv("WEB_THREADS", 10)))
+LLM_EXECUTOR = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+
+def run_concurrently(*calls):
+    """
+    Run independent LLM tasks at the same time and gather their results.
+    The first runs in the calling thread, the rest in LLM_EXECUTOR.
+    
+    Args:
+        *calls: (function, arg, ...) tuples
+        
+    Returns:
+        list: Each function's return value, in the order the calls were given
+    """
+    if not calls:
+        return []
+    (function, *args), *rest = calls
+    futures = [LLM_EXECUTOR.submit(other, *other_args) for other, *other_args in rest]
+    return [function(*args)] + [future.result() for future in futures]
+
+def _retry_delay(attempt, response=None):
+    """Jittered exponential backoff, honouring a numeric Retry-After header"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+def _build_payload(prompt, system_prompt=None, stream=False):
+    """JSON body of an OpenRouter chat completion request"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    
+    messages.append({"role": "user", "content": prompt})
+    body = {
+        "model": AI_MODEL,
+        "messages": messages
+    }
+    if stream:
+        body["stream"] = True
+    return json.dumps(body)
+
+# Marks the end of a streamed completion
+STREAM_DONE = object()
+
+class StreamInterrupted(Exception):
+    """A streamed completion broke off after part of it was sent on, so it can neither be retried nor used"""
+
+def _stream_line_content(line):
+    """Text carried by one line of a streamed completion: None if there is none, STREAM_DONE at the end"""
+    # Skip keep-alive comments and blank separator lines
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return STREAM_DONE
+    return json.loads(data)["choices"][0].get("delta", {}).get("content") or None
+
 def query_llama(prompt, system_prompt=None):
     """
     Query the LLaMA model via OpenRouter API with the given prompt.
     
+    Retries timeouts, connection errors and 429/5xx responses with backoff.
+    While the circuit breaker is open the call is skipped so callers go
+    straight to their rule-based fallback.
+    
     Args:
         prompt (str): The user prompt to send to the model
         system_prompt (str, optional): System prompt to guide the model's behavior
@@ -31,34 +199,271 @@ def query_llama(prompt, system_prompt=None):
     Returns:
         str or None: The model's response, or None if the request failed
     """
+    if not LLM_CIRCUIT.allow_request():
+        print("[WARN] OpenRouter circuit is open, skipping API call.")
+        return None
+    
     print(f"[DEBUG] Connecting to {AI_MODEL} via OpenRouter...")
+    payload = _build_payload(prompt, system_prompt)
     
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response = None
+        try:
+            response = HTTP_SESSION.post(
+                url=OPENROUTER_URL,
+                headers=HEADERS,
+                data=payload,
+                timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+            )
+            
+            if response.status_code == 200:
+                print("[DEBUG] Response received successfully.")
+                result = response.json()
+                LLM_CIRCUIT.record_success()
+                return result["choices"][0]["message"]["content"]
+            
+            print(f"[ERROR] Failed with status code {response.status_code}: {response.text}")
+            if response.status_code not in RETRY_STATUS_CODES:
+                # Client errors will not go away by retrying and say nothing about upstream health
+                return None
+        except requests.RequestException as e:
+            print(f"[ERROR] Request to OpenRouter failed: {str(e)}")
+        except Exception as e:
+            print(f"[ERROR] Exception during API call: {str(e)}")
+            return None
+        
+        if attempt < LLM_MAX_RETRIES:
+            time.sleep(_retry_delay(attempt, response))
     
-    messages.append({"role": "user", "content": prompt})
+    LLM_CIRCUIT.record_failure()
+    return None
+
+def stream_llama(prompt, system_prompt=None):
+    """
+    Query the LLaMA model like query_llama, but yield the response text piece
+    by piece as OpenRouter streams it back.
     
-    try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=HEADERS,
-            data=json.dumps({
-                "model": AI_MODEL,
-                "messages": messages
-            })
-        )
+    Failures before the first piece arrives are retried; if the request fails
+    or the circuit breaker is open nothing is yielded.
+    
+    Raises:
+        StreamInterrupted: If the stream breaks off after the first piece,
+            before OpenRouter's final [DONE]
+    
+    Yields:
+        str: The next piece of the model's response
+    """
+    if not LLM_CIRCUIT.allow_request():
+        print("[WARN] OpenRouter circuit is open, skipping API call.")
+        return
+    
+    print(f"[DEBUG] Streaming from {AI_MODEL} via OpenRouter...")
+    payload = _build_payload(prompt, system_prompt, stream=True)
+    
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response = None
+        started = False
+        try:
+            response = HTTP_SESSION.post(
+                url=OPENROUTER_URL,
+                headers=HEADERS,
+                data=payload,
+                timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT),
+                stream=True
+            )
+            
+            if response.status_code == 200:
+                LLM_CIRCUIT.record_success()
+                with response:
+                    for line in response.iter_lines():
+                        content = _stream_line_content(line.decode("utf-8"))
+                        if content is STREAM_DONE:
+                            return
+                        if content:
+                            started = True
+                            yield content
+                # The connection closed without the final [DONE]
+                if started:
+                    raise StreamInterrupted("The model's response ended before it was complete")
+                print("[ERROR] OpenRouter stream ended before any content")
+            else:
+                print(f"[ERROR] Failed with status code {response.status_code}: {response.text}")
+                response.close()
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return
+        except StreamInterrupted:
+            raise
+        except requests.RequestException as e:
+            print(f"[ERROR] Streaming request to OpenRouter failed: {str(e)}")
+            if started:
+                # Part of the answer has already been sent on, so it cannot be retried
+                raise StreamInterrupted("The model's response ended before it was complete") from e
+        except Exception as e:
+            print(f"[ERROR] Exception during streaming API call: {str(e)}")
+            return
         
-        if response.status_code == 200:
-            print("[DEBUG] Response received successfully.")
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            print(f"[ERROR] Failed with status code {response.status_code}: {response.text}")
-            return None
-    except Exception as e:
-        print(f"[ERROR] Exception during API call: {str(e)}")
+        if attempt < LLM_MAX_RETRIES:
+            time.sleep(_retry_delay(attempt, response))
+    
+    LLM_CIRCUIT.record_failure()
+
+# Async OpenRouter client, used by the async AI views when served over ASGI
+_async_session = None
+
+def get_async_session():
+    """
+    Keep-alive aiohttp session shared by the calls made on the running event
+    loop, created on first use (aiohttp is only needed under ASGI).
+    """
+    global _async_session
+    import aiohttp
+    
+    loop = asyncio.get_running_loop()
+    if _async_session is None or _async_session[0] is not loop:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=LLM_ASYNC_MAX_CONNECTIONS),
+            timeout=aiohttp.ClientTimeout(connect=LLM_CONNECT_TIMEOUT, sock_read=LLM_READ_TIMEOUT),
+        )
+        _async_session = (loop, session)
+    return _async_session[1]
+
+async def aquery_llama(prompt, system_prompt=None):
+    """
+    Async version of query_llama: the same retries, backoff and circuit
+    breaker, but waiting for OpenRouter suspends the coroutine instead of
+    blocking a thread.
+    
+    Returns:
+        str or None: The model's response, or None if the request failed
+    """
+    import aiohttp
+    
+    if not LLM_CIRCUIT.allow_request():
+        print("[WARN] OpenRouter circuit is open, skipping API call.")
         return None
+    
+    print(f"[DEBUG] Connecting to {AI_MODEL} via OpenRouter...")
+    payload = _build_payload(prompt, system_prompt)
+    session = get_async_session()
+    
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response = None
+        try:
+            async with session.post(OPENROUTER_URL, headers=HEADERS, data=payload) as response:
+                if response.status == 200:
+                    print("[DEBUG] Response received successfully.")
+                    result = await response.json(content_type=None)
+                    LLM_CIRCUIT.record_success()
+                    return result["choices"][0]["message"]["content"]
+                
+                print(f"[ERROR] Failed with status code {response.status}: {await response.text()}")
+                if response.status not in RETRY_STATUS_CODES:
+                    return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[ERROR] Request to OpenRouter failed: {str(e) or type(e).__name__}")
+        except Exception as e:
+            print(f"[ERROR] Exception during API call: {str(e)}")
+            return None
+        
+        if attempt < LLM_MAX_RETRIES:
+            await asyncio.sleep(_retry_delay(attempt, response))
+    
+    LLM_CIRCUIT.record_failure()
+    return None
+
+async def astream_llama(prompt, system_prompt=None):
+    """
+    Async version of stream_llama.
+    
+    Yields:
+        str: The next piece of the model's response
+    """
+    import aiohttp
+    
+    if not LLM_CIRCUIT.allow_request():
+        print("[WARN] OpenRouter circuit is open, skipping API call.")
+        return
+    
+    print(f"[DEBUG] Streaming from {AI_MODEL} via OpenRouter...")
+    payload = _build_payload(prompt, system_prompt, stream=True)
+    session = get_async_session()
+    
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response = None
+        started = False
+        try:
+            async with session.post(OPENROUTER_URL, headers=HEADERS, data=payload) as response:
+                if response.status == 200:
+                    LLM_CIRCUIT.record_success()
+                    async for line in response.content:
+                        content = _stream_line_content(line.decode("utf-8").strip())
+                        if content is STREAM_DONE:
+                            return
+                        if content:
+                            started = True
+                            yield content
+                    # The connection closed without the final [DONE]
+                    if started:
+                        raise StreamInterrupted("The model's response ended before it was complete")
+                    print("[ERROR] OpenRouter stream ended before any content")
+                else:
+                    print(f"[ERROR] Failed with status code {response.status}: {await response.text()}")
+                    if response.status not in RETRY_STATUS_CODES:
+                        return
+        except StreamInterrupted:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[ERROR] Streaming request to OpenRouter failed: {str(e) or type(e).__name__}")
+            if started:
+                # Part of the answer has already been sent on, so it cannot be retried
+                raise StreamInterrupted("The model's response ended before it was complete") from e
+        except Exception as e:
+            print(f"[ERROR] Exception during streaming API call: {str(e)}")
+            return
+        
+        if attempt < LLM_MAX_RETRIES:
+            await asyncio.sleep(_retry_delay(attempt, response))
+    
+    LLM_CIRCUIT.record_failure()
+
+# Prompts for summaries and tags
+SUMMARY_SYSTEM_PROMPT = """You are an expert summarizer. Create a concise summary of the provided text that captures the key points and main ideas. Keep the summary under 300 words."""
+
+TAG_SYSTEM_PROMPT = """You are an expert at extracting relevant tags from content. 
+        Generate 5-8 specific, focused tags that accurately represent the key concepts in the text.
+        Your response should be ONLY a JSON array of strings, nothing else.
+        Example: ["machine learning", "neural networks", "data science", "python", "tensorflow"]"""
+
+def summary_prompt(text):
+    return f"Please summarize the following text:\n\n{text[:4000]}"
+
+def tag_prompt(text):
+    return f"Extract tags from this text:\n\n{text[:3000]}"
+
+def cached_summary(text, model):
+    """The summary of text if it needs no model call (too short, or cached), else None"""
+    # Check if text is too short
+    if len(text) < 100:
+        return {
+            "summary": text,
+            "model_used": "direct-text" # Text is too short to summarize
+        }
+    
+    # Reuse a previous summary of the same text
+    return LLM_CACHE.get(llm_cache_key("summary", text, model, SUMMARY_PROMPT_VERSION))
+
+def finish_summary(text, model, summary):
+    """Cache and return the model's summary, or fall back to the rule-based one if there is none"""
+    if summary:
+        result = {
+            "summary": summary,
+            "model_used": model
+        }
+        LLM_CACHE.set(llm_cache_key("summary", text, model, SUMMARY_PROMPT_VERSION), result)
+        return result
+    
+    # If API call fails, fall back to rule-based approach
+    return fallback_summarize(text)
 
 def summarize_text(text, ai_model=None):
     """
@@ -69,33 +474,33 @@ def summarize_text(text, ai_model=None):
     model = ai_model or AI_MODEL
     
     try:
-        # Check if text is too short
-        if len(text) < 100:
-            return {
-                "summary": text,
-                "model_used": "direct-text" # Text is too short to summarize
-            }
+        cached = cached_summary(text, model)
+        if cached:
+            return cached
         
         # Call LLaMA to generate summary
-        system_prompt = """You are an expert summarizer. Create a concise summary of the provided text that captures the key points and main ideas. Keep the summary under 300 words."""
-        
-        user_prompt = f"Please summarize the following text:\n\n{text[:4000]}"
-        
-        summary = query_llama(user_prompt, system_prompt)
-        
-        if summary:
-            return {
-                "summary": summary,
-                "model_used": model
-            }
-        
-        # If API call fails, fall back to rule-based approach
-        return fallback_summarize(text)
+        return finish_summary(text, model, query_llama(summary_prompt(text), SUMMARY_SYSTEM_PROMPT))
     
     except Exception as e:
         print(f"Error in summarize_text: {str(e)}")
         return fallback_summarize(text)
 
+async def asummarize_text(text, ai_model=None):
+    """Async version of summarize_text"""
+    model = ai_model or AI_MODEL
+    
+    try:
+        # The cache is a blocking SQLite file, so it is read and written off the event loop
+        cached = await asyncio.to_thread(cached_summary, text, model)
+        if cached:
+            return cached
+        response = await aquery_llama(summary_prompt(text), SUMMARY_SYSTEM_PROMPT)
+        return await asyncio.to_thread(finish_summary, text, model, response)
+    
+    except Exception as e:
+        print(f"Error in asummarize_text: {str(e)}")
+        return fallback_summarize(text)
+
 def fallback_summarize(text):
     """Fallback rule-based summary when API call fails"""
     try:
@@ -141,6 +546,24 @@ def fallback_summarize(text):
             "model_used": "fallback"
         }
 
+def cached_tags(text, model):
+    """Previous tags for the same text, or None"""
+    return LLM_CACHE.get(llm_cache_key("tags", text, model, TAG_PROMPT_VERSION))
+
+def finish_tags(text, model, tags_response):
+    """Cache and return the tags in the model's response, or fall back to rule-based tags"""
+    tags = parse_tags(tags_response)
+    if tags:
+        result = {
+            "tags": tags,
+            "model_used": model
+        }
+        LLM_CACHE.set(llm_cache_key("tags", text, model, TAG_PROMPT_VERSION), result)
+        return result
+    
+    # If API call fails or parsing fails, fall back to rule-based approach
+    return fallback_tag(text)
+
 def tag_text(text, ai_model=None):
     """
     Extract tags from the given text using LLaMA 3.3 70B.
@@ -150,48 +573,133 @@ def tag_text(text, ai_model=None):
     model = ai_model or AI_MODEL
     
     try:
-        # Call LLaMA to generate tags
-        system_prompt = """You are an expert at extracting relevant tags from content. 
-        Generate 5-8 specific, focused tags that accurately represent the key concepts in the text.
-        Your response should be ONLY a JSON array of strings, nothing else.
-        Example: ["machine learning", "neural networks", "data science", "python", "tensorflow"]"""
-        
-        user_prompt = f"Extract tags from this text:\n\n{text[:3000]}"
-        
-        tags_response = query_llama(user_prompt, system_prompt)
+        cached = cached_tags(text, model)
+        if cached:
+            return cached
         
-        if tags_response:
-            try:
-                # Try to parse the response as JSON
-                if tags_response.strip().startswith('[') and tags_response.strip().endswith(']'):
-                    tags = json.loads(tags_response)
-                    if isinstance(tags, list) and len(tags) > 0:
-                        return {
-                            "tags": tags,
-                            "model_used": model
-                        }
-                else:
-                    # Try to extract array from response
-                    json_match = tags_response.strip().find('[')
-                    json_end = tags_response.strip().rfind(']')
-                    if json_match >= 0 and json_end > json_match:
-                        json_str = tags_response[json_match:json_end+1]
-                        tags = json.loads(json_str)
-                        if isinstance(tags, list) and len(tags) > 0:
-                            return {
-                                "tags": tags,
-                                "model_used": model
-                            }
-            except Exception as e:
-                print(f"Error parsing tags response: {str(e)}")
-        
-        # If API call fails or parsing fails, fall back to rule-based approach
-        return fallback_tag(text)
+        # Call LLaMA to generate tags
+        return finish_tags(text, model, query_llama(tag_prompt(text), TAG_SYSTEM_PROMPT))
     
     except Exception as e:
         print(f"Error in tag_text: {str(e)}")
         return fallback_tag(text)
 
+async def atag_text(text, ai_model=None):
+    """Async version of tag_text"""
+    model = ai_model or AI_MODEL
+    
+    try:
+        cached = await asyncio.to_thread(cached_tags, text, model)
+        if cached:
+            return cached
+        response = await aquery_llama(tag_prompt(text), TAG_SYSTEM_PROMPT)
+        return await asyncio.to_thread(finish_tags, text, model, response)
+    
+    except Exception as e:
+        print(f"Error in atag_text: {str(e)}")
+        return fallback_tag(text)
+
+def parse_tags(tags_response):
+    """Pull the JSON array of tags out of a model response; returns None if there is none"""
+    if not tags_response:
+        return None
+    try:
+        # Try to parse the response as JSON, or else the array inside it
+        tags_response = tags_response.strip()
+        json_match = tags_response.find('[')
+        json_end = tags_response.rfind(']')
+        if json_match >= 0 and json_end > json_match:
+            tags = json.loads(tags_response[json_match:json_end+1])
+            if isinstance(tags, list) and len(tags) > 0:
+                return tags
+    except Exception as e:
+        print(f"Error parsing tags response: {str(e)}")
+    return None
+
+def stream_summary(text, ai_model=None):
+    """
+    Summarize text like summarize_text while streaming the summary as it is generated.
+    
+    Yields:
+        tuple: ("token", str) for each piece of the summary, then
+        ("done", dict) with the same result summarize_text returns
+    
+    Raises:
+        StreamInterrupted: If the model's stream broke off; the partial
+            summary is not cached
+    """
+    model = ai_model or AI_MODEL
+    
+    cached = cached_summary(text, model)
+    if cached:
+        if cached["model_used"] != "direct-text":
+            yield "token", cached["summary"]
+        yield "done", cached
+        return
+    
+    parts = []
+    for token in stream_llama(summary_prompt(text), SUMMARY_SYSTEM_PROMPT):
+        parts.append(token)
+        yield "token", token
+    
+    yield "done", finish_summary(text, model, "".join(parts))
+
+async def astream_summary(text, ai_model=None):
+    """Async version of stream_summary"""
+    model = ai_model or AI_MODEL
+    
+    cached = await asyncio.to_thread(cached_summary, text, model)
+    if cached:
+        if cached["model_used"] != "direct-text":
+            yield "token", cached["summary"]
+        yield "done", cached
+        return
+    
+    parts = []
+    async for token in astream_llama(summary_prompt(text), SUMMARY_SYSTEM_PROMPT):
+        parts.append(token)
+        yield "token", token
+    
+    yield "done", await asyncio.to_thread(finish_summary, text, model, "".join(parts))
+
+def stream_tags(text, ai_model=None):
+    """
+    Extract tags like tag_text while streaming the raw model output.
+    
+    Yields:
+        tuple: ("token", str) for each piece of the response, then
+        ("done", dict) with the same result tag_text returns
+    """
+    model = ai_model or AI_MODEL
+    
+    cached = cached_tags(text, model)
+    if cached:
+        yield "done", cached
+        return
+    
+    parts = []
+    for token in stream_llama(tag_prompt(text), TAG_SYSTEM_PROMPT):
+        parts.append(token)
+        yield "token", token
+    
+    yield "done", finish_tags(text, model, "".join(parts))
+
+async def astream_tags(text, ai_model=None):
+    """Async version of stream_tags"""
+    model = ai_model or AI_MODEL
+    
+    cached = await asyncio.to_thread(cached_tags, text, model)
+    if cached:
+        yield "done", cached
+        return
+    
+    parts = []
+    async for token in astream_llama(tag_prompt(text), TAG_SYSTEM_PROMPT):
+        parts.append(token)
+        yield "token", token
+    
+    yield "done", await asyncio.to_thread(finish_tags, text, model, "".join(parts))
+
 def fallback_tag(text):
     """Fallback rule-based tagging when API call fails"""
     # Basic word frequency-based tagging
@@ -240,10 +748,326 @@ def fallback_tag(text):
         "model_used": "rule-based-tags"
     }
 
-# Extract text from PDF (stub)
-def extract_text_from_pdf(file):
-    # This should use PyPDF2 or similar in a real app
-    return "PDF text extraction not implemented in stub."
+# Flashcard generation settings
+FLASHCARD_CHUNK_SIZE = 2000  # Roughly 500 tokens for English text
+# Chunks sent to the model at once by the whole process, across all requests
+FLASHCARD_CONCURRENCY = int(os.getenv("FLASHCARD_CONCURRENCY", 4))
+FLASHCARD_SLOTS = threading.BoundedSemaphore(FLASHCARD_CONCURRENCY)
+# The same limit for the async views, per event loop (one per ASGI worker process)
+_async_flashcard_slots = weakref.WeakKeyDictionary()
+
+def async_flashcard_slots():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_flashcard_slots:
+        _async_flashcard_slots[loop] = asyncio.BoundedSemaphore(FLASHCARD_CONCURRENCY)
+    return _async_flashcard_slots[loop]
+
+def split_into_chunks(text, chunk_size=FLASHCARD_CHUNK_SIZE):
+    """Split long text into chunks of whole paragraphs of about chunk_size characters"""
+    if len(text) <= chunk_size:
+        return [text]
+    
+    # Split by paragraphs first
+    paragraphs = [p for p in text.split('\n\n') if p.strip()]
+    
+    chunks = []
+    current_chunk = ""
+    for paragraph in paragraphs:
+        # If adding this paragraph exceeds our desired length, add current chunk to chunks and start a new one
+        if len(current_chunk) + len(paragraph) > chunk_size:
+            if current_chunk:
+                chunks.append(current_chunk)
+            current_chunk = paragraph
+        else:
+            current_chunk += "\n\n" + paragraph if current_chunk else paragraph
+    
+    # Add the last chunk if it contains text
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+def parse_flashcards(result_text, title=""):
+    """Parse "Q: ... A: ... ---" blocks from a model response into flashcard dicts"""
+    cards = []
+    for card_text in result_text.split("---"):
+        if "Q:" in card_text and "A:" in card_text:
+            parts = card_text.split("A:")
+            if len(parts) >= 2:  # Ensure we have both question and answer
+                question = parts[0].replace("Q:", "").strip()
+                answer = parts[1].strip()
+                
+                # Create flashcard if valid
+                if question and answer and len(question) > 5 and len(answer) > 5:
+                    cards.append({
+                        "question": question,
+                        "answer": answer,
+                        "tags": [title] if title else []
+                    })
+    return cards
+
+class FlashcardStreamParser:
+    """Collects a streamed model response and hands out each flashcard once the "---" after it has arrived"""
+    def __init__(self, title=""):
+        self.title = title
+        self.buffer = ""
+
+    def feed(self, piece):
+        """Add the next piece of the response; returns the flashcards it completed"""
+        self.buffer += piece
+        *complete, self.buffer = self.buffer.split("---")
+        return [card for card_text in complete for card in parse_flashcards(card_text, self.title)]
+
+    def close(self):
+        """The flashcards in the rest of a finished response, which need not end with a separator"""
+        cards, self.buffer = parse_flashcards(self.buffer, self.title), ""
+        return cards
+
+def flashcard_prompt(chunk_text):
+    """Prompt asking the model for flashcards about one chunk of text"""
+    return f"""Please create educational flashcards from the following text. Each flashcard should have a clear question on the front that tests a key concept, and a concise but complete answer on the back.
+
+Text:
+{chunk_text}
+
+Create 3-5 high-quality flashcards in this exact format:
+Q: [precise question about a key concept, term, or fact from the text]
+A: [clear, concise answer that fully addresses the question]
+---
+"""
+
+def generate_chunk_flashcards(chunk_text, title=""):
+    """Generate flashcards for one chunk of text with LLaMA; returns [] if the call fails"""
+    try:
+        response = query_llama(flashcard_prompt(chunk_text))
+        if response:
+            return parse_flashcards(response, title)
+    except Exception as e:
+        print(f"Error generating flashcards for chunk: {str(e)}")
+    return []
+
+async def agenerate_chunk_flashcards(chunk_text, title=""):
+    """Async version of generate_chunk_flashcards"""
+    try:
+        response = await aquery_llama(flashcard_prompt(chunk_text))
+        if response:
+            return parse_flashcards(response, title)
+    except Exception as e:
+        print(f"Error generating flashcards for chunk: {str(e)}")
+    return []
+
+def stream_chunk_flashcards(chunk_text, title=""):
+    """
+    Like generate_chunk_flashcards, but the response is streamed and each
+    flashcard yielded as soon as it is parsed. If the stream breaks off,
+    the cards completed before that are kept.
+    """
+    parser = FlashcardStreamParser(title)
+    try:
+        for piece in stream_llama(flashcard_prompt(chunk_text)):
+            yield from parser.feed(piece)
+        yield from parser.close()
+    except Exception as e:
+        print(f"Error generating flashcards for chunk: {str(e)}")
+
+async def astream_chunk_flashcards(chunk_text, title=""):
+    """Async version of stream_chunk_flashcards"""
+    parser = FlashcardStreamParser(title)
+    try:
+        async for piece in astream_llama(flashcard_prompt(chunk_text)):
+            for card in parser.feed(piece):
+                yield card
+        for card in parser.close():
+            yield card
+    except Exception as e:
+        print(f"Error generating flashcards for chunk: {str(e)}")
+
+def iter_flashcards(text, title=""):
+    """
+    Generate flashcards for every chunk of text, several chunks at a time.
+    
+    Chunks take one of the FLASHCARD_CONCURRENCY slots shared by every
+    request in the process while they are with the model. Results are
+    yielded in chunk order, each as soon as it and all earlier chunks are done.
+    
+    Yields:
+        list: The flashcards of one chunk
+    """
+    chunks = split_into_chunks(text)
+    print(f"Processing {len(chunks)} text chunks")
+    stopped = threading.Event()
+    
+    def generate(chunk):
+        with FLASHCARD_SLOTS:
+            if stopped.is_set():
+                return []
+            return generate_chunk_flashcards(chunk, title)
+    
+    workers = max(1, min(FLASHCARD_CONCURRENCY, len(chunks)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flashcards")
+    try:
+        futures = [executor.submit(generate, chunk) for chunk in chunks]
+        for future in futures:
+            yield future.result()
+    finally:
+        # Drop chunks nobody will read if the caller stops early
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def aiter_flashcards(text, title=""):
+    """
+    Async version of iter_flashcards: chunks are requested as tasks on the
+    event loop, at most FLASHCARD_CONCURRENCY at once across the worker's
+    requests, and yielded in chunk order.
+    
+    Yields:
+        list: The flashcards of one chunk
+    """
+    chunks = split_into_chunks(text)
+    print(f"Processing {len(chunks)} text chunks")
+    
+    semaphore = async_flashcard_slots()
+    
+    async def generate(chunk):
+        async with semaphore:
+            return await agenerate_chunk_flashcards(chunk, title)
+    
+    tasks = [asyncio.ensure_future(generate(chunk)) for chunk in chunks]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        # Drop chunks nobody will read if the caller stops early
+        for task in tasks:
+            task.cancel()
+
+def iter_streamed_flashcards(text, title=""):
+    """
+    Like iter_flashcards, but every chunk's response is streamed and each
+    flashcard yielded as soon as it is parsed, from whichever chunk it comes.
+    
+    Yields:
+        dict: One flashcard
+    """
+    chunks = split_into_chunks(text)
+    print(f"Processing {len(chunks)} text chunks")
+    stopped = threading.Event()
+    cards = queue.Queue()
+    chunk_done = object()
+    
+    def generate(chunk):
+        try:
+            with FLASHCARD_SLOTS:
+                if stopped.is_set():
+                    return
+                for card in stream_chunk_flashcards(chunk, title):
+                    if stopped.is_set():
+                        return
+                    cards.put(card)
+        finally:
+            cards.put(chunk_done)
+    
+    workers = max(1, min(FLASHCARD_CONCURRENCY, len(chunks)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flashcards")
+    try:
+        for chunk in chunks:
+            executor.submit(generate, chunk)
+        remaining = len(chunks)
+        while remaining:
+            card = cards.get()
+            if card is chunk_done:
+                remaining -= 1
+            else:
+                yield card
+    finally:
+        # Drop chunks nobody will read if the caller stops early
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def aiter_streamed_flashcards(text, title=""):
+    """
+    Async version of iter_streamed_flashcards.
+    
+    Yields:
+        dict: One flashcard
+    """
+    chunks = split_into_chunks(text)
+    print(f"Processing {len(chunks)} text chunks")
+    
+    semaphore = async_flashcard_slots()
+    cards = asyncio.Queue()
+    chunk_done = object()
+    
+    async def generate(chunk):
+        try:
+            async with semaphore:
+                async for card in astream_chunk_flashcards(chunk, title):
+                    cards.put_nowait(card)
+        finally:
+            cards.put_nowait(chunk_done)
+    
+    tasks = [asyncio.ensure_future(generate(chunk)) for chunk in chunks]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            card = await cards.get()
+            if card is chunk_done:
+                remaining -= 1
+            else:
+                yield card
+    finally:
+        # Drop chunks nobody will read if the caller stops early
+        for task in tasks:
+            task.cancel()
+
+def fallback_flashcards(text, title=""):
+    """Fallback rule-based flashcards when the API call fails"""
+    flashcards = []
+    paragraphs = [p for p in text.split('\n\n') if p.strip()]
+    if len(paragraphs) < 2:
+        paragraphs = [p for p in text.split('\n') if p.strip()]
+    
+    for paragraph in paragraphs[:5]:  # Limit to first 5 paragraphs
+        if len(paragraph.strip()) < 10:
+            continue
+            
+        # Try to find a key term at the beginning of the paragraph
+        sentences = paragraph.split('. ')
+        
+        if len(sentences) > 1:
+            first_sentence = sentences[0]
+            rest = '. '.join(sentences[1:])
+            
+            # Create a question from the first sentence
+            if ':' in first_sentence:
+                # If there's a colon, use the part before it as the term
+                parts = first_sentence.split(':', 1)
+                term = parts[0].strip()
+                definition = (parts[1] + '. ' + rest).strip()
+                question = f"What is {term}?"
+            else:
+                # Otherwise, make a "What is X?" question
+                words = first_sentence.split()
+                if len(words) > 3:
+                    # Try to find a key noun phrase
+                    question = f"What is {' '.join(words[:3])}?"
+                    definition = paragraph
+                else:
+                    question = f"Explain: {first_sentence}"
+                    definition = rest
+            
+            flashcards.append({
+                "question": question,
+                "answer": definition,
+                "tags": [title] if title else []
+            })
+        else:
+            # Short paragraph, just create a general question
+            flashcards.append({
+                "question": f"What is described by: '{paragraph[:30]}...'?",
+                "answer": paragraph,
+                "tags": [title] if title else []
+            })
+    return flashcards
 
 # Mock database for initial data
 mock_database = {
@@ -251,67 +1075,6 @@ mock_database = {
     "flashcards": []
 }
 
-# Simple search score (checks if query in title/content/summary/tags)
-def calculate_search_score(note_dict, query):
-    score = 0
-    
-    # Case-insensitive title match
-    title = note_dict.get("title", "").lower()
-    if query in title:
-        score += 5
-        # Give extra points for exact title matches
-        if query == title:
-            score += 3
-    
-    # Content and summary matching
-    if query in note_dict.get("content", "").lower():
-        score += 3
-    if query in note_dict.get("summary", "").lower():
-        score += 2
-    
-    # Tag matching
-    for tag in note_dict.get("tags", []):
-        tag_lower = tag.lower()
-        if query == tag_lower:
-            score += 3  # Exact tag match
-        elif query in tag_lower:
-            score += 1  # Partial tag match
-    
-    return score
-
-def calculate_flashcard_score(card_dict, query):
-    score = 0
-    match_info = {"title_match": False, "tag_match": False}
-    
-    # Case-insensitive title match
-    title = card_dict.get("title", "").lower()
-    if query == title:
-        score += 5  # Exact title match
-        match_info["title_match"] = True
-    elif query in title:
-        score += 3  # Partial title match
-        match_info["title_match"] = True
-    
-    # Question and answer matching
-    if query in card_dict.get("question", "").lower():
-        score += 2
-    if query in card_dict.get("answer", "").lower():
-        score += 2
-    
-    # Tag matching - both exact and partial matches
-    for tag in card_dict.get("tags", []):
-        tag_lower = tag.lower()
-        if query == tag_lower:
-            score += 3  # Exact tag match
-            match_info["tag_match"] = True
-        elif query in tag_lower:
-            score += 1  # Partial tag match
-            match_info["tag_match"] = True
-    
-    # Return both score and match info
-    card_dict["match_info"] = match_info
-    return score
-
 # OpenRouter API is called directly from frontend
 def openrouter_api(prompt, **kwargs):
     return None 
\ No newline at end of file
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect the search index signal handlers and the SQLite connection tuning
+        from . import db, signals  # noqa: F401
+        # Seed mock data after migrate
+        from .mock_data import load_mock_data
+        post_migrate.connect(load_mock_data, sender=self)
@@ -0,0 +1,268 @@
+# Async versions of the AI endpoints, routed instead of the DRF views when served over ASGI
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+
+from .ai_utils import (
+    asummarize_text, atag_text, astream_summary, astream_tags, aiter_flashcards, aiter_streamed_flashcards,
+    fallback_flashcards
+)
+from .views import chatbot_flashcards, save_summary, sse_event
+from . import jobs
+
+class BadRequest(Exception):
+    """A request body that cannot be read, answered with its status code"""
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    # DRF's encoder, so dates look the same as in the DRF views' responses
+    return JsonResponse(data, status=status_code, encoder=JSONEncoder, safe=False, headers=headers)
+
+def async_api_view(methods):
+    """
+    Turn a coroutine into a view accepting only the given methods, CSRF
+    exempt like DRF's @api_view.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return json_response(
+                    {"detail": f'Method "{request.method}" not allowed.'},
+                    status.HTTP_405_METHOD_NOT_ALLOWED
+                )
+            try:
+                return await view(request, *args, **kwargs)
+            except BadRequest as e:
+                return json_response({"detail": str(e)}, e.status_code)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+def read_data(request, forms=False):
+    """
+    The request body as a dict: JSON, or form fields too when forms is set.
+
+    Raises:
+        BadRequest: If the body is malformed or of another media type
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as e:
+            raise BadRequest(f"JSON parse error - {str(e)}")
+        if not isinstance(data, dict):
+            raise BadRequest("Expected a JSON object")
+        return data
+    if forms and request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        return request.POST.dict()
+    raise BadRequest(
+        f'Unsupported media type "{request.content_type}" in request.',
+        status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    )
+
+def flag(request, data, name):
+    """True if ?name= or "name" in the body is set"""
+    value = request.GET.get(name, data.get(name, False))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def sse_response(events):
+    """Stream (event, data) pairs from an async iterator to the client as text/event-stream"""
+    async def stream():
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Summarize text endpoint
+@async_api_view(['POST'])
+async def summarize(request):
+    """Summarize text using AI models"""
+    data = read_data(request)
+    text = data.get('text', '')
+    ai_model = data.get('ai_model', None)
+
+    if not text:
+        return json_response({"error": "No text provided"}, status.HTTP_400_BAD_REQUEST)
+
+    if flag(request, data, 'stream'):
+        return sse_response(astream_summary(text, ai_model))
+
+    try:
+        return json_response(await asummarize_text(text, ai_model))
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Tag text endpoint
+@async_api_view(['POST'])
+async def tag(request):
+    """Extract tags from text using AI models"""
+    data = read_data(request)
+    text = data.get('text', '')
+    ai_model = data.get('ai_model', None)
+
+    if not text:
+        return json_response({"error": "No text provided"}, status.HTTP_400_BAD_REQUEST)
+
+    if flag(request, data, 'stream'):
+        return sse_response(astream_tags(text, ai_model))
+
+    try:
+        return json_response(await atag_text(text, ai_model))
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+async def stream_chatbot(content, title, tags, ai_model):
+    """Streaming chatbot: summary tokens as they arrive, then tags and the full result"""
+    # Tags are generated alongside the streaming summary
+    tags_task = None if tags else asyncio.ensure_future(atag_text(content, ai_model))
+
+    try:
+        summary_result = None
+        async for event, data in astream_summary(content, ai_model):
+            if event == "done":
+                summary_result = data
+            else:
+                yield event, data
+
+        if tags_task is not None:
+            tags = (await tags_task)["tags"]
+    finally:
+        if tags_task is not None:
+            tags_task.cancel()
+    yield "tags", tags
+
+    yield "done", {
+        "tags": tags,
+        "flashcards": chatbot_flashcards(title, summary_result["summary"], tags),
+        "summary": summary_result["summary"],
+        "model_used": summary_result["model_used"]
+    }
+
+# Chatbot endpoint to generate flashcards, tags, summary
+@async_api_view(['POST'])
+async def chatbot(request):
+    """Process content with AI to generate tags, flashcards and summaries"""
+    data = read_data(request)
+    content = data.get('content', '')
+    title = data.get('title', '')
+    tags = data.get('tags', [])
+    ai_model = data.get('ai_model', None)
+
+    if not content:
+        return json_response({"error": "No content provided"}, status.HTTP_400_BAD_REQUEST)
+
+    if flag(request, data, 'stream'):
+        return sse_response(stream_chatbot(content, title, tags, ai_model))
+
+    try:
+        # Generate the summary, and tags if none provided, at the same time
+        if not tags:
+            tag_result, summary_result = await asyncio.gather(
+                atag_text(content, ai_model),
+                asummarize_text(content, ai_model)
+            )
+            tags = tag_result["tags"]
+        else:
+            summary_result = await asummarize_text(content, ai_model)
+
+        return json_response({
+            "tags": tags,
+            "flashcards": chatbot_flashcards(title, summary_result["summary"], tags),
+            "summary": summary_result["summary"],
+            "model_used": summary_result["model_used"]
+        })
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+async def stream_flashcards(text, title):
+    """Streaming flashcard generation: one event per card as soon as it is parsed from the model's stream"""
+    count = 0
+    async for card in aiter_streamed_flashcards(text, title):
+        count += 1
+        yield "flashcard", card
+
+    if not count:
+        for card in fallback_flashcards(text, title):
+            count += 1
+            yield "flashcard", card
+
+    yield "done", {"count": count}
+
+# Generate flashcards from text endpoint
+@async_api_view(['POST'])
+async def generate_flashcards(request):
+    """Generate flashcards from text"""
+    data = read_data(request)
+    text = data.get('text', '')
+    title = data.get('title', '')
+
+    if not text:
+        return json_response({"error": "No text provided"}, status.HTTP_400_BAD_REQUEST)
+
+    if flag(request, data, 'stream'):
+        return sse_response(stream_flashcards(text, title))
+
+    try:
+        # Chunks are sent to the model concurrently and come back in order
+        flashcards = []
+        async for chunk_flashcards in aiter_flashcards(text, title):
+            flashcards.extend(chunk_flashcards)
+
+        # If no flashcards were generated with AI, use rule-based approach
+        if not flashcards:
+            flashcards = fallback_flashcards(text, title)
+
+        return json_response({"flashcards": flashcards})
+    except Exception as e:
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Create summary endpoint
+@async_api_view(['POST'])
+async def create_summary(request):
+    """Create a new summary with generated summary text"""
+    data = read_data(request, forms=True)
+    try:
+        text = data.get("text", "")
+        title = data.get("title", "Untitled Summary")
+        ai_model = data.get("ai_model", None)
+
+        if not text:
+            return json_response({"error": "Text content is required"}, status.HTTP_400_BAD_REQUEST)
+
+        if 'respond-async' in request.headers.get('Prefer', '') or flag(request, data, 'async'):
+            job = await sync_to_async(jobs.enqueue)(
+                "create_summary", {"text": text, "title": title, "ai_model": ai_model}
+            )
+            status_url = reverse('job_status', args=[job.id])
+            return json_response(
+                {"job_id": job.id, "status": job.status, "status_url": status_url},
+                status.HTTP_202_ACCEPTED,
+                headers={"Location": status_url}
+            )
+
+        print(f"Creating summary for text ({len(text)} chars) with title: {title}")
+        result, tags_result = await asyncio.gather(
+            asummarize_text(text, ai_model),
+            atag_text(text, ai_model)
+        )
+        summary = await sync_to_async(save_summary)(text, title, result, tags_result)
+        return json_response(summary, status.HTTP_201_CREATED)
+    except Exception as e:
+        print(f"Error in create_summary: {str(e)}")
+        return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
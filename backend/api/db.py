@@ -0,0 +1,54 @@
+# SQLite connection tuning and the optional read-only alias for heavy reads
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Alias of the read-only connection, when settings configure one
+READ_ALIAS = 'readonly'
+
+_reading = ContextVar('read_alias_reading', default=False)
+
+def read_alias_enabled():
+    return READ_ALIAS in settings.DATABASES
+
+@contextmanager
+def read_replica():
+    """
+    Send the ORM reads made inside the block to the read-only alias, if there
+    is one. Writes still go to the default database.
+    """
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+class ReadReplicaRouter:
+    """Routes reads inside read_replica() to the read-only alias, and never migrates it"""
+
+    def db_for_read(self, model, **hints):
+        if _reading.get() and read_alias_enabled():
+            return READ_ALIAS
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == READ_ALIAS:
+            return False
+        return None
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Apply settings.SQLITE_PRAGMAS to every new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    read_only = connection.alias == READ_ALIAS
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        # The journal mode is stored in the database file, which a read-only connection cannot change
+        if read_only and name == 'journal_mode':
+            continue
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+    if read_only:
+        connection.connection.execute("PRAGMA query_only = ON")
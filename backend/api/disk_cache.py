@@ -0,0 +1,134 @@
+# Persistent SQLite-backed cache with TTL and LRU eviction
+import json
+import sqlite3
+import threading
+import time
+
+class DiskCache:
+    """
+    Key/value cache stored in its own SQLite file so it survives restarts
+    and is shared by every worker process on the machine.
+
+    Values are JSON-serialisable objects. Entries older than `ttl` seconds
+    are treated as missing; once more than `max_entries` are stored, or their
+    values take more than `max_bytes`, the least recently used ones are
+    evicted.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None, max_bytes=None):
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row and self.ttl and now - row[1] > self.ttl:
+                    connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    connection.commit()
+                    row = None
+                if row is not None:
+                    connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                    connection.commit()
+            except sqlite3.Error as e:
+                print(f"[ERROR] Cache read failed ({self.path}): {str(e)}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries if over capacity"""
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, data, len(data.encode("utf-8")), now, now),
+                )
+                if self.ttl:
+                    connection.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl,))
+                if self.max_entries:
+                    connection.execute(
+                        "DELETE FROM entries WHERE key IN ("
+                        " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+                if self.max_bytes:
+                    # Keep the most recently used entries that fit in max_bytes
+                    connection.execute(
+                        "DELETE FROM entries WHERE key IN ("
+                        " SELECT key FROM ("
+                        "  SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running_size"
+                        "  FROM entries)"
+                        " WHERE running_size > ?)",
+                        (self.max_bytes,),
+                    )
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"[ERROR] Cache write failed ({self.path}): {str(e)}")
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute("DELETE FROM entries")
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"[ERROR] Cache clear failed ({self.path}): {str(e)}")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters for this process plus the size of the shared store (None if it cannot be read)"""
+        with self._lock:
+            try:
+                entries, size = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[ERROR] Cache stats failed ({self.path}): {str(e)}")
+                entries, size = None, None
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+        }
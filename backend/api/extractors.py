@@ -0,0 +1,449 @@
+# Text extraction from uploaded documents
+#
+# Extractors are registered by file extension and shared by the upload,
+# import and bulk import endpoints. This module must not import Django: bulk
+# imports run the extractors in worker processes that are spawned fresh.
+import io
+import os
+import mmap
+import hashlib
+import logging
+import tempfile
+import threading
+import zipfile
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from rest_framework import status
+
+from . import ocr
+from .disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used to extract the files of a bulk import
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.cpu_count() or 1))
+
+# Registered extractors, by lowercase file extension
+EXTRACTORS = {}
+
+# Bump this when an extractor changes so stale cached text is not reused
+EXTRACTOR_VERSION = 1
+
+# Text extracted from uploads, keyed by the SHA-256 of the file, so importing
+# the same document again skips parsing and OCR
+EXTRACTION_CACHE = DiskCache(
+    os.getenv(
+        "EXTRACTION_CACHE_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "extraction_cache.sqlite3"),
+    ),
+    ttl=int(os.getenv("EXTRACTION_CACHE_TTL", 30 * 24 * 60 * 60)),
+    max_bytes=int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class ExtractionError(Exception):
+    """Raised when an uploaded file cannot be turned into text; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+def register(*extensions):
+    """Decorator registering a function as the text extractor for some file extensions"""
+    def decorator(extractor):
+        for extension in extensions:
+            EXTRACTORS[extension] = extractor
+        return extractor
+    return decorator
+
+def file_extension(filename):
+    """Lowercase extension of a filename, without the dot"""
+    return os.path.splitext(filename)[1][1:].lower()
+
+def supported_extensions():
+    return sorted(EXTRACTORS)
+
+def upload_path(file):
+    """Path of the file on disk if the upload has one (large uploads and job files), else None"""
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    path = getattr(getattr(file, 'file', file), 'name', None)
+    return path if isinstance(path, str) else None
+
+@contextmanager
+def open_upload(file, memory_map=True):
+    """
+    Give a seekable binary stream over an upload without copying it.
+
+    Uploads that Django spooled to a temporary file are memory-mapped, so the
+    OS pages the document in as it is read; small in-memory uploads are used
+    as they are. Pass memory_map=False to get the plain file instead.
+    """
+    path = upload_path(file)
+    if path:
+        with open(path, 'rb') as handle:
+            if not memory_map:
+                yield handle
+                return
+            try:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                yield handle
+                return
+            with mapped:
+                yield mapped
+    else:
+        file.seek(0)
+        yield file
+
+def iter_pdf_pages(stream):
+    """Yield the text of each page of a PDF, one page at a time"""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(stream)
+    if len(reader.pages) == 0:
+        raise ExtractionError("The PDF file appears to be empty or damaged.")
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+def count_pdf_pages(stream):
+    import PyPDF2
+    return len(PyPDF2.PdfReader(stream).pages)
+
+@register('pdf')
+def extract_pdf_text(file):
+    """Extract the text of a PDF upload, falling back to OCR for scanned documents"""
+    try:
+        with open_upload(file) as stream:
+            text = "\n\n".join(page for page in iter_pdf_pages(stream) if page)
+
+            if not text.strip():
+                # No text layer, so treat it as a scanned document and OCR the pages
+                page_count = count_pdf_pages(stream)
+                logger.info(f"No text layer in {file.name}, running OCR on {page_count} pages")
+                path = upload_path(file)
+                if path:
+                    page_texts = ocr.ocr_pdf(path, page_count)
+                else:
+                    stream.seek(0)
+                    page_texts = ocr.ocr_pdf_bytes(stream.read(), page_count)
+                text = "\n\n".join(page_text for page_text in page_texts if page_text.strip())
+                notice = ocr.truncation_notice(page_count)
+                if notice and text.strip():
+                    logger.warning(f"{file.name} has {page_count} pages, only {ocr.OCR_MAX_PAGES} were OCR'd")
+                    text = f"{text}\n\n{notice}"
+    except ExtractionError:
+        raise
+    except ocr.OCRError as e:
+        logger.error(f"PDF OCR error: {str(e)}")
+        raise ExtractionError(f"Failed to OCR scanned PDF file: {str(e)}")
+    except Exception as e:
+        logger.error(f"PDF processing error: {str(e)}")
+        raise ExtractionError(f"Failed to process PDF file: {str(e)}")
+
+    if not text.strip():
+        raise ExtractionError("No text could be extracted from the PDF file, even with OCR.")
+    return text
+
+@register('docx')
+def extract_docx_text(file):
+    """Extract the paragraphs of a Word document"""
+    import docx
+    try:
+        # Word and PowerPoint files are zip archives, which need a real file object
+        with open_upload(file, memory_map=False) as stream:
+            document = docx.Document(stream)
+        text = "".join(para.text + "\n\n" for para in document.paragraphs if para.text)
+    except Exception as e:
+        logger.error(f"DOCX processing error: {str(e)}")
+        raise ExtractionError(f"Failed to process Word document: {str(e)}")
+
+    if not text.strip():
+        raise ExtractionError("The Word document appears to be empty or contains no readable text.")
+    return text
+
+@register('pptx')
+def extract_pptx_text(file):
+    """Extract the text of each slide of a PowerPoint presentation"""
+    from pptx import Presentation
+    try:
+        with open_upload(file, memory_map=False) as stream:
+            presentation = Presentation(stream)
+        slides = []
+        for i, slide in enumerate(presentation.slides):
+            slide_text = "".join(
+                shape.text + "\n" for shape in slide.shapes if hasattr(shape, "text") and shape.text
+            )
+            if slide_text.strip():
+                slides.append(f"Slide {i+1}:\n{slide_text}\n---\n\n")
+        text = "".join(slides)
+    except Exception as e:
+        logger.error(f"PPTX processing error: {str(e)}")
+        raise ExtractionError(f"Failed to process PowerPoint presentation: {str(e)}")
+
+    if not text.strip():
+        raise ExtractionError("The PowerPoint presentation appears to be empty or contains no readable text.")
+    return text
+
+@register('txt', 'md')
+def extract_plain_text(file):
+    """Decode a plain text or Markdown file"""
+    with open_upload(file) as stream:
+        return stream.read().decode('utf-8')
+
+@register('png', 'jpg', 'jpeg')
+def extract_image_text(file):
+    """OCR an image"""
+    from PIL import Image
+
+    # Check if Tesseract is installed and configured
+    try:
+        ocr.check_tesseract()
+    except ocr.OCRError as e:
+        logger.error(str(e))
+        raise ExtractionError(
+            "OCR engine (Tesseract) is not properly installed or configured on the server.",
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    try:
+        with open_upload(file) as stream:
+            image = Image.open(io.BytesIO(stream.read()))
+        # Large images are scaled down before OCR
+        text = ocr.ocr_image(image)
+    except Exception as e:
+        logger.error(f"Image processing error: {str(e)}")
+        raise ExtractionError(f"Failed to process image file: {str(e)}")
+
+    if not text.strip():
+        raise ExtractionError("No text could be extracted from the image. The image may not contain readable text or the text may be unclear.")
+    return text
+
+def extract_text(file, filename=None):
+    """
+    Extract the text of an uploaded file with the extractor registered for its extension.
+
+    Args:
+        file: Django upload or binary file object
+        filename (str, optional): Name used to pick the extractor, defaults to file.name
+
+    Returns:
+        str: The extracted text, stripped
+
+    Raises:
+        ExtractionError: If the file type is unsupported or no text could be extracted
+    """
+    filename = filename or file.name
+    extension = file_extension(filename)
+    extractor = EXTRACTORS.get(extension)
+    if extractor is None:
+        supported = ", ".join(extension.upper() for extension in supported_extensions())
+        raise ExtractionError(f"Unsupported file type: {extension or filename}. Supported types: {supported}.")
+
+    try:
+        text = extractor(file)
+    except ExtractionError:
+        raise
+    except UnicodeDecodeError:
+        logger.error(f"Unicode decode error while processing {filename}")
+        raise ExtractionError("Unable to decode the file. Please ensure it's a valid text-based file.")
+    except MemoryError:
+        logger.error(f"Memory error while processing {filename}")
+        raise ExtractionError("File is too large to process. Please try a smaller file.")
+    except Exception as e:
+        logger.error(f"Unexpected error processing {filename}: {str(e)}")
+        raise ExtractionError(f"Error processing file: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Validate the extracted text
+    if not text or not text.strip():
+        raise ExtractionError("No text could be extracted from the file. Please try another file.")
+
+    logger.info(f"Successfully extracted {len(text)} characters from {filename}")
+    return text.strip()
+
+# Content-addressed cache of extracted text
+
+def content_hash(file):
+    """SHA-256 of an upload's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open_upload(file) as stream:
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extraction_cache_key(file, filename=None):
+    """Cache key for the text of an upload: its bytes and the extractor that reads them"""
+    extension = file_extension(filename or file.name)
+    return f"extract:v{EXTRACTOR_VERSION}:{extension}:{content_hash(file)}"
+
+def cache_extraction(key, text):
+    EXTRACTION_CACHE.set(key, {"text": text, "characters": len(text), "extractor_version": EXTRACTOR_VERSION})
+
+def cached_extract_text(file, filename=None):
+    """
+    Like extract_text, but a file whose bytes were extracted before is
+    answered from the extraction cache. Failures are not cached.
+    """
+    key = extraction_cache_key(file, filename)
+    cached = EXTRACTION_CACHE.get(key)
+    if cached:
+        return cached["text"]
+    text = extract_text(file, filename)
+    cache_extraction(key, text)
+    return text
+
+# Bulk extraction
+
+def get_pool():
+    """Shared extraction process pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the server process has threads running
+            _pool = ProcessPoolExecutor(
+                max_workers=IMPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=ocr.run_inline,
+            )
+        return _pool
+
+def reset_pool(pool):
+    """Drop a pool broken by a worker that died; the next get_pool starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def submit(function, *args):
+    """
+    Submit function to the extraction pool, replacing the pool first if a
+    worker died since it was last used.
+
+    Returns:
+        tuple: (the pool, the future)
+    """
+    pool = get_pool()
+    try:
+        return pool, pool.submit(function, *args)
+    except BrokenProcessPool:
+        reset_pool(pool)
+        pool = get_pool()
+        return pool, pool.submit(function, *args)
+
+def extract_path(path, filename):
+    """Worker: extract the text of one file on disk, reporting failure in the result"""
+    try:
+        with open(path, 'rb') as handle:
+            return {"filename": filename, "text": extract_text(handle, filename)}
+    except ExtractionError as e:
+        return {"filename": filename, "error": str(e), "status": e.status_code}
+
+def extract_paths(sources):
+    """
+    Extract many files in parallel in the extraction pool.
+
+    Files already in the extraction cache are answered from it, and only the
+    rest are sent to the workers. If a worker dies (killed for running out
+    of memory, say) the files still in the pool fail with an error and the
+    pool is replaced for the next import.
+
+    Args:
+        sources (list): (path, filename) pairs
+
+    Returns:
+        list: One dict per source, in order, with either "text" or "error"
+    """
+    results, futures, keys = [], {}, {}
+    for index, (path, filename) in enumerate(sources):
+        with open(path, 'rb') as handle:
+            key = extraction_cache_key(handle, filename)
+        cached = EXTRACTION_CACHE.get(key)
+        if cached:
+            results.append({"filename": filename, "text": cached["text"]})
+        else:
+            results.append(None)
+            keys[index] = key
+            futures[index] = submit(extract_path, path, filename)
+
+    for index, (pool, future) in futures.items():
+        try:
+            results[index] = future.result()
+        except BrokenProcessPool:
+            reset_pool(pool)
+            results[index] = {
+                "filename": sources[index][1],
+                "error": "The extraction worker stopped unexpectedly while reading this file.",
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            }
+        if "text" in results[index]:
+            cache_extraction(keys[index], results[index]["text"])
+    return results
+
+def format_size(size):
+    """A byte count for messages: whole MB, KB below a megabyte, bytes below a kilobyte"""
+    if size >= 1024 * 1024:
+        return f"{size // (1024 * 1024)}MB"
+    if size >= 1024:
+        return f"{size // 1024}KB"
+    return f"{size} bytes"
+
+def unpack_zip(path, directory, max_files, max_bytes, max_file_size):
+    """
+    Unpack the documents in a zip archive into directory.
+
+    Members are written under generated names, so paths inside the archive
+    can never escape the directory. Folders and hidden or system files are
+    skipped. Members larger than max_file_size are not unpacked but
+    reported as failed, and an archive expanding to more than max_bytes is
+    rejected before anything is written. The sizes in the archive may not
+    be honest, so the bytes actually written are held to the same limits.
+
+    Returns:
+        tuple: (path, filename) pairs, filename being the member's base name,
+        failures for members rejected up front, and the bytes written
+    """
+    sources, failed = [], []
+    total_size = 0
+    try:
+        with zipfile.ZipFile(path) as archive:
+            members = []
+            for member in archive.infolist():
+                filename = os.path.basename(member.filename)
+                if member.is_dir() or not filename or filename.startswith('.') or '__MACOSX' in member.filename:
+                    continue
+                if member.file_size > max_file_size:
+                    failed.append({
+                        "filename": filename,
+                        "error": f"File is too large. Maximum size is {format_size(max_file_size)}.",
+                    })
+                    continue
+                members.append((member, filename))
+
+            if len(members) > max_files:
+                raise ExtractionError(f"The archive contains more than {max_files} files.")
+            if sum(member.file_size for member, _ in members) > max_bytes:
+                raise ExtractionError(f"The archive expands to more than the {format_size(max_bytes)} left for this import.")
+
+            for member, filename in members:
+                handle, target = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(filename)[1])
+                member_size = 0
+                with archive.open(member) as source, os.fdopen(handle, 'wb') as destination:
+                    for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                        member_size += len(chunk)
+                        total_size += len(chunk)
+                        if member_size > max_file_size or total_size > max_bytes:
+                            raise ExtractionError(
+                                f"{filename} in the archive is larger than its recorded size."
+                            )
+                        destination.write(chunk)
+                sources.append((target, filename))
+    except zipfile.BadZipFile as e:
+        raise ExtractionError(f"Failed to read zip archive: {str(e)}")
+    return sources, failed, total_size
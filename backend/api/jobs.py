@@ -0,0 +1,123 @@
+# In-process background job queue backed by the Job table
+import os
+import uuid
+import shutil
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from .models import Job
+
+# Worker threads that run queued jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="jobs")
+
+# Finished jobs are kept this long for clients to fetch their results
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", 7))
+
+# Uploads waiting to be processed by a background job
+JOB_UPLOAD_DIR = os.path.join(settings.MEDIA_ROOT, "job_uploads")
+
+# Registered job handlers, by job kind
+JOB_HANDLERS = {}
+
+class JobError(Exception):
+    """Raised by a job handler to fail the job with a message meant for the client"""
+
+def register(kind):
+    """Decorator registering a function as the handler for one kind of job"""
+    def decorator(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+def enqueue(kind, payload):
+    """
+    Record a job and hand it to the worker threads.
+    
+    Args:
+        kind (str): Name the handler was registered under
+        payload (dict): JSON-serialisable arguments for the handler
+        
+    Returns:
+        Job: The queued job
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job.objects.create(id=f"job-{uuid.uuid4()}", kind=kind, payload=payload)
+    JOB_EXECUTOR.submit(run_job, job.id)
+    prune_finished_jobs()
+    return job
+
+def run_job(job_id):
+    """Run one job in a worker thread and store its result or error"""
+    close_old_connections()
+    try:
+        job = Job.objects.get(id=job_id)
+        job.status = Job.STATUS_RUNNING
+        job.save(update_fields=["status", "updated_at"])
+        try:
+            job.result = JOB_HANDLERS[job.kind](**job.payload)
+            job.status = Job.STATUS_SUCCEEDED
+        except JobError as e:
+            job.error = str(e)
+            job.status = Job.STATUS_FAILED
+        except Exception as e:
+            print(f"[ERROR] Job {job_id} ({job.kind}) failed: {str(e)}")
+            job.error = f"Unexpected error: {str(e)}"
+            job.status = Job.STATUS_FAILED
+        job.save(update_fields=["status", "result", "error", "updated_at"])
+    finally:
+        # Worker threads outlive requests, so give back their connection explicitly
+        connections.close_all()
+
+def prune_finished_jobs():
+    """Delete the succeeded and failed jobs older than JOB_RETENTION_DAYS; returns how many"""
+    cutoff = timezone.now() - timedelta(days=JOB_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.STATUS_SUCCEEDED, Job.STATUS_FAILED], updated_at__lt=cutoff
+    ).delete()
+    return deleted
+
+def recover_jobs():
+    """
+    Clean up after a server that stopped with jobs unfinished.
+
+    Jobs run in threads of the server process, so any still queued or
+    running are lost with it. They are failed rather than run again, as an
+    import may have created part of its notes already, and the uploads
+    waiting for them are deleted. Old finished jobs are pruned too.
+
+    Only call this before the server starts: a job running in a live
+    worker looks the same as a lost one.
+
+    Returns:
+        int: Number of jobs failed
+    """
+    interrupted = Job.objects.filter(status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING]).update(
+        status=Job.STATUS_FAILED,
+        error="The server restarted before the job finished. Please submit it again.",
+        updated_at=timezone.now(),
+    )
+    if os.path.isdir(JOB_UPLOAD_DIR):
+        for entry in os.scandir(JOB_UPLOAD_DIR):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+    prune_finished_jobs()
+    return interrupted
+
+def job_to_dict(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import semantic_index
+
+
+class Command(BaseCommand):
+    help = "Embed every note again and rewrite the note embedding file used by semantic search"
+
+    def handle(self, *args, **options):
+        count = semantic_index.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding index rebuilt with {count} notes in {semantic_index.EMBEDDING_INDEX_PATH}"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api import search_index
+from api.models import SearchPosting
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search inverted index from all notes and flashcards"
+
+    def handle(self, *args, **options):
+        if not search_index.index_enabled():
+            self.stdout.write("SEARCH_BACKEND is postgres; its search columns are kept up to date by PostgreSQL")
+            return
+        search_index.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index rebuilt with {SearchPosting.objects.count()} postings"
+        ))
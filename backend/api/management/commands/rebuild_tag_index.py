@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import tag_index
+from api.models import TagAssignment
+
+
+class Command(BaseCommand):
+    help = "Rebuild the tag table and tag counts from the tags of all notes, flashcards and summaries"
+
+    def handle(self, *args, **options):
+        tag_index.rebuild_tag_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Tag index rebuilt with {TagAssignment.objects.count()} tag assignments"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Fail the background jobs left unfinished by a stopped server, delete their uploads "
+        "and prune old finished jobs. Run it before the server starts, never while it is running."
+    )
+
+    def handle(self, *args, **options):
+        interrupted = jobs.recover_jobs()
+        self.stdout.write(self.style.SUCCESS(f"{interrupted} interrupted jobs marked failed"))
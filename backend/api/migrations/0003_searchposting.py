@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+# The existing notes and flashcards are indexed by 0004, which builds the
+# postings together with the statistics ranking needs.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('doc_type', models.CharField(max_length=20)),
+                ('doc_id', models.CharField(max_length=100)),
+                ('field', models.CharField(max_length=20)),
+                ('frequency', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'doc_type'], name='api_posting_term_idx'), models.Index(fields=['doc_type', 'doc_id'], name='api_posting_doc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:54
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+
+
+# The tokenizer as it was when this migration was written, copied from
+# api.search_index so later changes there do not change what it builds
+MAX_TERM_LENGTH = 100
+
+DOCUMENT_FIELDS = {
+    'note': ('title', 'content', 'summary', 'tags'),
+    'flashcard': ('title', 'question', 'answer', 'tags'),
+}
+
+# Documents read, and their rows written, at a time
+BATCH_SIZE = 500
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = re.sub(r'<[^>]+>', ' ', str(text))
+    return [term for term in re.findall(r'\w+', text.lower()) if len(term) <= MAX_TERM_LENGTH]
+
+
+def rebuild_with_statistics(apps, schema_editor):
+    SearchPosting = apps.get_model('api', 'SearchPosting')
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    SearchFieldStats = apps.get_model('api', 'SearchFieldStats')
+    SearchPosting.objects.all().delete()
+    for doc_type, model_name in (('note', 'Note'), ('flashcard', 'Flashcard')):
+        fields = DOCUMENT_FIELDS[doc_type]
+        instances = apps.get_model('api', model_name).objects.only('id', *fields).order_by('pk')
+        postings, documents, totals, count = [], [], Counter(), 0
+        for instance in instances.iterator(chunk_size=BATCH_SIZE):
+            lengths = {}
+            for field in fields:
+                value = getattr(instance, field) or ''
+                if field == 'tags':
+                    value = ' '.join(str(tag) for tag in value)
+                terms = tokenize(value)
+                lengths[field] = len(terms)
+                postings.extend(
+                    SearchPosting(term=term, doc_type=doc_type, doc_id=instance.pk, field=field,
+                                  frequency=frequency, field_length=len(terms))
+                    for term, frequency in Counter(terms).items()
+                )
+            totals.update(lengths)
+            count += 1
+            documents.append(SearchDocument(doc_type=doc_type, doc_id=instance.pk, field_lengths=lengths))
+            if len(documents) == BATCH_SIZE:
+                SearchDocument.objects.bulk_create(documents, batch_size=BATCH_SIZE)
+                SearchPosting.objects.bulk_create(postings, batch_size=1000)
+                postings, documents = [], []
+        SearchDocument.objects.bulk_create(documents, batch_size=BATCH_SIZE)
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+        SearchFieldStats.objects.bulk_create([
+            SearchFieldStats(doc_type=doc_type, field=field, document_count=count, total_length=totals[field])
+            for field in fields
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_searchposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchposting',
+            name='field_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SearchFieldStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20)),
+                ('field', models.CharField(max_length=20)),
+                ('document_count', models.PositiveIntegerField(default=0)),
+                ('total_length', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('doc_type', 'field')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20)),
+                ('doc_id', models.CharField(max_length=100)),
+                ('field_lengths', models.JSONField(default=dict)),
+            ],
+            options={
+                'unique_together': {('doc_type', 'doc_id')},
+            },
+        ),
+        migrations.RunPython(rebuild_with_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+
+# Tag normalization as it was when this migration was written, copied from
+# api.tag_index so later changes there do not change what it builds
+MAX_TAG_LENGTH = 100
+
+# Documents read, and their rows written, at a time
+BATCH_SIZE = 1000
+
+
+def normalize_tag(tag):
+    return " ".join(str(tag).split()).lower()[:MAX_TAG_LENGTH]
+
+
+def item_tags(instance):
+    tags = instance.tags if isinstance(instance.tags, list) else []
+    return sorted({normalize_tag(tag) for tag in tags if normalize_tag(tag)})
+
+
+def index_existing_tags(apps, schema_editor):
+    TagAssignment = apps.get_model('api', 'TagAssignment')
+    for doc_type, model_name in (('note', 'Note'), ('flashcard', 'Flashcard'), ('summary', 'Summary')):
+        instances = apps.get_model('api', model_name).objects.only('id', 'tags').order_by('pk')
+        rows = []
+        for instance in instances.iterator(chunk_size=BATCH_SIZE):
+            rows.extend(TagAssignment(tag=tag, doc_type=doc_type, doc_id=instance.pk) for tag in item_tags(instance))
+            if len(rows) >= BATCH_SIZE:
+                TagAssignment.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+                rows = []
+        TagAssignment.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=100)),
+                ('doc_type', models.CharField(max_length=20)),
+                ('doc_id', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['note', '-created_at'], name='api_flashcard_note_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['-created_at'], name='api_flashcard_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['-created_at'], name='api_note_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['-updated_at'], name='api_note_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='summary',
+            index=models.Index(fields=['-created_at'], name='api_summary_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagassignment',
+            index=models.Index(fields=['doc_type', 'tag', 'doc_id'], name='api_tag_lookup_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagassignment',
+            unique_together={('doc_type', 'doc_id', 'tag')},
+        ),
+        migrations.RunPython(index_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_tags(apps, schema_editor):
+    TagAssignment = apps.get_model('api', 'TagAssignment')
+    TagCount = apps.get_model('api', 'TagCount')
+    TagCount.objects.bulk_create([
+        TagCount(doc_type=row['doc_type'], tag=row['tag'], count=row['count'])
+        for row in TagAssignment.objects.values('doc_type', 'tag').annotate(count=Count('doc_id'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_indexes_and_tag_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20)),
+                ('tag', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('doc_type', 'tag')},
+            },
+        ),
+        migrations.RunPython(count_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_tag_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='flashcard',
+            name='api_flashcard_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='note',
+            name='api_note_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='summary',
+            name='api_summary_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['-created_at', '-id'], name='api_flashcard_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['-created_at', '-id'], name='api_note_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='summary',
+            index=models.Index(fields=['-created_at', '-id'], name='api_summary_created_idx'),
+        ),
+    ]
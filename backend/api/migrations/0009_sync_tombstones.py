@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:19
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def backfill_flashcard_updated_at(apps, schema_editor):
+    # Existing cards were last touched no later than when they were created
+    Flashcard = apps.get_model('api', 'Flashcard')
+    Flashcard.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20)),
+                ('doc_id', models.CharField(max_length=100)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flashcard',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_flashcard_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['-updated_at'], name='api_flashcard_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['doc_type', 'deleted_at'], name='api_tombstone_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='api_tombstone_prune_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Full-text search columns for PostgreSQL; other databases keep using the inverted index
+
+from django.db import migrations
+
+
+# Weighted like api.pg_search.FIELD_LABELS, in the "english" configuration
+SEARCH_VECTORS = {
+    'api_note': (
+        "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(content, '')), 'B') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(summary, '')), 'C') || "
+        "setweight(to_tsvector('english'::regconfig, tags), 'D')"
+    ),
+    'api_flashcard': (
+        "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(question, '')), 'B') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(answer, '')), 'C') || "
+        "setweight(to_tsvector('english'::regconfig, tags), 'D')"
+    ),
+}
+
+
+def add_search_vectors(apps, schema_editor):
+    # Generated columns stay up to date on every write, with no signal handlers involved
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, vector in SEARCH_VECTORS.items():
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED"
+        )
+        schema_editor.execute(f"CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)")
+
+
+def remove_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_VECTORS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+        schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vectors, remove_search_vectors),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_postgres_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.PositiveIntegerField(unique=True)),
+                ('doc_id', models.CharField(max_length=100, null=True, unique=True)),
+                ('text_hash', models.CharField(blank=True, default='', max_length=64)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Seed an empty database with the mock notes and flashcards once it has been migrated
+from django.db import DEFAULT_DB_ALIAS
+
+def load_mock_data(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate receiver that loads the mock notes and flashcards into
+    empty tables.
+
+    Runs after `manage.py migrate` rather than when the views are imported,
+    so workers start without touching the database.
+    """
+    from .ai_utils import mock_database
+    from .models import Note, Flashcard
+
+    try:
+        # Check if we have notes already
+        if mock_database["notes"] and not Note.objects.using(using).exists():
+            for note_data in mock_database["notes"]:
+                Note(
+                    id=note_data["id"],
+                    title=note_data["title"],
+                    content=note_data["content"],
+                    summary=note_data["summary"],
+                    tags=note_data["tags"],
+                    created_at=note_data["created_at"],
+                    updated_at=note_data["updated_at"]
+                ).save(using=using)
+
+        # Check if we have flashcards already
+        if mock_database["flashcards"] and not Flashcard.objects.using(using).exists():
+            for card_data in mock_database["flashcards"]:
+                Flashcard(
+                    id=card_data["id"],
+                    title=card_data["title"],
+                    question=card_data["question"],
+                    answer=card_data["answer"],
+                    tags=card_data["tags"],
+                    created_at=card_data["created_at"]
+                ).save(using=using)
+    except Exception as e:
+        # Migrating backwards can leave the tables missing
+        print(f"Error loading mock data: {e}")
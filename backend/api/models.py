@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
 class Note(models.Model):
@@ -10,6 +11,12 @@ class Note(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_note_created_idx'),
+            models.Index(fields=['-updated_at'], name='api_note_updated_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -21,6 +28,15 @@ class Flashcard(models.Model):
     tags = models.JSONField(default=list)
     note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='flashcards', null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A note's flashcards, newest first
+            models.Index(fields=['note', '-created_at'], name='api_flashcard_note_idx'),
+            models.Index(fields=['-created_at', '-id'], name='api_flashcard_created_idx'),
+            models.Index(fields=['-updated_at'], name='api_flashcard_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -35,5 +51,130 @@ class Summary(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     model_used = models.CharField(max_length=100, default="openrouter-default")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_summary_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+class Job(models.Model):
+    """A unit of background work (file import, AI processing) and its outcome"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.CharField(max_length=100, primary_key=True)
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.id} ({self.status})"
+
+class SearchPosting(models.Model):
+    """One entry of the search inverted index: a term found in a field of a note or flashcard"""
+    term = models.CharField(max_length=100)
+    doc_type = models.CharField(max_length=20)
+    doc_id = models.CharField(max_length=100)
+    field = models.CharField(max_length=20)
+    frequency = models.PositiveIntegerField(default=1)
+    field_length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'doc_type'], name='api_posting_term_idx'),
+            models.Index(fields=['doc_type', 'doc_id'], name='api_posting_doc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.doc_type}:{self.doc_id} ({self.field})"
+
+class SearchDocument(models.Model):
+    """Per-document field lengths recorded when a note or flashcard is indexed"""
+    doc_type = models.CharField(max_length=20)
+    doc_id = models.CharField(max_length=100)
+    field_lengths = models.JSONField(default=dict)
+
+    class Meta:
+        unique_together = ('doc_type', 'doc_id')
+
+    def __str__(self):
+        return f"{self.doc_type}:{self.doc_id}"
+
+class SearchFieldStats(models.Model):
+    """Corpus-wide totals per indexed field, used for BM25 length normalisation"""
+    doc_type = models.CharField(max_length=20)
+    field = models.CharField(max_length=20)
+    document_count = models.PositiveIntegerField(default=0)
+    total_length = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('doc_type', 'field')
+
+    def __str__(self):
+        return f"{self.doc_type}.{self.field}: {self.document_count} docs"
+
+class NoteEmbedding(models.Model):
+    """Row of the embedding file holding a note's vector; rows of deleted notes have no doc_id and are reused"""
+    row = models.PositiveIntegerField(unique=True)
+    doc_id = models.CharField(max_length=100, unique=True, null=True)
+    # Hash of the model and text the vector was computed from, so unchanged notes are not embedded again
+    text_hash = models.CharField(max_length=64, blank=True, default="")
+
+    def __str__(self):
+        return f"{self.doc_id or '(free)'} at row {self.row}"
+
+class TagAssignment(models.Model):
+    """One tag of a note, flashcard or summary, so tag lookups use an index instead of scanning JSON"""
+    tag = models.CharField(max_length=100)
+    doc_type = models.CharField(max_length=20)
+    doc_id = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('doc_type', 'doc_id', 'tag')
+        indexes = [
+            models.Index(fields=['doc_type', 'tag', 'doc_id'], name='api_tag_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} -> {self.doc_type}:{self.doc_id}"
+
+class TagCount(models.Model):
+    """Number of notes, flashcards or summaries carrying a tag, kept up to date as tags change"""
+    doc_type = models.CharField(max_length=20)
+    tag = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('doc_type', 'tag')
+
+    def __str__(self):
+        return f"{self.doc_type} {self.tag}: {self.count}"
+
+class Tombstone(models.Model):
+    """Record of a deleted note or flashcard, so syncing clients learn about the deletion"""
+    doc_type = models.CharField(max_length=20)
+    doc_id = models.CharField(max_length=100)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doc_type', 'deleted_at'], name='api_tombstone_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='api_tombstone_prune_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.doc_type}:{self.doc_id} deleted {self.deleted_at}"
@@ -0,0 +1,132 @@
+# OCR pipeline for images and scanned PDFs
+#
+# Pages are rasterized and OCR'd in a pool of worker processes, so a scanned
+# document takes roughly pages / cores times the cost of one page. This module
+# must not import Django: the workers are spawned fresh and import it alone.
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Largest width/height handed to Tesseract; bigger images are scaled down
+OCR_MAX_DIMENSION = 4000
+# Resolution scanned PDF pages are rasterized at
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+# Pages OCR'd from one scanned PDF at most
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", 100))
+# Worker processes in the OCR pool
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+# Set in worker processes of other pools, which OCR pages themselves
+_inline = False
+
+class OCRError(Exception):
+    """Raised when the OCR engine is missing or a document cannot be rasterized"""
+
+def get_pool():
+    """Shared OCR process pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the server process has threads running
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+def reset_pool(pool):
+    """Drop a pool broken by a worker that died; the next get_pool starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_inline():
+    """Pool initializer: OCR pages in this process instead of starting a nested pool"""
+    global _inline
+    _inline = True
+
+def check_tesseract():
+    """Make sure Tesseract is installed and configured"""
+    import pytesseract
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        raise OCRError(f"Tesseract not properly installed or configured: {str(e)}") from e
+
+def prepare_image(image):
+    """Scale an image down so neither side exceeds OCR_MAX_DIMENSION"""
+    from PIL import Image
+    if image.width > OCR_MAX_DIMENSION or image.height > OCR_MAX_DIMENSION:
+        # Resize image to reasonable dimensions
+        resize_ratio = min(OCR_MAX_DIMENSION / image.width, OCR_MAX_DIMENSION / image.height)
+        new_width = int(image.width * resize_ratio)
+        new_height = int(image.height * resize_ratio)
+        image = image.resize((new_width, new_height), Image.LANCZOS)
+    return image
+
+def ocr_image(image):
+    """OCR one PIL image"""
+    import pytesseract
+    return pytesseract.image_to_string(prepare_image(image))
+
+def _ocr_pdf_page(path, page_number, dpi):
+    """Worker: rasterize a single PDF page and OCR it"""
+    from pdf2image import convert_from_path
+    pages = convert_from_path(path, dpi=dpi, first_page=page_number, last_page=page_number)
+    return ocr_image(pages[0]) if pages else ""
+
+def ocr_pdf(path, page_count, dpi=None):
+    """
+    OCR the pages of a scanned PDF in parallel, the first OCR_MAX_PAGES at most.
+
+    Each worker rasterizes only its own page, so memory use is bounded by
+    one page per worker rather than the whole document.
+
+    Args:
+        path (str): Path of the PDF on disk
+        page_count (int): Number of pages in the PDF
+        dpi (int, optional): Rasterization resolution
+
+    Returns:
+        list: The text of each page OCR'd, in page order
+    """
+    check_tesseract()
+    page_count = min(page_count, OCR_MAX_PAGES)
+    dpi = dpi or OCR_DPI
+    try:
+        if _inline:
+            return [_ocr_pdf_page(path, page_number, dpi) for page_number in range(1, page_count + 1)]
+        pool = get_pool()
+        futures = [
+            pool.submit(_ocr_pdf_page, path, page_number, dpi)
+            for page_number in range(1, page_count + 1)
+        ]
+        return [future.result() for future in futures]
+    except BrokenProcessPool as e:
+        reset_pool(pool)
+        raise OCRError("An OCR worker process stopped unexpectedly") from e
+    except Exception as e:
+        raise OCRError(f"Failed to OCR scanned PDF: {str(e)}") from e
+
+def truncation_notice(page_count):
+    """A note for the end of the text of a PDF with more pages than are OCR'd, or "" """
+    if page_count <= OCR_MAX_PAGES:
+        return ""
+    return f"[Only the first {OCR_MAX_PAGES} of {page_count} pages were scanned for text (OCR_MAX_PAGES).]"
+
+def ocr_pdf_bytes(data, page_count, dpi=None):
+    """OCR a scanned PDF held in memory; the workers read it from a temporary file"""
+    handle, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(handle, "wb") as pdf_file:
+            pdf_file.write(data)
+        return ocr_pdf(path, page_count, dpi)
+    finally:
+        os.remove(path)
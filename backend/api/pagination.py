@@ -0,0 +1,79 @@
+# Keyset (cursor) pagination for the note, flashcard and summary lists
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+# Page size when only a cursor is given, and the largest page a client may ask for
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(created_at, pk):
+    """Build an opaque cursor that resumes a list after the row with this created_at and id"""
+    position = json.dumps([created_at.isoformat(), pk])
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    """Turn a cursor back into (created_at, id); raises ValueError if it is malformed"""
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError("bad timestamp")
+        return created_at, str(pk)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pages of ?limit= rows, continued with the ?cursor= of the
+    previous page's next_cursor.
+
+    Each page is found by seeking past the last (created_at, id) seen, on
+    the (created_at, id) index, so a deep page costs the same as the first.
+    Every list is paginated, DEFAULT_PAGE_SIZE rows at a time unless the
+    client asks for another limit, so no request reads a whole table.
+    """
+    ordering = ('-created_at', '-id')
+
+    def __init__(self):
+        self.next_cursor = None
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ParseError("limit must be a number")
+        return min(max(limit, 1), MAX_PAGE_SIZE)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Narrow queryset to one page, in (created_at, id) order.
+
+        The page's keys are read from the index first and the rows fetched by
+        id, so the page is still a queryset that can be projected with .values().
+        """
+        limit = self.get_limit(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                created_at, pk = decode_cursor(cursor)
+            except ValueError as e:
+                raise ParseError(str(e))
+            # Written so SQLite can seek the index on created_at rather than scan it
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+            )
+
+        keys = list(queryset.values_list('created_at', 'id')[:limit + 1])
+        if len(keys) > limit:
+            self.next_cursor = encode_cursor(*keys[limit - 1])
+        return queryset.filter(id__in=[pk for _, pk in keys[:limit]])
+
+    def get_paginated_response(self, data):
+        return Response({"results": data, "next_cursor": self.next_cursor})
@@ -0,0 +1,105 @@
+# PostgreSQL full-text search for notes and flashcards, used instead of the
+# inverted index when settings.SEARCH_BACKEND is "postgres"
+from django.db import connections, router
+
+from .models import Note, Flashcard
+from . import ranking, search_index
+
+# Text search configuration of the search_vector columns added in migration 0010
+SEARCH_CONFIG = "english"
+
+# setweight() label each field is stored under in search_vector
+FIELD_LABELS = {
+    "note": {"title": "A", "content": "B", "summary": "C", "tags": "D"},
+    "flashcard": {"title": "A", "question": "B", "answer": "C", "tags": "D"},
+}
+
+MODELS = {"note": Note, "flashcard": Flashcard}
+
+# ts_rank normalisation: divide the rank by 1 + log(document length)
+RANK_NORMALIZATION = 1
+
+def rank_weights(doc_type):
+    """
+    The {D, C, B, A} weights array for ts_rank, the field boosts of
+    ranking.FIELD_WEIGHTS scaled so the largest is 1.
+    """
+    boosts = ranking.FIELD_WEIGHTS[doc_type]
+    by_label = {label: boosts[field] for field, label in FIELD_LABELS[doc_type].items()}
+    top = max(by_label.values())
+    return [by_label[label] / top for label in "DCBA"]
+
+def build_tsquery(terms, operator):
+    """
+    A to_tsquery string for the query terms, the last one matched as a prefix
+    once it is long enough, like the inverted index does. Terms come from
+    search_index.tokenize, so they are word characters only and safe to quote.
+    """
+    quoted = [
+        f"'{term}':*" if search_index.is_prefix(terms, position) else f"'{term}'"
+        for position, term in enumerate(terms)
+    ]
+    return f" {operator} ".join(quoted)
+
+def document_query(doc_type):
+    """SELECT of the documents of one type matching the query, with their rank"""
+    table = MODELS[doc_type]._meta.db_table
+    return (
+        f"SELECT '{doc_type}'::text AS doc_type, doc.id::text AS doc_id, "
+        f"ts_rank(%s::float4[], doc.search_vector, query.all_terms, {RANK_NORMALIZATION})::float8 AS score, "
+        f"doc.search_vector AS vector "
+        f"FROM {table} AS doc, query WHERE doc.search_vector @@ query.all_terms"
+    )
+
+def rank(query, k, cursor=None):
+    """
+    Rank notes and flashcards for a query with ts_rank and return one page
+    of results, in the same order and with the same cursors as ranking.rank.
+
+    Every query term has to match; the fields in each result are the ones
+    matching any term.
+
+    Returns:
+        tuple: (list of ranking.RankedDocument, cursor for the next page or None)
+    """
+    after = ranking.decode_cursor(cursor) if cursor else None
+    terms = search_index.tokenize(query)
+    if not terms:
+        return [], None
+
+    params = [SEARCH_CONFIG, build_tsquery(terms, "&"), SEARCH_CONFIG, build_tsquery(terms, "|")]
+    params += [rank_weights("note"), rank_weights("flashcard")]
+    resume = ""
+    if after is not None:
+        # Resume strictly after the last result of the previous page (see ranking.sort_key)
+        score, doc_type, doc_id = -after[0], after[1], after[2]
+        resume = "WHERE hit.score < %s OR (hit.score = %s AND (hit.doc_type, hit.doc_id) > (%s, %s))"
+        params += [score, score, doc_type, doc_id]
+    params.append(k + 1)
+
+    sql = (
+        "WITH query AS (SELECT to_tsquery(%s::regconfig, %s) AS all_terms, "
+        "to_tsquery(%s::regconfig, %s) AS any_term), "
+        f"hit AS ({document_query('note')} UNION ALL {document_query('flashcard')}) "
+        "SELECT hit.doc_type, hit.doc_id, hit.score, "
+        "array_remove(ARRAY["
+        + ", ".join(
+            f"CASE WHEN ts_filter(hit.vector, '{{{label.lower()}}}') @@ query.any_term THEN '{label}' END"
+            for label in "ABCD"
+        )
+        + "], NULL) "
+        f"FROM hit, query {resume} "
+        "ORDER BY hit.score DESC, hit.doc_type, hit.doc_id LIMIT %s"
+    )
+
+    using = router.db_for_read(Note) or "default"
+    with connections[using].cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    page = []
+    for doc_type, doc_id, score, labels in rows[:k]:
+        fields = {field for field, label in FIELD_LABELS[doc_type].items() if label in labels}
+        page.append(ranking.RankedDocument(doc_type, doc_id, score, fields))
+    next_cursor = ranking.encode_cursor(page[-1]) if len(rows) > k and page else None
+    return page, next_cursor
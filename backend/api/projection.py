@@ -0,0 +1,80 @@
+# Compact list representations and ?fields= projection for the list endpoints
+from django.db.models.functions import Substr
+
+from .search_index import make_snippet
+
+# Length of the plain-text preview in compact lists
+PREVIEW_LENGTH = 160
+# Characters of the source column read to build a preview (it may start with markup)
+PREVIEW_SOURCE_LENGTH = 600
+
+# Fields a client may ask for, the compact default, and the column previews are cut from
+LIST_FIELDS = {
+    "note": {
+        "fields": ("id", "title", "content", "summary", "tags", "created_at", "updated_at", "preview"),
+        "compact": ("id", "title", "tags", "created_at", "updated_at", "preview"),
+        "preview_source": "content",
+    },
+    "flashcard": {
+        "fields": ("id", "title", "question", "answer", "tags", "note", "created_at", "preview"),
+        "compact": ("id", "title", "tags", "note", "created_at", "preview"),
+        "preview_source": "question",
+    },
+    "summary": {
+        "fields": (
+            "id", "title", "summary_text", "original_text", "tags",
+            "created_at", "updated_at", "model_used", "preview",
+        ),
+        "compact": ("id", "title", "tags", "created_at", "updated_at", "model_used", "preview"),
+        "preview_source": "summary_text",
+    },
+}
+
+def requested_fields(doc_type, query_params):
+    """
+    The fields a list request asked for: ?fields=a,b, or the compact set for ?view=compact.
+
+    Returns:
+        tuple: Field names, or None for the full representation
+
+    Raises:
+        ValueError: If a field is not available for this type
+    """
+    config = LIST_FIELDS[doc_type]
+    if query_params.get("fields"):
+        fields = tuple(dict.fromkeys(field.strip() for field in query_params["fields"].split(",") if field.strip()))
+        unknown = [field for field in fields if field not in config["fields"]]
+        if unknown:
+            raise ValueError(
+                f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(config['fields'])}"
+            )
+        return fields
+    if query_params.get("view") == "compact":
+        return config["compact"]
+    return None
+
+def project(doc_type, queryset, fields):
+    """
+    Read only the requested columns with .values(), so large text columns
+    are left in the database unless asked for.
+
+    A preview is cut in SQL from the first PREVIEW_SOURCE_LENGTH characters
+    of the source column, then stripped of markup.
+    """
+    columns = [field for field in fields if field != "preview"]
+    # The note foreign key is stored as note_id
+    columns = ["note_id" if field == "note" else field for field in columns]
+    if "preview" in fields:
+        queryset = queryset.annotate(
+            preview_source=Substr(LIST_FIELDS[doc_type]["preview_source"], 1, PREVIEW_SOURCE_LENGTH)
+        )
+        columns.append("preview_source")
+
+    rows = []
+    for row in queryset.values(*columns):
+        if "note_id" in row:
+            row["note"] = row.pop("note_id")
+        if "preview" in fields:
+            row["preview"] = make_snippet(row.pop("preview_source"), [], PREVIEW_LENGTH)
+        rows.append({field: row[field] for field in fields})
+    return rows
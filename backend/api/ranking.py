@@ -0,0 +1,133 @@
+# BM25F relevance ranking over the search inverted index
+import base64
+import heapq
+import json
+import math
+from collections import defaultdict, namedtuple
+
+from .models import SearchFieldStats
+from . import search_index
+
+# Term frequency saturation
+K1 = 1.2
+
+# Per-field boosts, carried over from the old fixed match points
+FIELD_WEIGHTS = {
+    "note": {"title": 5.0, "content": 3.0, "summary": 2.0, "tags": 3.0},
+    "flashcard": {"title": 5.0, "question": 2.0, "answer": 2.0, "tags": 3.0},
+}
+
+# Per-field length normalisation; short fields barely need it
+FIELD_B = {"title": 0.5, "tags": 0.3}
+DEFAULT_B = 0.75
+
+RankedDocument = namedtuple("RankedDocument", ["doc_type", "doc_id", "score", "fields"])
+
+def load_field_stats():
+    """
+    Read the precomputed corpus statistics.
+
+    Returns:
+        dict: {doc_type: {"count": documents indexed, "avg_length": {field: average terms}}}
+    """
+    stats = defaultdict(lambda: {"count": 0, "avg_length": {}})
+    for row in SearchFieldStats.objects.all():
+        doc_stats = stats[row.doc_type]
+        doc_stats["count"] = max(doc_stats["count"], row.document_count)
+        if row.document_count > 0:
+            doc_stats["avg_length"][row.field] = row.total_length / row.document_count
+    return stats
+
+def score_documents(terms):
+    """
+    Score every document that contains all of the query terms.
+
+    Field term frequencies are length-normalised and weighted, summed into one
+    pseudo-frequency per term, then saturated and multiplied by the term's IDF.
+
+    Returns:
+        list: RankedDocument entries in no particular order
+    """
+    if not terms:
+        return []
+
+    stats = load_field_stats()
+    weighted_tf = defaultdict(lambda: defaultdict(float))
+    matched_fields = defaultdict(set)
+
+    for doc_type, doc_id, field, position, frequency, field_length in search_index.lookup_postings(terms):
+        weight = FIELD_WEIGHTS.get(doc_type, {}).get(field)
+        if not weight:
+            continue
+        b = FIELD_B.get(field, DEFAULT_B)
+        avg_length = stats[doc_type]["avg_length"].get(field) or 1
+        norm = 1 - b + b * field_length / avg_length
+        key = (doc_type, doc_id)
+        weighted_tf[key][position] += weight * frequency / norm
+        matched_fields[key].add(field)
+
+    # Document frequency of each query term, per document type
+    document_frequency = defaultdict(int)
+    for (doc_type, _), per_term in weighted_tf.items():
+        for position in per_term:
+            document_frequency[(doc_type, position)] += 1
+
+    ranked = []
+    for (doc_type, doc_id), per_term in weighted_tf.items():
+        # Every query term has to appear somewhere in the document
+        if len(per_term) < len(terms):
+            continue
+        total = stats[doc_type]["count"]
+        score = 0.0
+        for position, tf in per_term.items():
+            df = document_frequency[(doc_type, position)]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            score += idf * tf / (K1 + tf)
+        ranked.append(RankedDocument(doc_type, doc_id, score, matched_fields[(doc_type, doc_id)]))
+    return ranked
+
+def sort_key(doc):
+    """Total result order: best score first, ties broken by type then id"""
+    return (-doc.score, doc.doc_type, doc.doc_id)
+
+def top_k(ranked, k, after=None):
+    """
+    Return the k best documents, best first, without sorting the whole list.
+
+    Args:
+        ranked (list): RankedDocument entries
+        k (int): Number of documents to return
+        after (tuple, optional): sort_key of the last document already returned
+
+    Returns:
+        tuple: (page of documents, True if more documents follow the page)
+    """
+    if after is not None:
+        ranked = [doc for doc in ranked if sort_key(doc) > after]
+    page = heapq.nsmallest(k + 1, ranked, key=sort_key)
+    return page[:k], len(page) > k
+
+def encode_cursor(doc):
+    """Build an opaque cursor that resumes a result list after doc"""
+    position = json.dumps([doc.score, doc.doc_type, doc.doc_id])
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    """Turn a cursor back into a sort_key; raises ValueError if it is malformed"""
+    try:
+        score, doc_type, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (-float(score), str(doc_type), str(doc_id))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def rank(query, k, cursor=None):
+    """
+    Rank notes and flashcards for a query and return one page of results.
+
+    Returns:
+        tuple: (list of RankedDocument, cursor for the next page or None)
+    """
+    after = decode_cursor(cursor) if cursor else None
+    page, has_more = top_k(score_documents(search_index.tokenize(query)), k, after)
+    next_cursor = encode_cursor(page[-1]) if has_more and page else None
+    return page, next_cursor
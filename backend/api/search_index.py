@@ -0,0 +1,235 @@
+# Inverted full-text index for notes and flashcards
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Note, Flashcard, SearchPosting, SearchDocument, SearchFieldStats
+
+# Longest term we keep in the index (matches SearchPosting.term)
+MAX_TERM_LENGTH = 100
+
+# Fields indexed for each document type
+DOCUMENT_FIELDS = {
+    "note": ("title", "content", "summary", "tags"),
+    "flashcard": ("title", "question", "answer", "tags"),
+}
+
+# Length of the excerpt returned with each search result
+SNIPPET_LENGTH = 160
+
+# The last query term is only matched as a prefix from this many characters
+PREFIX_MIN_LENGTH = 3
+# Most index terms a prefix expands to, and most of their postings read
+PREFIX_MAX_TERMS = 50
+PREFIX_MAX_POSTINGS = 20000
+
+def is_prefix(terms, position):
+    """True if the term at position is matched as a prefix: the last one, when long enough"""
+    return position == len(terms) - 1 and len(terms[position]) >= PREFIX_MIN_LENGTH
+
+def tokenize(text):
+    """Split text into lowercase word terms, ignoring HTML markup"""
+    if not text:
+        return []
+    text = re.sub(r'<[^>]+>', ' ', str(text))
+    return [term for term in re.findall(r'\w+', text.lower()) if len(term) <= MAX_TERM_LENGTH]
+
+def make_snippet(text, terms, length=SNIPPET_LENGTH):
+    """Cut a short plain-text excerpt of text around the first query term it contains"""
+    if not text:
+        return ""
+    plain = " ".join(re.sub(r'<[^>]+>', ' ', str(text)).split())
+    lower = plain.lower()
+    hits = [position for position in (lower.find(term) for term in terms) if position >= 0]
+
+    start = 0
+    if hits:
+        # Show a little context before the match, starting on a word boundary
+        start = max(min(hits) - length // 4, 0)
+        if start > 0:
+            start = plain.find(" ", start) + 1 or start
+    snippet = plain[start:start + length]
+    if start + length < len(plain):
+        snippet = snippet.rsplit(" ", 1)[0] + "..."
+    if start > 0:
+        snippet = "..." + snippet
+    return snippet.strip()
+
+def index_enabled():
+    """False when PostgreSQL full-text search is used and this index is not kept up to date"""
+    return settings.SEARCH_BACKEND == "index"
+
+def document_fields(doc_type, instance):
+    """Return the searchable text of a note or flashcard, keyed by field name"""
+    fields = {}
+    for field in DOCUMENT_FIELDS[doc_type]:
+        value = getattr(instance, field, None) or ""
+        if field == "tags":
+            value = " ".join(str(tag) for tag in value)
+        fields[field] = value
+    return fields
+
+def build_postings(doc_type, doc_id, fields):
+    """Build the posting rows (as dicts) for one document"""
+    postings = []
+    for field, text in fields.items():
+        for term, frequency in Counter(tokenize(text)).items():
+            postings.append({
+                "term": term,
+                "doc_type": doc_type,
+                "doc_id": doc_id,
+                "field": field,
+                "frequency": frequency,
+            })
+    return postings
+
+def field_lengths(fields):
+    """Count the terms in each field of a document"""
+    return {field: len(tokenize(text)) for field, text in fields.items()}
+
+def _update_field_stats(doc_type, lengths, document_delta):
+    for field, length in lengths.items():
+        stats, _ = SearchFieldStats.objects.get_or_create(doc_type=doc_type, field=field)
+        SearchFieldStats.objects.filter(pk=stats.pk).update(
+            document_count=F("document_count") + document_delta,
+            total_length=F("total_length") + length,
+        )
+
+def index_document(doc_type, instance):
+    """Replace the postings of a note or flashcard with ones built from its current text"""
+    index_documents(doc_type, [instance])
+
+def index_documents(doc_type, instances):
+    """
+    Index many notes or flashcards at once.
+
+    Used after bulk writes, which skip the model signals. The previous
+    postings of all the documents are replaced with a constant number of
+    queries rather than a few per document.
+    """
+    if not index_enabled():
+        return
+    # The last copy wins if a document is passed twice
+    instances = list({instance.pk: instance for instance in instances}.values())
+    if not instances:
+        return
+    ids = [instance.pk for instance in instances]
+    with transaction.atomic():
+        previous = {
+            document.doc_id: document
+            for document in SearchDocument.objects.filter(doc_type=doc_type, doc_id__in=ids)
+        }
+        deltas = Counter()
+        added = 0
+        created, updated, postings = [], [], []
+        for instance in instances:
+            fields = document_fields(doc_type, instance)
+            lengths = field_lengths(fields)
+            document = previous.get(instance.pk)
+            if document:
+                for field, length in lengths.items():
+                    deltas[field] += length - document.field_lengths.get(field, 0)
+                document.field_lengths = lengths
+                updated.append(document)
+            else:
+                deltas.update(lengths)
+                added += 1
+                created.append(SearchDocument(doc_type=doc_type, doc_id=instance.pk, field_lengths=lengths))
+            postings.extend(
+                SearchPosting(field_length=lengths[posting["field"]], **posting)
+                for posting in build_postings(doc_type, instance.pk, fields)
+            )
+
+        _update_field_stats(doc_type, {field: deltas[field] for field in DOCUMENT_FIELDS[doc_type]}, added)
+        SearchDocument.objects.bulk_create(created, batch_size=1000)
+        SearchDocument.objects.bulk_update(updated, ["field_lengths"], batch_size=1000)
+        SearchPosting.objects.filter(doc_type=doc_type, doc_id__in=ids).delete()
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+
+def remove_document(doc_type, doc_id):
+    """Drop a deleted note or flashcard from the index"""
+    remove_documents(doc_type, [doc_id])
+
+def remove_documents(doc_type, doc_ids):
+    """
+    Drop many deleted notes or flashcards from the index at once.
+
+    Used after bulk deletes, which skip the model signals. The field
+    statistics are updated once for the whole set.
+    """
+    if not index_enabled() or not doc_ids:
+        return
+    doc_ids = list(set(doc_ids))
+    with transaction.atomic():
+        documents = SearchDocument.objects.filter(doc_type=doc_type, doc_id__in=doc_ids)
+        deltas = Counter()
+        removed = 0
+        for lengths in documents.values_list("field_lengths", flat=True):
+            deltas.subtract(lengths)
+            removed += 1
+        if removed:
+            _update_field_stats(doc_type, {field: deltas[field] for field in DOCUMENT_FIELDS[doc_type]}, -removed)
+            documents.delete()
+        SearchPosting.objects.filter(doc_type=doc_type, doc_id__in=doc_ids).delete()
+
+def rebuild_index():
+    """Rebuild the whole index and its field statistics from the Note and Flashcard tables"""
+    with transaction.atomic():
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+        SearchFieldStats.objects.all().delete()
+        for doc_type, model in (("note", Note), ("flashcard", Flashcard)):
+            postings, documents = [], []
+            totals = Counter()
+            for instance in model.objects.only("id", *DOCUMENT_FIELDS[doc_type]).iterator():
+                fields = document_fields(doc_type, instance)
+                lengths = field_lengths(fields)
+                totals.update(lengths)
+                documents.append(SearchDocument(doc_type=doc_type, doc_id=instance.pk, field_lengths=lengths))
+                postings.extend(
+                    SearchPosting(field_length=lengths[posting["field"]], **posting)
+                    for posting in build_postings(doc_type, instance.pk, fields)
+                )
+            SearchDocument.objects.bulk_create(documents, batch_size=1000)
+            SearchPosting.objects.bulk_create(postings, batch_size=1000)
+            SearchFieldStats.objects.bulk_create([
+                SearchFieldStats(
+                    doc_type=doc_type, field=field,
+                    document_count=len(documents), total_length=totals[field],
+                )
+                for field in DOCUMENT_FIELDS[doc_type]
+            ])
+
+def lookup_postings(terms):
+    """
+    Fetch the postings for each query term.
+
+    The last term is matched as a prefix so results update while typing,
+    once it has PREFIX_MIN_LENGTH characters. It then stands for itself and
+    the first PREFIX_MAX_TERMS longer index terms starting with it, of
+    which at most PREFIX_MAX_POSTINGS postings are read; a very common
+    prefix narrows down as more is typed.
+
+    Returns:
+        list: (doc_type, doc_id, field, term_position, frequency, field_length) tuples
+    """
+    rows = []
+    for position, term in enumerate(terms):
+        postings = [SearchPosting.objects.filter(term=term)]
+        if is_prefix(terms, position):
+            # Range lookups, so the term index is used for the prefix match
+            completions = SearchPosting.objects.filter(
+                term__gt=term, term__lt=term + "\U0010ffff"
+            ).order_by("term").values_list("term", flat=True).distinct()[:PREFIX_MAX_TERMS]
+            postings.append(
+                SearchPosting.objects.filter(term__in=list(completions))[:PREFIX_MAX_POSTINGS]
+            )
+        for queryset in postings:
+            for doc_type, doc_id, field, frequency, length in queryset.values_list(
+                "doc_type", "doc_id", "field", "frequency", "field_length"
+            ):
+                rows.append((doc_type, doc_id, field, position, frequency, length))
+    return rows
@@ -0,0 +1,307 @@
+# Semantic search over notes with local sentence embeddings.
+#
+# Each note's vector is one row of a flat file of float32 values, shared by
+# all worker processes through read-only memory maps; NoteEmbedding records
+# which row belongs to which note. NumPy, like the model, is imported on
+# first use so workers start without it.
+import os
+import re
+import html
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Max
+
+from .models import Note, NoteEmbedding
+from . import ranking
+
+logger = logging.getLogger(__name__)
+
+# Embed notes on save and allow /api/search/?mode=semantic (needs transformers and torch)
+SEMANTIC_SEARCH = os.getenv("SEMANTIC_SEARCH", "false").lower() in ("1", "true", "yes")
+# Any Hugging Face sentence embedding model; run rebuild_embedding_index after changing it
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", 256))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_INDEX_PATH = os.getenv(
+    "EMBEDDING_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "note_embeddings.f32"),
+)
+
+# Rows scored beyond the requested page, covering ties and rows of deleted notes
+CANDIDATE_MARGIN = 20
+
+# Saved notes are embedded on this thread, so no request waits for the model.
+# One thread keeps the updates of each note in order (inference is serialized anyway).
+EMBEDDING_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embeddings")
+
+_model = None
+_model_lock = threading.Lock()
+# Fast tokenizers cannot be shared by threads, so one text batch is embedded at a time
+_inference_lock = threading.Lock()
+
+def get_model():
+    """
+    The tokenizer and model, loaded on first use on the CPU (transformers
+    and torch are only imported when semantic search is used).
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            from transformers import AutoModel, AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+            model = AutoModel.from_pretrained(EMBEDDING_MODEL).to("cpu").eval()
+            _model = (tokenizer, model)
+    return _model
+
+def embedding_dimension():
+    return get_model()[1].config.hidden_size
+
+def embed_texts(texts):
+    """
+    Embed texts in batches of EMBEDDING_BATCH_SIZE.
+
+    Returns:
+        numpy.ndarray: One unit-length float32 row per text (token embeddings mean pooled)
+    """
+    import numpy as np
+    import torch
+
+    tokenizer, model = get_model()
+    vectors = []
+    with _inference_lock, torch.inference_mode():
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = tokenizer(
+                texts[start:start + EMBEDDING_BATCH_SIZE], padding=True, truncation=True,
+                max_length=EMBEDDING_MAX_TOKENS, return_tensors="pt",
+            )
+            tokens = model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).to(tokens.dtype)
+            pooled = (tokens * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors.append(torch.nn.functional.normalize(pooled, dim=1).numpy())
+    if not vectors:
+        return np.zeros((0, embedding_dimension()), dtype=np.float32)
+    return np.concatenate(vectors).astype(np.float32, copy=False)
+
+def note_text(note):
+    """The text embedded for a note: its title, summary and content without markup"""
+    content = html.unescape(re.sub(r'<[^>]+>', ' ', note.content or ""))
+    return " ".join(f"{note.title}\n{note.summary or ''}\n{content}".split())
+
+def text_hash(text):
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+class VectorFile:
+    """
+    Fixed-width float32 rows in a flat file.
+
+    Rows are written with ordinary file I/O, which other processes see at
+    once through their memory maps of the same file. A map is reopened when
+    the file has grown or been replaced by a rebuild; the file is never
+    shrunk in place, which would break the maps other workers hold.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._map = None
+        self._mapped = None
+
+    def write(self, rows, vectors):
+        """Write vectors[i] at row rows[i], growing the file (with zero rows) as needed"""
+        import numpy as np
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0))
+        with os.fdopen(fd, "r+b") as f:
+            for row, vector in zip(rows, vectors):
+                data = np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+                f.seek(row * len(data))
+                f.write(data)
+
+    def replace(self, path):
+        """Swap in a complete new file; workers switch to it on their next search"""
+        os.replace(path, self.path)
+
+    def matrix(self, dimension):
+        """The rows as a read-only (rows, dimension) array mapped from the file"""
+        import numpy as np
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return np.zeros((0, dimension), dtype=np.float32)
+        with self._lock:
+            if self._mapped != (stat.st_ino, stat.st_size, dimension):
+                rows = stat.st_size // (dimension * 4)
+                self._map = (np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, dimension))
+                             if rows else np.zeros((0, dimension), dtype=np.float32))
+                self._mapped = (stat.st_ino, stat.st_size, dimension)
+            return self._map
+
+VECTORS = VectorFile(EMBEDDING_INDEX_PATH)
+
+def top_rows(matrix, vector, count, at_most=None):
+    """
+    Find the rows most similar to vector in one matrix-vector product.
+    As every row is unit length (or zero, once its note is deleted) the dot
+    product is the cosine similarity; rows scoring 0 or less are left out.
+
+    Args:
+        matrix (numpy.ndarray): (rows, dimension) float32 vectors
+        vector (numpy.ndarray): Unit-length float32 query vector
+        count (int): Number of rows to return
+        at_most (float, optional): Only consider rows scoring at most this
+
+    Returns:
+        tuple: (row numbers, their scores), best first
+    """
+    import numpy as np
+    scores = matrix @ vector
+    candidates = scores > 0
+    if at_most is not None:
+        candidates &= scores <= at_most
+    rows = np.flatnonzero(candidates)
+    if len(rows) > count:
+        # Partial selection; only the count best are sorted
+        rows = rows[np.argpartition(-scores[rows], count - 1)[:count]]
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    return rows, scores[rows]
+
+def rank(query, k, cursor=None):
+    """
+    Rank notes by the cosine similarity of their embedding to the query's and
+    return one page of results, with the same cursors as ranking.rank.
+
+    Returns:
+        tuple: (list of ranking.RankedDocument, cursor for the next page or None)
+    """
+    after = ranking.decode_cursor(cursor) if cursor else None
+    text = " ".join(query.split())
+    if not text:
+        return [], None
+
+    matrix = VECTORS.matrix(embedding_dimension())
+    if not len(matrix):
+        return [], None
+    rows, scores = top_rows(
+        matrix, embed_texts([text])[0], k + 1 + CANDIDATE_MARGIN, None if after is None else -after[0]
+    )
+    notes = dict(
+        NoteEmbedding.objects.filter(row__in=rows.tolist(), doc_id__isnull=False).values_list("row", "doc_id")
+    )
+    ranked = [
+        ranking.RankedDocument("note", notes[row], float(score), set())
+        for row, score in zip(rows.tolist(), scores.tolist()) if row in notes
+    ]
+    page, has_more = ranking.top_k(ranked, k, after)
+    next_cursor = ranking.encode_cursor(page[-1]) if has_more and page else None
+    return page, next_cursor
+
+def allocate_row(doc_id):
+    """A row for a note embedded for the first time: one freed by a deleted note, else a new last row"""
+    for attempt in range(3):
+        try:
+            with transaction.atomic():
+                free = NoteEmbedding.objects.select_for_update(skip_locked=True).filter(doc_id=None).first()
+                if free:
+                    free.doc_id = doc_id
+                    free.save(update_fields=["doc_id"])
+                    return free
+                last = NoteEmbedding.objects.aggregate(last=Max("row"))["last"]
+                return NoteEmbedding.objects.create(row=0 if last is None else last + 1, doc_id=doc_id)
+        except IntegrityError:
+            # Another worker took the same row, or is embedding the same note
+            existing = NoteEmbedding.objects.filter(doc_id=doc_id).first()
+            if existing:
+                return existing
+    raise IntegrityError(f"Could not allocate an embedding row for note {doc_id}")
+
+def index_notes(notes):
+    """Embed the notes whose text changed since they were last embedded and write their vectors"""
+    texts = {note.pk: note_text(note) for note in notes}
+    hashes = {pk: text_hash(text) for pk, text in texts.items()}
+    existing = {
+        embedding.doc_id: embedding
+        for embedding in NoteEmbedding.objects.filter(doc_id__in=list(texts))
+    }
+    stale = [pk for pk in texts if pk not in existing or existing[pk].text_hash != hashes[pk]]
+    if not stale:
+        return
+
+    vectors = embed_texts([texts[pk] for pk in stale])
+    embeddings = [existing.get(pk) or allocate_row(pk) for pk in stale]
+    VECTORS.write([embedding.row for embedding in embeddings], vectors)
+    # Recorded after the vectors are written, so a failed write is retried on the next save
+    for embedding, pk in zip(embeddings, stale):
+        embedding.text_hash = hashes[pk]
+    NoteEmbedding.objects.bulk_update(embeddings, ["text_hash"], batch_size=1000)
+
+def remove_notes(doc_ids):
+    """Zero the rows of deleted notes and free them for reuse"""
+    import numpy as np
+    embeddings = NoteEmbedding.objects.filter(doc_id__in=list(doc_ids))
+    rows = list(embeddings.values_list("row", flat=True))
+    if rows:
+        VECTORS.write(rows, np.zeros((len(rows), embedding_dimension()), dtype=np.float32))
+        NoteEmbedding.objects.filter(row__in=rows).update(doc_id=None, text_hash="")
+
+def after_commit(function, *args):
+    """
+    Run function on the embedding thread once the current transaction
+    commits, so the model runs outside the request and never for a rolled
+    back save. A failure is logged; the save it follows has already succeeded.
+    """
+    if not SEMANTIC_SEARCH:
+        return
+
+    def run():
+        close_old_connections()
+        try:
+            function(*args)
+        except Exception as e:
+            logger.error(f"Updating note embeddings failed: {str(e)}")
+        finally:
+            # The thread outlives requests, so give back its connection explicitly
+            connections.close_all()
+
+    transaction.on_commit(lambda: EMBEDDING_EXECUTOR.submit(run))
+
+def schedule_index(notes):
+    after_commit(index_notes, list(notes))
+
+def schedule_removal(doc_ids):
+    after_commit(remove_notes, list(doc_ids))
+
+def rebuild_index():
+    """
+    Embed every note again and replace the embedding file and its rows.
+
+    Returns:
+        int: Number of notes embedded
+    """
+    partial = f"{EMBEDDING_INDEX_PATH}.rebuild"
+    embeddings = []
+    with open(partial, "wb") as f:
+        notes = Note.objects.only("id", "title", "content", "summary").order_by("pk")
+        batch = []
+        for note in notes.iterator(chunk_size=1000):
+            batch.append(note)
+            if len(batch) == EMBEDDING_BATCH_SIZE * 8:
+                embeddings += write_batch(f, batch, len(embeddings))
+                batch = []
+        if batch:
+            embeddings += write_batch(f, batch, len(embeddings))
+
+    with transaction.atomic():
+        NoteEmbedding.objects.all().delete()
+        NoteEmbedding.objects.bulk_create(embeddings, batch_size=1000)
+        VECTORS.replace(partial)
+    return len(embeddings)
+
+def write_batch(f, notes, first_row):
+    texts = [note_text(note) for note in notes]
+    f.write(embed_texts(texts).tobytes())
+    return [
+        NoteEmbedding(row=first_row + i, doc_id=note.pk, text_hash=text_hash(text))
+        for i, (note, text) in enumerate(zip(notes, texts))
+    ]
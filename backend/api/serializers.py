@@ -9,4 +9,18 @@ class NoteSerializer(serializers.ModelSerializer):
 class FlashcardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Flashcard
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__'
+
+class NoteBulkSerializer(NoteSerializer):
+    """Validates notes for the bulk endpoints, which look up existing IDs in one query themselves"""
+    class Meta(NoteSerializer.Meta):
+        extra_kwargs = {'id': {'validators': []}}
+
+class FlashcardBulkSerializer(FlashcardSerializer):
+    """Validates flashcards for batch creation without a query per card; the view checks IDs and notes in bulk"""
+    id = serializers.CharField(max_length=100, required=False)
+    note = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+
+    def validate_note(self, value):
+        # "" means no note, as it does for the PrimaryKeyRelatedField of FlashcardSerializer
+        return value or None
@@ -0,0 +1,63 @@
+# Keep the search, tag and note embedding indexes in sync with note, flashcard
+# and summary writes, and leave tombstones for deleted notes and flashcards
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Note, Flashcard, Summary
+from . import search_index, semantic_index, sync, tag_index
+
+_bulk = threading.local()
+
+@contextmanager
+def bulk_deletion():
+    """
+    Silence the delete handlers in this thread, for a bulk delete that
+    updates the indexes and tombstones for the whole set itself.
+    """
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        _bulk.active = False
+
+def in_bulk_deletion():
+    return getattr(_bulk, "active", False)
+
+@receiver(post_save, sender=Note)
+def index_note(sender, instance, **kwargs):
+    search_index.index_document("note", instance)
+    tag_index.index_tags("note", [instance])
+    semantic_index.schedule_index([instance])
+
+@receiver(post_delete, sender=Note)
+def unindex_note(sender, instance, **kwargs):
+    if in_bulk_deletion():
+        return
+    search_index.remove_document("note", instance.pk)
+    tag_index.remove_tags("note", [instance.pk])
+    semantic_index.schedule_removal([instance.pk])
+    sync.record_deletion("note", instance.pk)
+
+@receiver(post_save, sender=Flashcard)
+def index_flashcard(sender, instance, **kwargs):
+    search_index.index_document("flashcard", instance)
+    tag_index.index_tags("flashcard", [instance])
+
+@receiver(post_delete, sender=Flashcard)
+def unindex_flashcard(sender, instance, **kwargs):
+    if in_bulk_deletion():
+        return
+    search_index.remove_document("flashcard", instance.pk)
+    tag_index.remove_tags("flashcard", [instance.pk])
+    sync.record_deletion("flashcard", instance.pk)
+
+@receiver(post_save, sender=Summary)
+def index_summary(sender, instance, **kwargs):
+    tag_index.index_tags("summary", [instance])
+
+@receiver(post_delete, sender=Summary)
+def unindex_summary(sender, instance, **kwargs):
+    tag_index.remove_tags("summary", [instance.pk])
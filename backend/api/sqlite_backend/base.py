@@ -0,0 +1,17 @@
+# SQLite backend whose transactions take the write lock up front
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's SQLite backend, but atomic blocks start with BEGIN IMMEDIATE
+    (what Django 5.1 offers as the "transaction_mode" option).
+
+    A deferred transaction that reads and then writes, as the search and tag
+    indexing do, cannot wait for another process's write to finish: SQLite
+    fails it with "database is locked" at once, whatever the busy timeout.
+    Taking the write lock at BEGIN makes it wait its turn instead.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
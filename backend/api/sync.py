@@ -0,0 +1,142 @@
+# Conditional GET validators and delta sync for notes and flashcards
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+from .models import Note, Flashcard, Tombstone
+
+SYNCED_MODELS = {
+    "note": Note,
+    "flashcard": Flashcard,
+}
+
+# How long deletions are remembered; clients that last synced before this get a full resync
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", 90))
+
+def tombstone_cutoff():
+    """Oldest deletion time that is still guaranteed to have a tombstone"""
+    return timezone.now() - timedelta(days=SYNC_TOMBSTONE_DAYS)
+
+def record_deletion(doc_type, doc_id):
+    """Leave a tombstone for a deleted record"""
+    record_deletions(doc_type, [doc_id])
+
+def record_deletions(doc_type, doc_ids):
+    """Leave tombstones for many deleted records at once"""
+    deleted_at = timezone.now()
+    Tombstone.objects.bulk_create([
+        Tombstone(doc_type=doc_type, doc_id=doc_id, deleted_at=deleted_at) for doc_id in doc_ids
+    ], batch_size=1000)
+
+def prune_tombstones():
+    """Drop the tombstones past retention; run once per deleting request, not per deletion"""
+    return Tombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()[0]
+
+def parse_since(value):
+    """
+    Parse a ?since= value, either an ISO 8601 timestamp (as returned in
+    server_time) or seconds since the epoch.
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    value = value.strip()
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+    # An unencoded "+" in the UTC offset arrives as a space
+    parsed = parse_datetime(value) or parse_datetime(value.replace(" ", "+"))
+    if parsed is None:
+        raise ValueError(f"Invalid since timestamp: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+def _latest_deletion(doc_type):
+    return (Tombstone.objects.filter(doc_type=doc_type)
+            .aggregate(latest=Max("deleted_at"))["latest"])
+
+def _etag(*parts):
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+def list_validators(doc_type, queryset, full_path):
+    """
+    ETag and Last-Modified for a list, from one aggregate over the filtered
+    rows plus the latest deletion, without reading the rows themselves.
+
+    The row count catches deletes, the newest updated_at catches creates and
+    edits, and the full path keeps pages, filters and views apart.
+
+    Returns:
+        tuple: (etag, last_modified), last_modified being None for an empty list
+    """
+    stats = queryset.order_by().aggregate(count=Count("id"), latest=Max("updated_at"))
+    deleted = _latest_deletion(doc_type)
+    etag = _etag(doc_type, full_path, stats["count"], stats["latest"], deleted)
+    last_modified = max(filter(None, [stats["latest"], deleted]), default=None)
+    return etag, last_modified
+
+def object_validators(doc_type, instance):
+    """ETag and Last-Modified for a single note or flashcard"""
+    return _etag(doc_type, instance.pk, instance.updated_at), instance.updated_at
+
+def not_modified(request, etag, last_modified):
+    """The 304 response for a conditional GET whose copy is still current, else None"""
+    # Whole seconds, as sent in the Last-Modified header
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+def set_validators(response, etag, last_modified):
+    """
+    Attach the validators, and have clients revalidate before reusing a cached copy.
+
+    Last-Modified has whole-second resolution, so it is left out while the
+    last change is in the current second: an edit later in that second
+    would carry the same header, and If-Modified-Since would hide it. The
+    ETag changes with every edit and covers those responses.
+    """
+    response["ETag"] = etag
+    if last_modified and int(last_modified.timestamp()) < int(timezone.now().timestamp()):
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def changes_since(since, serializers):
+    """
+    Records changed and deleted since a timestamp, for each synced type.
+
+    Args:
+        since: Aware datetime of the client's last sync, or None for everything
+        serializers: Serializer class for each doc type
+
+    Returns:
+        dict: "full" (True when the client must replace its copy, because it
+        never synced or last synced before the oldest tombstone), the changed
+        records per type, and the deleted IDs per type
+    """
+    full = since is None or since < tombstone_cutoff()
+    changed, deleted = {}, {}
+    for doc_type, model in SYNCED_MODELS.items():
+        queryset = model.objects.order_by("updated_at", "id")
+        if not full:
+            queryset = queryset.filter(updated_at__gte=since)
+        changed[doc_type] = serializers[doc_type](queryset, many=True).data
+
+        if full:
+            deleted[doc_type] = []
+            continue
+        tombstoned = set(Tombstone.objects
+                         .filter(doc_type=doc_type, deleted_at__gte=since)
+                         .values_list("doc_id", flat=True))
+        # An ID deleted and then created again is a change, not a deletion
+        recreated = set(model.objects.filter(id__in=tombstoned).values_list("id", flat=True))
+        deleted[doc_type] = sorted(tombstoned - recreated)
+    return {"full": full, "changed": changed, "deleted": deleted}
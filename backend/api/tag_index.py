@@ -0,0 +1,162 @@
+# Normalized tag table for notes, flashcards and summaries
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Note, Flashcard, Summary, TagAssignment, TagCount
+
+# Models whose tags are indexed, by document type
+TAGGED_MODELS = {
+    "note": Note,
+    "flashcard": Flashcard,
+    "summary": Summary,
+}
+
+# Longest tag we keep in the index (matches TagAssignment.tag)
+MAX_TAG_LENGTH = 100
+
+# Tag filter modes: documents carrying every tag, or any of them
+MATCH_ALL = "all"
+MATCH_ANY = "any"
+
+def normalize_tag(tag):
+    """Tags match case-insensitively and ignoring surrounding whitespace"""
+    return " ".join(str(tag).split()).lower()[:MAX_TAG_LENGTH]
+
+def item_tags(instance):
+    """The distinct normalized tags of a note, flashcard or summary"""
+    tags = instance.tags if isinstance(instance.tags, list) else []
+    return sorted({normalize_tag(tag) for tag in tags if normalize_tag(tag)})
+
+def _update_tag_counts(doc_type, deltas):
+    deltas = {tag: delta for tag, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    TagCount.objects.bulk_create(
+        [TagCount(doc_type=doc_type, tag=tag) for tag, delta in deltas.items() if delta > 0],
+        ignore_conflicts=True,
+    )
+    for tag, delta in deltas.items():
+        TagCount.objects.filter(doc_type=doc_type, tag=tag).update(count=F("count") + delta)
+    TagCount.objects.filter(doc_type=doc_type, tag__in=list(deltas), count__lte=0).delete()
+
+def index_tags(doc_type, instances):
+    """
+    Bring the tag rows and tag counts of some documents up to date with their current tags.
+
+    Only tags that were added or removed are written.
+    """
+    instances = list({instance.pk: instance for instance in instances}.values())
+    if not instances:
+        return
+    current = {(instance.pk, tag) for instance in instances for tag in item_tags(instance)}
+    with transaction.atomic():
+        previous = set(TagAssignment.objects.filter(
+            doc_type=doc_type, doc_id__in=[instance.pk for instance in instances]
+        ).values_list("doc_id", "tag"))
+        removed = previous - current
+        added = current - previous
+
+        removed_by_tag = defaultdict(list)
+        for doc_id, tag in removed:
+            removed_by_tag[tag].append(doc_id)
+        for tag, doc_ids in removed_by_tag.items():
+            TagAssignment.objects.filter(doc_type=doc_type, tag=tag, doc_id__in=doc_ids).delete()
+        TagAssignment.objects.bulk_create([
+            TagAssignment(tag=tag, doc_type=doc_type, doc_id=doc_id) for doc_id, tag in added
+        ], batch_size=1000)
+
+        deltas = Counter(tag for _, tag in added)
+        deltas.subtract(tag for _, tag in removed)
+        _update_tag_counts(doc_type, deltas)
+
+def remove_tags(doc_type, doc_ids):
+    """Drop the tag rows of deleted documents"""
+    if not doc_ids:
+        return
+    with transaction.atomic():
+        assignments = TagAssignment.objects.filter(doc_type=doc_type, doc_id__in=list(doc_ids))
+        deltas = Counter()
+        deltas.subtract(assignments.values_list("tag", flat=True))
+        assignments.delete()
+        _update_tag_counts(doc_type, deltas)
+
+def rebuild_tag_counts():
+    """Recount every tag from the tag table"""
+    with transaction.atomic():
+        TagCount.objects.all().delete()
+        TagCount.objects.bulk_create([
+            TagCount(doc_type=row["doc_type"], tag=row["tag"], count=row["count"])
+            for row in TagAssignment.objects.values("doc_type", "tag").annotate(count=Count("doc_id"))
+        ], batch_size=1000)
+
+def rebuild_tag_index():
+    """Rebuild the whole tag table and the tag counts from the tagged models"""
+    with transaction.atomic():
+        TagAssignment.objects.all().delete()
+        for doc_type, model in TAGGED_MODELS.items():
+            rows = [
+                TagAssignment(tag=tag, doc_type=doc_type, doc_id=instance.pk)
+                for instance in model.objects.only("id", "tags").iterator()
+                for tag in item_tags(instance)
+            ]
+            TagAssignment.objects.bulk_create(rows, batch_size=1000)
+        rebuild_tag_counts()
+
+def tagged_ids(doc_type, tag):
+    """Subquery of the IDs of the documents carrying a tag"""
+    return TagAssignment.objects.filter(doc_type=doc_type, tag=normalize_tag(tag)).values("doc_id")
+
+def parse_tag_filter(query_params):
+    """
+    Read the tag filter of a list request.
+
+    Tags come as ?tags=a,b or repeated ?tag=a&tag=b; ?tag_mode=any switches
+    from requiring every tag (the default) to requiring any of them.
+
+    Returns:
+        tuple: (normalized tags, mode), tags being empty when there is no filter
+    """
+    raw = query_params.getlist("tag") + [
+        tag for value in query_params.getlist("tags") for tag in value.split(",")
+    ]
+    tags = sorted({normalize_tag(tag) for tag in raw if normalize_tag(tag)})
+    mode = MATCH_ANY if query_params.get("tag_mode", MATCH_ALL).lower() in ("any", "or") else MATCH_ALL
+    return tags, mode
+
+def filter_by_tags(queryset, doc_type, tags, mode=MATCH_ALL):
+    """Restrict a queryset of notes, flashcards or summaries to those with all (or any) of the tags"""
+    if not tags:
+        return queryset
+    if mode == MATCH_ANY:
+        return queryset.filter(
+            id__in=TagAssignment.objects.filter(doc_type=doc_type, tag__in=tags).values("doc_id")
+        )
+    # One indexed subquery per tag; SQLite plans a GROUP BY/HAVING over all tags much worse
+    for tag in tags:
+        queryset = queryset.filter(id__in=tagged_ids(doc_type, tag))
+    return queryset
+
+def tag_counts(doc_type=None, prefix=None, limit=None):
+    """
+    The precomputed number of documents per tag, most used first.
+
+    Args:
+        doc_type (str, optional): Count only notes, flashcards or summaries
+        prefix (str, optional): Only tags starting with this
+        limit (int, optional): Most tags returned
+
+    Returns:
+        list: {"tag", "count"} dicts
+    """
+    counts = TagCount.objects.all()
+    if doc_type:
+        counts = counts.filter(doc_type=doc_type)
+    if prefix:
+        prefix = normalize_tag(prefix)
+        counts = counts.filter(tag__gte=prefix, tag__lt=prefix + "\U0010ffff")
+    rows = counts.values("tag").annotate(total=Sum("count")).order_by("-total", "tag")
+    if limit:
+        rows = rows[:limit]
+    return [{"tag": row["tag"], "count": row["total"]} for row in rows]
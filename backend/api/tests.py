@@ -0,0 +1,1369 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from . import ai_utils, extractors, jobs, ocr, pagination, pg_search, search_index, semantic_index, sync, views
+from .disk_cache import DiskCache
+from .models import (
+    Note, Flashcard, Job, NoteEmbedding, SearchDocument, Summary, TagAssignment, TagCount, Tombstone,
+)
+
+# Long enough to be sent to the model rather than returned as its own summary
+LONG_TEXT = "Neural networks learn layered representations of their input data. " * 4
+
+
+def completion(text):
+    """Mock upstream answer: a whole chat completion"""
+    def respond(handler):
+        body = json.dumps({"choices": [{"message": {"content": text}}]}).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+    return respond
+
+
+def error(status_code):
+    """Mock upstream answer: an error status"""
+    def respond(handler):
+        body = b'{"error": "unavailable"}'
+        handler.send_response(status_code)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+    return respond
+
+
+def stalled(seconds):
+    """Mock upstream answer: nothing for longer than the client waits, then a completion"""
+    def respond(handler):
+        time.sleep(seconds)
+        try:
+            completion("Too late")(handler)
+        except ConnectionError:
+            # The client gave up waiting, as intended
+            pass
+    return respond
+
+
+def stream(pieces, done=True):
+    """Mock upstream answer: a streamed completion, cut off before [DONE] unless done is set"""
+    def respond(handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.end_headers()
+        for piece in pieces:
+            chunk = {"choices": [{"delta": {"content": piece}}]}
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+        if done:
+            handler.wfile.write(b"data: [DONE]\n\n")
+        # HTTP/1.0: the response ends when the connection closes
+    return respond
+
+
+class MockUpstream:
+    """
+    Stand-in for OpenRouter: an http.server on a local port, in a thread,
+    giving the queued answers in turn (the last one from then on).
+    """
+    def __init__(self):
+        self.answers = []
+        self.requests = 0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                upstream.requests += 1
+                answer = upstream.answers.pop(0) if len(upstream.answers) > 1 else upstream.answers[0]
+                answer(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DiskCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.path = os.path.join(directory, "cache.sqlite3")
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = DiskCache(self.path, ttl=60)
+        with mock.patch("api.disk_cache.time.time", return_value=1000):
+            cache.set("key", {"value": 1})
+        with mock.patch("api.disk_cache.time.time", return_value=1059):
+            self.assertEqual(cache.get("key"), {"value": 1})
+        with mock.patch("api.disk_cache.time.time", return_value=1061):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = DiskCache(self.path, max_entries=2)
+        for now, key in ((1, "a"), (2, "b")):
+            with mock.patch("api.disk_cache.time.time", return_value=now):
+                cache.set(key, key)
+        with mock.patch("api.disk_cache.time.time", return_value=3):
+            cache.get("a")
+        with mock.patch("api.disk_cache.time.time", return_value=4):
+            cache.set("c", "c")
+
+        self.assertEqual([cache.get(key) for key in "abc"], ["a", None, "c"])
+
+    def test_entries_are_evicted_past_max_bytes(self):
+        cache = DiskCache(self.path, max_bytes=25)
+        for now, key in enumerate("abc"):
+            with mock.patch("api.disk_cache.time.time", return_value=now):
+                cache.set(key, "x" * 8)
+
+        # Each value is 10 bytes of JSON, so only the two newest fit
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertIsNone(cache.get("a"))
+
+    def test_stats_count_hits_and_misses(self):
+        cache = DiskCache(self.path)
+        cache.set("key", "value")
+        cache.get("key")
+        cache.get("key")
+        cache.get("missing")
+
+        self.assertEqual(cache.stats(), {
+            "hits": 2, "misses": 1, "hit_rate": 0.6667, "entries": 1, "size_bytes": len('"value"'),
+        })
+        cache.clear()
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_unreadable_store_is_a_miss_not_an_error(self):
+        # A directory cannot be opened as a database
+        cache = DiskCache(os.path.dirname(self.path))
+        cache.set("key", "value")
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertIsNone(cache.stats()["entries"])
+
+    def test_stats_endpoint_survives_an_unreadable_store(self):
+        with mock.patch.object(ai_utils, "LLM_CACHE", DiskCache(os.path.dirname(self.path))), \
+             mock.patch.object(extractors, "EXTRACTION_CACHE", DiskCache(self.path)):
+            response = self.client.get("/api/cache/stats/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["llm"]["entries"])
+
+
+class LLMTestCase(SimpleTestCase):
+    """Points the OpenRouter client at a MockUpstream, with a fresh cache and circuit breaker and no backoff"""
+    def setUp(self):
+        self.upstream = MockUpstream()
+        self.upstream.start()
+        self.addCleanup(self.upstream.stop)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.circuit = ai_utils.CircuitBreaker(failure_threshold=2, reset_timeout=0.3)
+        for name, value in {
+            "OPENROUTER_URL": self.upstream.url,
+            "LLM_CACHE": DiskCache(os.path.join(directory, "llm_cache.sqlite3")),
+            "LLM_CIRCUIT": self.circuit,
+            "LLM_BACKOFF_BASE": 0,
+            "LLM_MAX_RETRIES": 2,
+        }.items():
+            patcher = mock.patch.object(ai_utils, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class SummaryCacheTests(LLMTestCase):
+    def test_same_text_reuses_the_summary(self):
+        self.upstream.answers = [completion("A summary"), completion("Another summary")]
+
+        first = ai_utils.summarize_text(LONG_TEXT)
+        second = ai_utils.summarize_text(LONG_TEXT)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.upstream.requests, 1)
+        self.assertEqual(ai_utils.LLM_CACHE.stats()["hits"], 1)
+
+    def test_changed_text_or_model_is_a_miss(self):
+        self.upstream.answers = [completion("One"), completion("Two"), completion("Three")]
+
+        ai_utils.summarize_text(LONG_TEXT)
+        ai_utils.summarize_text(LONG_TEXT + ".")
+        ai_utils.summarize_text(LONG_TEXT, "another/model")
+
+        self.assertEqual(self.upstream.requests, 3)
+
+
+class StreamInterruptionTests(LLMTestCase):
+    def sse_events(self, response):
+        body = b"".join(response.streaming_content).decode("utf-8")
+        return [block.split("\n")[0][len("event: "):] for block in body.strip().split("\n\n")]
+
+    def summarize_stream(self):
+        return self.client.post(
+            "/api/summarize/?stream=true", {"text": LONG_TEXT}, content_type="application/json"
+        )
+
+    def test_cut_off_stream_is_an_error_and_not_cached(self):
+        self.upstream.answers = [stream(["Partial ", "summary "], done=False)]
+
+        events = self.sse_events(self.summarize_stream())
+
+        self.assertEqual(events, ["token", "token", "error"])
+        self.assertIsNone(ai_utils.cached_summary(LONG_TEXT, ai_utils.AI_MODEL))
+
+    def test_complete_stream_is_cached(self):
+        self.upstream.answers = [stream(["Whole ", "summary"])]
+
+        events = self.sse_events(self.summarize_stream())
+
+        self.assertEqual(events, ["token", "token", "done"])
+        self.assertEqual(ai_utils.cached_summary(LONG_TEXT, ai_utils.AI_MODEL)["summary"], "Whole summary")
+
+    def test_cut_off_async_stream_raises(self):
+        self.upstream.answers = [stream(["Partial "], done=False)]
+
+        async def consume():
+            try:
+                return [event async for event, _ in ai_utils.astream_summary(LONG_TEXT)]
+            finally:
+                await ai_utils.get_async_session().close()
+
+        with self.assertRaises(ai_utils.StreamInterrupted):
+            asyncio.run(consume())
+        self.assertIsNone(ai_utils.cached_summary(LONG_TEXT, ai_utils.AI_MODEL))
+
+
+class StreamedFlashcardTests(LLMTestCase):
+    # The model's answer, split so that cards and separators straddle the pieces
+    PIECES = [
+        "Q: What do axolotls regrow?\nA: Their lim", "bs and organs\n--",
+        "-\nQ: Where do axolotls live?\nA: In Mexican lakes\n---\n",
+    ]
+
+    def test_cards_are_parsed_as_their_separator_arrives(self):
+        parser = ai_utils.FlashcardStreamParser("Axolotls")
+
+        self.assertEqual(parser.feed(self.PIECES[0]), [])
+        self.assertEqual(parser.feed(self.PIECES[1]), [])
+        self.assertEqual([card["question"] for card in parser.feed(self.PIECES[2])], [
+            "What do axolotls regrow?", "Where do axolotls live?",
+        ])
+        self.assertEqual(parser.close(), [])
+
+    def test_stream_sends_a_card_per_event(self):
+        self.upstream.answers = [stream(self.PIECES)]
+
+        response = self.client.post(
+            "/api/generate-flashcards/?stream=true", {"text": "Axolotls", "title": "Axolotls"},
+            content_type="application/json",
+        )
+        body = b"".join(response.streaming_content).decode("utf-8")
+
+        events = [block.split("\n") for block in body.strip().split("\n\n")]
+        self.assertEqual([event[0] for event in events], ["event: flashcard", "event: flashcard", "event: done"])
+        self.assertEqual(json.loads(events[0][1][len("data: "):])["answer"], "Their limbs and organs")
+        self.assertEqual(self.upstream.requests, 1)
+
+    def test_cut_off_stream_keeps_the_complete_cards(self):
+        self.upstream.answers = [stream(self.PIECES[:2] + ["-\nQ: Where do axolotls"], done=False)]
+
+        cards = list(ai_utils.iter_streamed_flashcards("Axolotls"))
+
+        self.assertEqual([card["question"] for card in cards], ["What do axolotls regrow?"])
+
+    def test_async_stream_yields_cards(self):
+        self.upstream.answers = [stream(self.PIECES)]
+
+        async def consume():
+            try:
+                return [card async for card in ai_utils.aiter_streamed_flashcards("Axolotls")]
+            finally:
+                await ai_utils.get_async_session().close()
+
+        self.assertEqual(len(asyncio.run(consume())), 2)
+
+
+class RetryAndCircuitTests(LLMTestCase):
+    def test_unavailable_upstream_is_retried(self):
+        self.upstream.answers = [error(503), completion("Hello")]
+
+        self.assertEqual(ai_utils.query_llama("Hi"), "Hello")
+        self.assertEqual(self.upstream.requests, 2)
+        self.assertEqual(self.circuit.failures, 0)
+
+    def test_client_error_is_not_retried(self):
+        self.upstream.answers = [error(400)]
+
+        self.assertIsNone(ai_utils.query_llama("Hi"))
+        self.assertEqual(self.upstream.requests, 1)
+
+    def test_timeout_gives_up_after_retries(self):
+        self.upstream.answers = [stalled(0.5)]
+
+        with mock.patch.object(ai_utils, "LLM_READ_TIMEOUT", 0.1):
+            start = time.monotonic()
+            self.assertIsNone(ai_utils.query_llama("Hi"))
+
+        self.assertLess(time.monotonic() - start, 0.5 * 3)
+        self.assertEqual(self.upstream.requests, 3)
+        self.assertEqual(self.circuit.failures, 1)
+
+    def test_timeout_falls_back_to_rule_based_summary(self):
+        self.upstream.answers = [stalled(0.5)]
+
+        with mock.patch.object(ai_utils, "LLM_READ_TIMEOUT", 0.1), \
+             mock.patch.object(ai_utils, "LLM_MAX_RETRIES", 0):
+            result = ai_utils.summarize_text(LONG_TEXT)
+
+        self.assertNotEqual(result["model_used"], ai_utils.AI_MODEL)
+        self.assertIsNone(ai_utils.cached_summary(LONG_TEXT, ai_utils.AI_MODEL))
+
+    def test_circuit_opens_and_closes_after_cooldown(self):
+        self.upstream.answers = [error(503)]
+
+        # Each call fails after its retries; the second opens the circuit
+        self.assertIsNone(ai_utils.query_llama("Hi"))
+        self.assertIsNone(ai_utils.query_llama("Hi"))
+        self.assertTrue(self.circuit.is_open)
+        self.assertEqual(self.upstream.requests, 6)
+
+        # Refused without calling the upstream until the cooldown ends
+        self.assertIsNone(ai_utils.query_llama("Hi"))
+        self.assertEqual(self.upstream.requests, 6)
+
+        time.sleep(self.circuit.reset_timeout)
+        self.upstream.answers = [completion("Back")]
+        self.assertEqual(ai_utils.query_llama("Hi"), "Back")
+        self.assertFalse(self.circuit.is_open)
+
+    def test_failed_trial_call_opens_circuit_again(self):
+        self.upstream.answers = [error(503)]
+        with mock.patch.object(ai_utils, "LLM_MAX_RETRIES", 0):
+            ai_utils.query_llama("Hi")
+            ai_utils.query_llama("Hi")
+            time.sleep(self.circuit.reset_timeout)
+
+            self.assertIsNone(ai_utils.query_llama("Hi"))
+            self.assertEqual(self.upstream.requests, 3)
+            self.assertTrue(self.circuit.is_open)
+            self.assertIsNone(ai_utils.query_llama("Hi"))
+            self.assertEqual(self.upstream.requests, 3)
+
+    def test_async_client_retries_unavailable_upstream(self):
+        self.upstream.answers = [error(503), completion("Hello")]
+
+        async def query():
+            try:
+                return await ai_utils.aquery_llama("Hi")
+            finally:
+                await ai_utils.get_async_session().close()
+
+        self.assertEqual(asyncio.run(query()), "Hello")
+        self.assertEqual(self.upstream.requests, 2)
+
+
+class SearchTests(TestCase):
+    """/api/search/ with whichever backend SEARCH_BACKEND selects (the inverted index on SQLite)"""
+    def setUp(self):
+        self.gills = Note.objects.create(
+            id="axolotl-gills", title="Axolotl gills",
+            content="<p>The axolotl breathes through feathery external gills.</p>", tags=["biology"],
+        )
+        self.limbs = Note.objects.create(
+            id="axolotl-limbs", title="Regrowing limbs",
+            content="<p>A salamander such as the axolotl regrows lost limbs.</p>", tags=["regeneration"],
+        )
+        self.card = Flashcard.objects.create(
+            id="axolotl-card", title="Salamanders",
+            question="Which salamander keeps its gills as an adult?", answer="The axolotl", tags=[],
+        )
+
+    def search(self, **params):
+        response = self.client.get("/api/search/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, **params):
+        return [result["id"] for result in self.search(**params)["results"]]
+
+    def test_title_match_ranks_first(self):
+        ids = self.ids(q="gills")
+        self.assertEqual(ids[0], "axolotl-gills")
+        self.assertEqual(set(ids), {"axolotl-gills", "axolotl-card"})
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.ids(q="salamander limbs"), ["axolotl-limbs"])
+
+    def test_last_term_matches_as_prefix(self):
+        self.assertEqual(self.ids(q="regrow"), ["axolotl-limbs"])
+
+    def test_short_last_term_is_not_a_prefix(self):
+        self.assertEqual(self.ids(q="ax"), [])
+        self.assertEqual(len(self.ids(q="axo")), 3)
+
+    @unittest.skipUnless(search_index.index_enabled(), "The inverted index is not kept with SEARCH_BACKEND=postgres")
+    def test_prefix_expands_to_the_first_terms_only(self):
+        # "regrow" completes to "regrowing" (in the title) and "regrows" (in the content)
+        with mock.patch.object(search_index, "PREFIX_MAX_TERMS", 1):
+            fields = {field for _, _, field, *_ in search_index.lookup_postings(["regrow"])}
+        self.assertEqual(fields, {"title"})
+
+    def test_results_describe_the_document(self):
+        card = next(result for result in self.search(q="adult")["results"] if result["id"] == "axolotl-card")
+        self.assertEqual(card["type"], "flashcard")
+        self.assertIn("adult", card["snippet"])
+
+    def test_pages_follow_the_cursor(self):
+        first = self.search(q="axolotl", limit=2)
+        self.assertIsNotNone(first["next_cursor"])
+        second = self.search(q="axolotl", limit=2, cursor=first["next_cursor"])
+
+        ids = [result["id"] for result in first["results"] + second["results"]]
+        self.assertEqual(sorted(ids), ["axolotl-card", "axolotl-gills", "axolotl-limbs"])
+        self.assertIsNone(second["next_cursor"])
+
+    def test_changed_and_deleted_documents_are_reindexed(self):
+        self.limbs.title = "Regrowing tails"
+        self.limbs.save()
+        self.gills.delete()
+
+        self.assertEqual(self.ids(q="tails"), ["axolotl-limbs"])
+        self.assertEqual(self.ids(q="feathery"), [])
+
+    def test_empty_query_and_bad_limit(self):
+        self.assertEqual(self.search(q=""), {"results": [], "next_cursor": None})
+        response = self.client.get("/api/search/", {"q": "axolotl", "limit": "many"})
+        self.assertEqual(response.status_code, 400)
+
+
+@unittest.skipUnless(
+    os.getenv("POSTGRES_DB"),
+    "PostgreSQL search needs POSTGRES_DB and the other POSTGRES_* settings "
+    "(docker-compose -f docker-compose.postgres.yml up -d starts a server)",
+)
+class PostgresSearchTests(TestCase):
+    """Migration 0010's search columns and ts_rank ranking; SearchTests also run against PostgreSQL"""
+    def test_search_vector_columns_are_generated(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT table_name, data_type, is_generated FROM information_schema.columns "
+                "WHERE column_name = 'search_vector' ORDER BY table_name"
+            )
+            self.assertEqual(cursor.fetchall(), [
+                ("api_flashcard", "tsvector", "ALWAYS"),
+                ("api_note", "tsvector", "ALWAYS"),
+            ])
+
+    def test_search_vectors_have_gin_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes "
+                "WHERE indexname IN ('api_note_search_idx', 'api_flashcard_search_idx') ORDER BY indexname"
+            )
+            indexes = cursor.fetchall()
+        self.assertEqual([name for name, _ in indexes], ["api_flashcard_search_idx", "api_note_search_idx"])
+        for _, definition in indexes:
+            self.assertIn("USING gin (search_vector)", definition)
+
+    def test_field_weights_order_ts_rank(self):
+        for id, title, content in [
+            ("in-content", "Amphibians", "<p>Tadpoles grow legs.</p>"),
+            ("in-title", "Tadpoles", "<p>Young frogs grow legs.</p>"),
+        ]:
+            Note.objects.create(id=id, title=title, content=content, tags=[])
+
+        ranked, _ = pg_search.rank("tadpoles", 10)
+
+        self.assertEqual([doc.doc_id for doc in ranked], ["in-title", "in-content"])
+        self.assertGreater(ranked[0].score, ranked[1].score)
+        self.assertEqual(ranked[0].fields, {"title"})
+
+    def test_words_match_by_stem(self):
+        Note.objects.create(id="stems", title="Frogs", content="<p>A frog is jumping.</p>", tags=[])
+
+        ranked, _ = pg_search.rank("jumped frog", 10)
+
+        self.assertEqual([doc.doc_id for doc in ranked], ["stems"])
+
+
+# Words the stub embedder counts, one dimension each
+STUB_VOCABULARY = ("gills", "limbs", "desert", "ocean")
+
+
+def stub_embed(texts):
+    """Stand-in for the sentence model: unit-length word counts over STUB_VOCABULARY"""
+    import numpy as np
+    vectors = np.array(
+        [[text.lower().split().count(word) for word in STUB_VOCABULARY] for text in texts], dtype=np.float32,
+    ).reshape(len(texts), len(STUB_VOCABULARY))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class SemanticIndexTests(TestCase):
+    """Embedding rows and ranking, with a stub embedder in place of the model"""
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.embed = mock.Mock(side_effect=stub_embed)
+        for name, value in {
+            "VECTORS": semantic_index.VectorFile(os.path.join(directory, "vectors.f32")),
+            "embed_texts": self.embed,
+            "embedding_dimension": lambda: len(STUB_VOCABULARY),
+        }.items():
+            patcher = mock.patch.object(semantic_index, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.gills = Note.objects.create(id="olm-gills", title="Olm", content="<p>gills gills ocean</p>")
+        self.limbs = Note.objects.create(id="olm-limbs", title="Olm", content="<p>limbs</p>")
+        self.desert = Note.objects.create(id="olm-desert", title="Olm", content="<p>desert gills</p>")
+
+    def rows(self):
+        return dict(NoteEmbedding.objects.exclude(doc_id=None).values_list("doc_id", "row"))
+
+    def ranked(self, query, k=10):
+        page, _ = semantic_index.rank(query, k)
+        return [document.doc_id for document in page]
+
+    def test_rows_are_allocated_and_reused_after_delete(self):
+        semantic_index.index_notes([self.gills, self.limbs])
+        self.assertEqual(self.rows(), {"olm-gills": 0, "olm-limbs": 1})
+
+        semantic_index.remove_notes(["olm-gills"])
+        self.assertEqual(self.rows(), {"olm-limbs": 1})
+        self.assertFalse(semantic_index.VECTORS.matrix(len(STUB_VOCABULARY))[0].any())
+
+        semantic_index.index_notes([self.desert])
+        self.assertEqual(self.rows(), {"olm-desert": 0, "olm-limbs": 1})
+
+    def test_unchanged_notes_are_not_embedded_again(self):
+        semantic_index.index_notes([self.gills, self.limbs])
+        semantic_index.index_notes([self.gills, self.limbs])
+        self.assertEqual(self.embed.call_count, 1)
+
+        self.limbs.content = "<p>limbs desert</p>"
+        semantic_index.index_notes([self.gills, self.limbs])
+        self.assertEqual(self.embed.call_args.args[0], [semantic_index.note_text(self.limbs)])
+
+    def test_notes_are_ranked_by_similarity(self):
+        semantic_index.index_notes([self.gills, self.limbs, self.desert])
+
+        self.assertEqual(self.ranked("gills"), ["olm-gills", "olm-desert"])
+        self.assertEqual(self.ranked("desert"), ["olm-desert"])
+        self.assertEqual(self.ranked("gills", k=1), ["olm-gills"])
+
+        semantic_index.remove_notes(["olm-gills"])
+        self.assertEqual(self.ranked("gills"), ["olm-desert"])
+
+    def test_saves_are_embedded_on_the_executor_after_commit(self):
+        executor = mock.Mock()
+        with mock.patch.object(semantic_index, "SEMANTIC_SEARCH", True), \
+             mock.patch.object(semantic_index, "EMBEDDING_EXECUTOR", executor), \
+             mock.patch.object(semantic_index, "index_notes") as index_notes:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.gills.save()
+                executor.submit.assert_not_called()
+
+        executor.submit.assert_called_once()
+        index_notes.assert_not_called()
+
+
+class CrashingPool:
+    """Stand-in extraction pool whose worker dies on files named crash.txt"""
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, function, path, filename):
+        future = Future()
+        if filename == "crash.txt":
+            future.set_exception(BrokenProcessPool("A worker process terminated abruptly"))
+        else:
+            future.set_result(function(path, filename))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class ExtractionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        patcher = mock.patch.object(
+            extractors, "EXTRACTION_CACHE", DiskCache(os.path.join(directory, "extraction_cache.sqlite3"))
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_bytes_are_extracted_once(self):
+        with mock.patch.object(extractors, "extract_text", wraps=extractors.extract_text) as extract_text:
+            first = extractors.cached_extract_text(SimpleUploadedFile("a.txt", b"Axolotls regrow their limbs."))
+            second = extractors.cached_extract_text(SimpleUploadedFile("b.txt", b"Axolotls regrow their limbs."))
+            extractors.cached_extract_text(SimpleUploadedFile("c.txt", b"Axolotls regrow their tails."))
+
+        self.assertEqual(first, second)
+        self.assertEqual(extract_text.call_count, 2)
+        self.assertEqual(extractors.EXTRACTION_CACHE.stats()["hits"], 1)
+
+    def test_crashed_worker_fails_only_its_files(self):
+        pool = CrashingPool()
+        with mock.patch.object(extractors, "get_pool", return_value=pool):
+            response = self.client.post("/api/import/bulk/", {"files": [
+                SimpleUploadedFile("notes.txt", b"Axolotls regrow their limbs."),
+                SimpleUploadedFile("crash.txt", b"Never read"),
+            ]})
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([note["filename"] for note in response.json()["imported"]], ["notes.txt"])
+        self.assertEqual([failure["filename"] for failure in response.json()["failed"]], ["crash.txt"])
+        self.assertTrue(pool.shut_down)
+
+    def test_broken_pool_is_replaced(self):
+        broken = extractors.get_pool()
+        self.addCleanup(lambda: extractors._pool and extractors.reset_pool(extractors._pool))
+        broken.submit(os._exit, 1).exception()
+
+        with tempfile.NamedTemporaryFile(suffix=".txt") as source:
+            source.write(b"Axolotls regrow their limbs.")
+            source.flush()
+            results = extractors.extract_paths([(source.name, "notes.txt")])
+
+        self.assertEqual(results, [{"filename": "notes.txt", "text": "Axolotls regrow their limbs."}])
+        self.assertIsNot(extractors._pool, broken)
+
+    def test_pages_beyond_the_ocr_limit_are_reported(self):
+        from PyPDF2 import PdfWriter
+        writer = PdfWriter()
+        for _ in range(3):
+            writer.add_blank_page(width=200, height=200)
+        pdf = io.BytesIO()
+        writer.write(pdf)
+
+        with mock.patch.object(ocr, "OCR_MAX_PAGES", 2), \
+             mock.patch.object(ocr, "ocr_pdf", return_value=["Page one", "Page two"]) as ocr_pdf:
+            response = self.client.post("/api/upload/", {"file": SimpleUploadedFile("scan.pdf", pdf.getvalue())})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ocr_pdf.call_args.args[1], 3)
+        self.assertTrue(response.json()["text"].endswith(
+            "[Only the first 2 of 3 pages were scanned for text (OCR_MAX_PAGES).]"
+        ))
+
+    def zip_upload(self, members):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as writer:
+            for name, data in members.items():
+                writer.writestr(name, data)
+        return SimpleUploadedFile("notes.zip", archive.getvalue())
+
+    def test_oversized_zip_members_are_not_unpacked(self):
+        upload = self.zip_upload({
+            "notes.txt": b"Axolotls regrow their limbs.",
+            "huge.txt": b"a" * (views.IMPORT_MAX_FILE_SIZE + 1),
+        })
+
+        with mock.patch.object(extractors.zipfile.ZipFile, "open", autospec=True,
+                               side_effect=zipfile.ZipFile.open) as member_open:
+            response = self.client.post("/api/import/bulk/", {"files": [upload]})
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([note["filename"] for note in response.json()["imported"]], ["notes.txt"])
+        self.assertEqual(response.json()["failed"], [
+            {"filename": "huge.txt", "error": "File is too large. Maximum size is 10MB."}
+        ])
+        self.assertEqual([call.args[1].filename for call in member_open.call_args_list], ["notes.txt"])
+
+    def test_zip_expanding_beyond_the_limit_is_rejected(self):
+        upload = self.zip_upload({"one.txt": b"a" * 6000, "two.txt": b"b" * 6000})
+
+        with mock.patch.object(views, "BULK_IMPORT_MAX_BYTES", 10000):
+            response = self.client.post("/api/import/bulk/", {"files": [upload]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["error"], "The archive expands to more than the 9KB left for this import."
+        )
+
+    def test_zips_share_the_bulk_import_limit(self):
+        first = self.zip_upload({"one.txt": b"a" * 6000})
+        second = self.zip_upload({"two.txt": b"b" * 6000})
+
+        with mock.patch.object(views, "BULK_IMPORT_MAX_BYTES", 10000):
+            response = self.client.post("/api/import/bulk/", {"files": [first, second]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("expands to more than", response.json()["error"])
+        self.assertFalse(Note.objects.filter(title__in=["one", "two"]).exists())
+
+
+class JobRecoveryTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        patcher = mock.patch.object(jobs, "JOB_UPLOAD_DIR", directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def job(self, status, days_old=0):
+        job = Job.objects.create(id=f"job-{status}-{days_old}", kind="import_file", status=status)
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(days=days_old))
+        return job
+
+    def test_unfinished_jobs_are_failed_and_their_uploads_deleted(self):
+        queued, running = self.job(Job.STATUS_QUEUED), self.job(Job.STATUS_RUNNING)
+        finished = self.job(Job.STATUS_SUCCEEDED)
+        upload = os.path.join(jobs.JOB_UPLOAD_DIR, "upload.pdf")
+        open(upload, "wb").close()
+        os.mkdir(os.path.join(jobs.JOB_UPLOAD_DIR, "bulk"))
+
+        call_command("recover_jobs", stdout=io.StringIO())
+
+        for job in (queued, running):
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.STATUS_FAILED)
+            self.assertIn("restarted", job.error)
+        finished.refresh_from_db()
+        self.assertEqual(finished.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(os.listdir(jobs.JOB_UPLOAD_DIR), [])
+
+    def test_old_finished_jobs_are_pruned(self):
+        old = [self.job(Job.STATUS_SUCCEEDED, days_old=8), self.job(Job.STATUS_FAILED, days_old=8)]
+        recent = self.job(Job.STATUS_SUCCEEDED, days_old=1)
+
+        with mock.patch.object(jobs.JOB_EXECUTOR, "submit"):
+            jobs.enqueue("import_file", {"path": "upload.pdf", "filename": "upload.pdf"})
+
+        self.assertFalse(Job.objects.filter(pk__in=[job.pk for job in old]).exists())
+        self.assertTrue(Job.objects.filter(pk=recent.pk).exists())
+
+
+class RunConcurrentlyTests(SimpleTestCase):
+    def test_first_call_runs_in_the_calling_thread(self):
+        def thread_name(label):
+            return label, threading.current_thread().name
+
+        results = ai_utils.run_concurrently((thread_name, "summary"), (thread_name, "tags"))
+
+        self.assertEqual(results[0], ("summary", threading.current_thread().name))
+        self.assertEqual(results[1][0], "tags")
+        self.assertTrue(results[1][1].startswith("llm"))
+
+    def test_calls_run_at_the_same_time(self):
+        both_started = threading.Barrier(2, timeout=5)
+
+        def wait_for_the_other(label):
+            both_started.wait()
+            return label
+
+        self.assertEqual(
+            ai_utils.run_concurrently((wait_for_the_other, "summary"), (wait_for_the_other, "tags")),
+            ["summary", "tags"],
+        )
+
+
+class FlashcardConcurrencyTests(SimpleTestCase):
+    # Six paragraphs of about a chunk each
+    TEXT = "\n\n".join(f"Paragraph {i}. " + "Axolotls regrow their limbs. " * 60 for i in range(6))
+
+    def setUp(self):
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.lock = threading.Lock()
+
+    def generate(self, chunk, title):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        return [{"question": chunk[:12], "answer": title}]
+
+    def test_limit_is_shared_by_all_requests(self):
+        results = []
+
+        def request():
+            results.append(list(ai_utils.iter_flashcards(self.TEXT, "Axolotls")))
+
+        with mock.patch.object(ai_utils, "FLASHCARD_SLOTS", threading.BoundedSemaphore(2)), \
+             mock.patch.object(ai_utils, "generate_chunk_flashcards", self.generate):
+            threads = [threading.Thread(target=request) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.most_in_flight, 2)
+        self.assertEqual(len(results), 3)
+        for chunks in results:
+            self.assertEqual([cards[0]["question"] for cards in chunks], [f"Paragraph {i}." for i in range(6)])
+
+    def test_async_limit_is_shared_by_all_requests(self):
+        async def agenerate(chunk, title):
+            with self.lock:
+                self.in_flight += 1
+                self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            await asyncio.sleep(0.05)
+            with self.lock:
+                self.in_flight -= 1
+            return [{"question": chunk[:12], "answer": title}]
+
+        async def request():
+            return [chunk async for chunk in ai_utils.aiter_flashcards(self.TEXT, "Axolotls")]
+
+        async def requests():
+            return await asyncio.gather(*(request() for _ in range(3)))
+
+        with mock.patch.object(ai_utils, "FLASHCARD_CONCURRENCY", 2), \
+             mock.patch.object(ai_utils, "agenerate_chunk_flashcards", agenerate):
+            results = asyncio.run(requests())
+
+        self.assertEqual(self.most_in_flight, 2)
+        self.assertEqual([len(chunks) for chunks in results], [6, 6, 6])
+
+
+class BatchCreateFlashcardsTests(TestCase):
+    def batch(self, body):
+        return self.client.post("/api/flashcards/batch/", body, content_type="application/json")
+
+    def card(self, title, **fields):
+        return {"title": title, "question": f"{title}?", "answer": title, "tags": [], **fields}
+
+    def test_results_keep_the_order_of_the_request(self):
+        Flashcard.objects.create(id="existing", **self.card("Second"))
+
+        response = self.batch({"flashcards": [
+            self.card("First"), self.card("Second", id="existing"), self.card("Third"),
+        ]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([card["title"] for card in response.json()], ["First", "Second", "Third"])
+        self.assertEqual(response.json()[1]["id"], "existing")
+        self.assertEqual(Flashcard.objects.filter(title__in=["First", "Second", "Third"]).count(), 3)
+
+    def test_errors_keep_the_order_of_the_request(self):
+        response = self.batch({"flashcards": [
+            self.card("First", id="first", note="missing"), self.card("Second"), {"title": "Third"},
+        ]})
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([card["title"] for card in response.json()["created"]], ["Second"])
+        errors = response.json()["errors"]
+        self.assertEqual([(error["index"], error["id"], error["status"]) for error in errors], [
+            (0, "first", "error"), (2, None, "error"),
+        ])
+        self.assertEqual([sorted(error["errors"]) for error in errors], [["note"], ["answer", "question"]])
+
+    def test_blank_note_means_no_note(self):
+        response = self.batch({"flashcards": [self.card("Loose", note="")]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.json()[0]["note"])
+        self.assertIsNone(Flashcard.objects.get(id=response.json()[0]["id"]).note_id)
+
+    def test_top_level_list_is_a_bad_request(self):
+        response = self.batch([self.card("First")])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Flashcard.objects.filter(title="First").exists())
+
+
+class BulkNotesTests(TestCase):
+    """/api/notes/bulk/: per-item results, and the indexes and tag counts kept in step"""
+    def bulk(self, method, body):
+        return getattr(self.client, method)("/api/notes/bulk/", body, content_type="application/json")
+
+    def note(self, note_id, title, **fields):
+        return {"id": note_id, "title": title, "content": f"<p>{title}</p>", "tags": [], **fields}
+
+    def search_ids(self, q):
+        response = self.client.get("/api/search/", {"q": q})
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(result["id"] for result in response.json()["results"])
+
+    def tag_count(self, tag):
+        row = TagCount.objects.filter(doc_type="note", tag=tag).first()
+        return row.count if row else 0
+
+    def test_create_reports_each_item_with_207(self):
+        response = self.bulk("post", {"notes": [
+            self.note("wombat-1", "Wombat burrows", tags=["Marsupial"]),
+            {"title": "No ID"},
+            self.note("wombat-2", ""),
+            self.note("wombat-3", "Wombat diet", tags=["marsupial ", "herbivore"]),
+        ]})
+
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["results"]
+        self.assertEqual([result["index"] for result in results], [0, 1, 2, 3])
+        self.assertEqual([result["status"] for result in results], ["created", "error", "error", "created"])
+        self.assertEqual(results[1]["id"], None)
+        self.assertIn("id", results[1]["errors"])
+        self.assertEqual(results[2]["id"], "wombat-2")
+        self.assertIn("title", results[2]["errors"])
+        self.assertEqual(Note.objects.filter(id__startswith="wombat").count(), 2)
+        self.assertEqual(self.search_ids("wombat"), ["wombat-1", "wombat-3"])
+        self.assertEqual(self.tag_count("marsupial"), 2)
+        self.assertEqual(self.tag_count("herbivore"), 1)
+
+    def test_create_with_all_items_valid_is_201(self):
+        response = self.bulk("post", [self.note("wombat-1", "Wombat burrows")])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["results"][0]["status"], "created")
+
+    def test_create_resolves_duplicate_ids(self):
+        Note.objects.create(**self.note("wombat-1", "Wombat burrows"))
+
+        response = self.bulk("post", {"notes": [
+            self.note("wombat-1", "Wombat burrows"),
+            self.note("wombat-1", "Wombat teeth"),
+            self.note("wombat-2", "Wombat diet"),
+            self.note("wombat-2", "Wombat diet"),
+        ]})
+
+        self.assertEqual(response.status_code, 201)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], ["exists", "created", "created", "exists"])
+        self.assertEqual(results[0]["id"], "wombat-1")
+        self.assertNotEqual(results[1]["id"], "wombat-1")
+        self.assertEqual(results[3]["id"], "wombat-2")
+        self.assertIsNotNone(results[3]["note"]["updated_at"])
+        self.assertEqual(Note.objects.filter(title__startswith="Wombat").count(), 3)
+
+    def test_update_reports_missing_ids_and_reindexes(self):
+        self.bulk("post", [
+            self.note("wombat-1", "Wombat burrows", tags=["marsupial", "digger"]),
+            self.note("wombat-2", "Wombat diet", tags=["marsupial"]),
+        ])
+
+        response = self.bulk("patch", {"notes": [
+            {"id": "wombat-1", "title": "Wombat tunnels", "content": "<p>Wombat tunnels</p>", "tags": ["Digger"]},
+            {"id": "wombat-9", "title": "Missing"},
+            {"id": "wombat-2", "title": ""},
+            {"title": "No ID"},
+        ]})
+
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], ["updated", "error", "error", "error"])
+        self.assertEqual(results[1], {"index": 1, "id": "wombat-9", "status": "error", "errors": {"id": ["Note not found"]}})
+        self.assertIn("title", results[2]["errors"])
+        self.assertEqual(Note.objects.get(id="wombat-2").title, "Wombat diet")
+        self.assertEqual(self.search_ids("tunnels"), ["wombat-1"])
+        self.assertEqual(self.search_ids("burrows"), [])
+        self.assertEqual(self.tag_count("marsupial"), 1)
+        self.assertEqual(self.tag_count("digger"), 1)
+
+    def test_update_with_duplicate_ids_keeps_the_last(self):
+        self.bulk("post", [self.note("wombat-1", "Wombat burrows")])
+
+        response = self.bulk("patch", [
+            {"id": "wombat-1", "content": "<p>Wombat tunnels</p>"},
+            {"id": "wombat-1", "content": "<p>Wombat dens</p>"},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["status"] for result in response.json()["results"]], ["updated", "updated"])
+        self.assertEqual(Note.objects.get(id="wombat-1").content, "<p>Wombat dens</p>")
+        self.assertEqual(self.search_ids("dens"), ["wombat-1"])
+        self.assertEqual(self.search_ids("tunnels"), [])
+
+    def test_delete_reports_missing_and_duplicate_ids(self):
+        self.bulk("post", [
+            self.note("wombat-1", "Wombat burrows", tags=["marsupial"]),
+            self.note("wombat-2", "Wombat diet", tags=["marsupial", "herbivore"]),
+        ])
+
+        response = self.bulk("delete", {"ids": ["wombat-2", "wombat-9", "wombat-2"]})
+
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], ["deleted", "error", "deleted"])
+        self.assertEqual(results[1]["errors"], {"id": ["Note not found"]})
+        self.assertEqual(self.search_ids("wombat"), ["wombat-1"])
+        self.assertEqual(self.tag_count("marsupial"), 1)
+        self.assertFalse(TagCount.objects.filter(doc_type="note", tag="herbivore").exists())
+        self.assertEqual(Tombstone.objects.filter(doc_id="wombat-2").count(), 1)
+
+    def test_body_must_be_a_list_within_the_limit(self):
+        self.assertEqual(self.bulk("post", {"notes": "wombat"}).status_code, 400)
+        with mock.patch.object(views, "BULK_MAX_ITEMS", 1):
+            response = self.bulk("delete", ["wombat-1", "wombat-2"])
+        self.assertEqual(response.status_code, 400)
+
+
+class TagTests(TestCase):
+    """The ?tags= list filter and the tag counts behind /api/tags/"""
+    def counts(self, doc_type):
+        return dict(TagCount.objects.filter(doc_type=doc_type, tag__startswith="pika").values_list("tag", "count"))
+
+    def note(self, note_id, tags):
+        response = self.client.post(
+            "/api/notes/", {"id": note_id, "title": note_id, "content": "<p>Pika</p>", "tags": tags},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def listed(self, path="/api/notes/", **params):
+        response = self.client.get(path, {"limit": 100, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(item["id"] for item in response.json()["results"])
+
+    def test_counts_follow_note_create_update_and_delete(self):
+        self.note("pika-1", ["Pika-Alpine", "pika-rodent"])
+        self.note("pika-2", [" pika-alpine "])
+        self.assertEqual(self.counts("note"), {"pika-alpine": 2, "pika-rodent": 1})
+
+        response = self.client.patch(
+            "/api/notes/pika-1/", {"tags": ["pika-rodent", "pika-hay"]}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts("note"), {"pika-alpine": 1, "pika-rodent": 1, "pika-hay": 1})
+
+        self.client.delete("/api/notes/pika-2/")
+        self.assertEqual(self.counts("note"), {"pika-rodent": 1, "pika-hay": 1})
+        self.client.delete("/api/notes/pika-1/")
+        self.assertEqual(self.counts("note"), {})
+        self.assertFalse(TagAssignment.objects.filter(tag__startswith="pika").exists())
+
+    def test_counts_follow_bulk_writes(self):
+        self.client.post("/api/notes/bulk/", [
+            {"id": "pika-1", "title": "Pika", "content": "Pika", "tags": ["pika-alpine"]},
+            {"id": "pika-2", "title": "Pika", "content": "Pika", "tags": ["PIKA-ALPINE", "pika-hay"]},
+        ], content_type="application/json")
+        self.assertEqual(self.counts("note"), {"pika-alpine": 2, "pika-hay": 1})
+
+        self.client.patch("/api/notes/bulk/", [{"id": "pika-2", "tags": ["pika-hay"]}], content_type="application/json")
+        self.assertEqual(self.counts("note"), {"pika-alpine": 1, "pika-hay": 1})
+
+        self.client.post("/api/flashcards/batch/", {"flashcards": [
+            {"title": "Pika", "question": "Pika?", "answer": "Pika", "tags": ["pika-hay"], "note": "pika-2"},
+        ]}, content_type="application/json")
+        self.assertEqual(self.counts("flashcard"), {"pika-hay": 1})
+
+        self.client.delete("/api/notes/bulk/", ["pika-1", "pika-2"], content_type="application/json")
+        self.assertEqual(self.counts("note"), {})
+        self.assertEqual(self.counts("flashcard"), {})
+
+    def test_counts_follow_summaries(self):
+        summary = Summary.objects.create(
+            id="pika-summary", title="Pika", original_text="Pika", summary_text="Pika", tags=["pika-alpine"],
+        )
+        self.assertEqual(self.counts("summary"), {"pika-alpine": 1})
+        summary.delete()
+        self.assertEqual(self.counts("summary"), {})
+
+    def test_list_tags_sums_the_types(self):
+        self.note("pika-1", ["pika-alpine"])
+        Flashcard.objects.create(id="pika-card", title="Pika", question="Pika?", answer="Pika", tags=["Pika-Alpine"])
+
+        response = self.client.get("/api/tags/", {"prefix": "PIKA"})
+        self.assertEqual(response.json()["tags"], [{"tag": "pika-alpine", "count": 2}])
+        response = self.client.get("/api/tags/", {"prefix": "pika", "type": "flashcard"})
+        self.assertEqual(response.json()["tags"], [{"tag": "pika-alpine", "count": 1}])
+
+    def test_filter_matches_normalized_tags(self):
+        self.note("pika-1", ["Pika  Alpine", "pika-rodent"])
+        self.note("pika-2", ["pika alpine"])
+        self.note("pika-3", ["pika-rodent"])
+
+        self.assertEqual(self.listed(tags=" PIKA alpine "), ["pika-1", "pika-2"])
+        self.assertEqual(self.listed(tags="pika alpine,Pika-Rodent"), ["pika-1"])
+        self.assertEqual(self.listed(tag=["pika alpine", "pika-rodent"]), ["pika-1"])
+        self.assertEqual(self.listed(tags="pika alpine,pika-rodent", tag_mode="any"), ["pika-1", "pika-2", "pika-3"])
+        self.assertEqual(self.listed(tags="pika-missing"), [])
+
+    def test_filter_applies_to_flashcards(self):
+        Flashcard.objects.create(id="pika-card", title="Pika", question="Pika?", answer="Pika", tags=["Pika-Hay"])
+        Flashcard.objects.create(id="pika-other", title="Pika", question="Pika?", answer="Pika", tags=[])
+
+        self.assertEqual(self.listed("/api/flashcards/", tags="pika-hay"), ["pika-card"])
+
+
+class PaginationTests(TestCase):
+    """Keyset pages of the note list"""
+    def setUp(self):
+        # Three notes share each timestamp, so pages have to break ties on the ID
+        start = timezone.now()
+        for i in range(12):
+            Note.objects.create(
+                id=f"numbat-{i:02d}", title="Numbat", content="Numbat",
+                created_at=start - timedelta(seconds=i // 3),
+            )
+
+    def page(self, **params):
+        response = self.client.get("/api/notes/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_cover_the_list_once_in_order(self):
+        ids, cursor = [], None
+        while True:
+            page = self.page(limit=5, **({"cursor": cursor} if cursor else {}))
+            self.assertLessEqual(len(page["results"]), 5)
+            ids += [note["id"] for note in page["results"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        expected = list(Note.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_lists_are_paginated_by_default(self):
+        with mock.patch.object(pagination, "DEFAULT_PAGE_SIZE", 4):
+            page = self.page()
+        self.assertEqual(len(page["results"]), 4)
+        self.assertIsNotNone(page["next_cursor"])
+
+    def test_limit_is_capped(self):
+        with mock.patch.object(pagination, "MAX_PAGE_SIZE", 3):
+            page = self.page(limit=1000, view="compact")
+        self.assertEqual(len(page["results"]), 3)
+
+    def test_bad_cursor_and_limit(self):
+        self.assertEqual(self.client.get("/api/notes/", {"cursor": "numbat"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/notes/", {"limit": "many"}).status_code, 400)
+
+
+class ProjectionTests(TestCase):
+    """?view=compact and ?fields= on the list endpoints"""
+    def setUp(self):
+        start = timezone.now()
+        for i in range(5):
+            Note.objects.create(
+                id=f"bilby-{i}", title=f"Bilby {i}", content=f"<h1>Bilby</h1><p>Desert bandicoot {i}</p>",
+                tags=["bilby"] if i % 2 == 0 else ["other"], created_at=start - timedelta(seconds=i),
+            )
+        Flashcard.objects.create(
+            id="bilby-card", note_id="bilby-0", title="Bilby", question="<b>Where</b> do bilbies live?",
+            answer="Deserts", tags=["bilby"],
+        )
+
+    def listed(self, path="/api/notes/", **params):
+        response = self.client.get(path, {"tags": "bilby", **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["results"]
+
+    def test_compact_view(self):
+        notes = self.listed(view="compact")
+
+        self.assertEqual(set(notes[0]), {"id", "title", "tags", "created_at", "updated_at", "preview"})
+        self.assertEqual(notes[0]["preview"], "Bilby Desert bandicoot 0")
+
+    def test_fields_keep_the_requested_order(self):
+        notes = self.listed(fields="title, id,title")
+
+        self.assertEqual([list(note) for note in notes], [["title", "id"]] * 3)
+        self.assertEqual([note["id"] for note in notes], ["bilby-0", "bilby-2", "bilby-4"])
+
+    def test_flashcard_fields(self):
+        cards = self.listed("/api/flashcards/", fields="id,note,preview")
+
+        self.assertEqual(cards, [{"id": "bilby-card", "note": "bilby-0", "preview": "Where do bilbies live?"}])
+
+    def test_unknown_fields_are_a_bad_request(self):
+        response = self.client.get("/api/notes/", {"fields": "id,secret,question"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unknown fields: secret, question", response.json()["error"])
+        self.assertEqual(self.client.get("/api/summaries/", {"fields": "content"}).status_code, 400)
+
+    def test_projection_with_pagination_and_tag_filter(self):
+        first = self.client.get("/api/notes/", {"tags": "bilby", "fields": "id", "limit": 2}).json()
+        second = self.client.get(
+            "/api/notes/", {"tags": "bilby", "fields": "id", "limit": 2, "cursor": first["next_cursor"]}
+        ).json()
+
+        self.assertEqual(first["results"], [{"id": "bilby-0"}, {"id": "bilby-2"}])
+        self.assertEqual(second["results"], [{"id": "bilby-4"}])
+        self.assertIsNone(second["next_cursor"])
+
+
+class ConditionalGetTests(TestCase):
+    """ETag and Last-Modified on the note list and detail"""
+    def setUp(self):
+        for i in range(2):
+            Note.objects.create(id=f"quoll-{i}", title="Quoll", content="Quoll", tags=["quoll"])
+        # Older than the current second, so Last-Modified is sent
+        Note.objects.filter(id__startswith="quoll").update(updated_at=timezone.now() - timedelta(minutes=5))
+
+    def get(self, path, **headers):
+        return self.client.get(path, {"tags": "quoll"} if path == "/api/notes/" else {}, headers=headers)
+
+    def test_unchanged_list_and_detail_are_not_modified(self):
+        for path in ("/api/notes/", "/api/notes/quoll-0/"):
+            response = self.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("no-cache", response["Cache-Control"])
+
+            self.assertEqual(self.get(path, if_none_match=response["ETag"]).status_code, 304)
+            self.assertEqual(self.get(path, if_modified_since=response["Last-Modified"]).status_code, 304)
+
+    def test_edit_invalidates_the_list_and_detail(self):
+        listed, detail = self.get("/api/notes/"), self.get("/api/notes/quoll-0/")
+
+        self.client.patch("/api/notes/quoll-0/", {"title": "Spotted quoll"}, content_type="application/json")
+
+        for previous, path in ((listed, "/api/notes/"), (detail, "/api/notes/quoll-0/")):
+            response = self.get(path, if_none_match=previous["ETag"])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], previous["ETag"])
+            self.assertEqual(self.get(path, if_modified_since=previous["Last-Modified"]).status_code, 200)
+
+    def test_delete_invalidates_the_list(self):
+        listed = self.get("/api/notes/")
+
+        self.client.delete("/api/notes/quoll-0/")
+
+        response = self.get("/api/notes/", if_none_match=listed["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([note["id"] for note in response.json()["results"]], ["quoll-1"])
+        self.assertEqual(self.get("/api/notes/", if_modified_since=listed["Last-Modified"]).status_code, 200)
+
+    def test_change_in_the_current_second_is_left_to_the_etag(self):
+        note = Note.objects.get(id="quoll-0")
+        note.save()
+
+        with mock.patch.object(sync.timezone, "now", return_value=note.updated_at):
+            response = self.get("/api/notes/quoll-0/")
+        self.assertNotIn("Last-Modified", response)
+
+        note.title = "Spotted quoll"
+        note.save()
+        self.assertEqual(self.get("/api/notes/quoll-0/", if_none_match=response["ETag"]).status_code, 200)
+
+
+class SyncTests(TestCase):
+    """/api/sync/ deltas and tombstones"""
+    def sync(self, since=None):
+        response = self.client.get("/api/sync/", {"since": since} if since else {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, records):
+        return sorted(record["id"] for record in records if record["id"].startswith("dunnart"))
+
+    def test_since_returns_changes_and_deletions(self):
+        for i in range(3):
+            Note.objects.create(id=f"dunnart-{i}", title="Dunnart", content="Dunnart")
+        Flashcard.objects.create(id="dunnart-card", title="Dunnart", question="Dunnart?", answer="Dunnart")
+        first = self.sync()
+        self.assertTrue(first["full"])
+        self.assertEqual(self.ids(first["notes"]), ["dunnart-0", "dunnart-1", "dunnart-2"])
+
+        self.client.patch("/api/notes/dunnart-0/", {"title": "Fat-tailed dunnart"}, content_type="application/json")
+        self.client.delete("/api/notes/dunnart-1/")
+        self.client.delete("/api/flashcards/dunnart-card/")
+        Note.objects.create(id="dunnart-3", title="Dunnart", content="Dunnart")
+
+        delta = self.sync(first["server_time"])
+        self.assertFalse(delta["full"])
+        self.assertEqual(self.ids(delta["notes"]), ["dunnart-0", "dunnart-3"])
+        self.assertEqual(delta["deleted"], {"notes": ["dunnart-1"], "flashcards": ["dunnart-card"]})
+
+        self.assertEqual(self.sync(delta["server_time"])["deleted"], {"notes": [], "flashcards": []})
+
+    def test_recreated_id_is_a_change(self):
+        since = timezone.now().timestamp()
+        Note.objects.create(id="dunnart-0", title="Dunnart", content="Dunnart").delete()
+        Note.objects.create(id="dunnart-0", title="Dunnart again", content="Dunnart")
+
+        delta = self.sync(str(since))
+        self.assertEqual(self.ids(delta["notes"]), ["dunnart-0"])
+        self.assertEqual(delta["deleted"]["notes"], [])
+
+    def test_since_past_retention_is_a_full_sync(self):
+        since = sync.tombstone_cutoff() - timedelta(days=1)
+        self.assertTrue(self.sync(since.isoformat())["full"])
+
+    def test_bad_since(self):
+        self.assertEqual(self.client.get("/api/sync/", {"since": "yesterday"}).status_code, 400)
+
+
+class DeletionTests(TestCase):
+    """Index updates and tombstones for single and bulk note deletes"""
+    def setUp(self):
+        self.notes = [
+            Note.objects.create(id=f"quokka-{i}", title=f"Quokka {i}", content="<p>Quokka</p>", tags=["marsupial"])
+            for i in range(3)
+        ]
+        Flashcard.objects.create(
+            id="quokka-card", note=self.notes[0], title="Quokka", question="Quokka?", answer="Quokka", tags=["marsupial"],
+        )
+        self.expired = Tombstone.objects.create(
+            doc_type="note", doc_id="long-gone", deleted_at=sync.tombstone_cutoff() - timedelta(days=1),
+        )
+
+    def bulk_delete(self, ids):
+        return self.client.delete("/api/notes/bulk/", {"ids": ids}, content_type="application/json")
+
+    def test_bulk_delete_updates_the_indexes_for_the_whole_set(self):
+        with mock.patch.object(search_index, "remove_document") as remove_document, \
+             mock.patch.object(sync, "prune_tombstones", wraps=sync.prune_tombstones) as prune:
+            response = self.bulk_delete(["quokka-0", "quokka-1"])
+
+        self.assertEqual(response.status_code, 200, response.content)
+        remove_document.assert_not_called()
+        prune.assert_called_once()
+        self.assertFalse(Flashcard.objects.filter(id="quokka-card").exists())
+        self.assertFalse(SearchDocument.objects.filter(doc_id__in=["quokka-0", "quokka-1", "quokka-card"]).exists())
+        self.assertEqual(TagCount.objects.get(doc_type="note", tag="marsupial").count, 1)
+        self.assertFalse(TagCount.objects.filter(doc_type="flashcard", tag="marsupial").exists())
+        self.assertEqual(
+            set(Tombstone.objects.values_list("doc_type", "doc_id")),
+            {("note", "quokka-0"), ("note", "quokka-1"), ("flashcard", "quokka-card")},
+        )
+
+    def test_single_delete_prunes_once(self):
+        response = self.client.delete("/api/notes/quokka-0/")
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(TagAssignment.objects.filter(doc_id__in=["quokka-0", "quokka-card"]).exists())
+        self.assertEqual(
+            set(Tombstone.objects.values_list("doc_type", "doc_id")),
+            {("note", "quokka-0"), ("flashcard", "quokka-card")},
+        )
+
+    def test_recording_a_deletion_does_not_prune(self):
+        sync.record_deletion("note", "quokka-9")
+
+        self.assertTrue(Tombstone.objects.filter(pk=self.expired.pk).exists())
@@ -1,23 +1,36 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
+# Under ASGI the AI endpoints are async, so a request waiting on the model holds no thread
+if settings.ASYNC_AI_VIEWS:
+    from . import async_views as ai_views
+else:
+    ai_views = views
+
 router = DefaultRouter()
 router.register(r'notes', views.NoteViewSet)
 router.register(r'flashcards', views.FlashcardViewSet)
 router.register(r'summaries', views.SummaryViewSet, basename='summary')
 
 urlpatterns = [
+    # Before the router, whose flashcards/<pk>/ route would otherwise match it
+    path('flashcards/batch/', views.batch_create_flashcards, name='batch_create_flashcards'),
     path('', include(router.urls)),
     path('health/', views.health_check, name='health_check'),
     path('ping/', views.ping, name='ping'),
-    path('summarize/', views.summarize, name='summarize'),
-    path('create-summary/', views.create_summary, name='create_summary'),
-    path('tag/', views.tag, name='tag'),
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
+    path('summarize/', ai_views.summarize, name='summarize'),
+    path('create-summary/', ai_views.create_summary, name='create_summary'),
+    path('tag/', ai_views.tag, name='tag'),
+    path('tags/', views.list_tags, name='list_tags'),
     path('search/', views.search, name='search'),
+    path('sync/', views.sync_changes, name='sync_changes'),
     path('upload/', views.upload_file, name='upload_file'),
-    path('chatbot/', views.chatbot, name='chatbot'),
-    path('generate-flashcards/', views.generate_flashcards, name='generate_flashcards'),
+    path('chatbot/', ai_views.chatbot, name='chatbot'),
+    path('generate-flashcards/', ai_views.generate_flashcards, name='generate_flashcards'),
     path('import/', views.import_file, name='import_file'),
-    path('flashcards/batch/', views.batch_create_flashcards, name='batch_create_flashcards'),
+    path('import/bulk/', views.bulk_import, name='bulk_import'),
+    path('jobs/<str:job_id>/', views.job_status, name='job_status'),
 ] 
\ No newline at end of file
@@ -1,65 +1,98 @@
 from django.shortcuts import render, get_object_or_404
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import action, api_view, parser_classes
 from rest_framework.response import Response
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
-from .models import Note, Flashcard, Summary
-from .serializers import NoteSerializer, FlashcardSerializer
+from .models import Note, Flashcard, Summary, Job
+from .serializers import NoteSerializer, NoteBulkSerializer, FlashcardSerializer, FlashcardBulkSerializer
 from .ai_utils import (
-    summarize_text, tag_text, extract_text_from_pdf, 
-    mock_database, calculate_search_score, calculate_flashcard_score
+    summarize_text, tag_text, run_concurrently, iter_flashcards, iter_streamed_flashcards, fallback_flashcards,
+    stream_summary, stream_tags, LLM_EXECUTOR
+)
+from .extractors import ExtractionError, cached_extract_text
+from .pagination import KeysetPagination
+from . import (
+    db, extractors, jobs, pg_search, projection, ranking, search_index, semantic_index, signals, sync, tag_index
 )
 import json
 import uuid
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.core.files import File
+from django.urls import reverse
 import os
-import pytesseract
-from PIL import Image
-import io
-import PyPDF2
-import docx
-from pptx import Presentation
+import html
+import shutil
+import tempfile
 import logging
 import time
 from datetime import datetime
 
-# Load initial mock data into database
-def load_mock_data():
-    # Check if we have notes already
-    if Note.objects.count() == 0:
-        # Load mock notes
-        for note_data in mock_database["notes"]:
-            note = Note(
-                id=note_data["id"],
-                title=note_data["title"],
-                content=note_data["content"],
-                summary=note_data["summary"],
-                tags=note_data["tags"],
-                created_at=note_data["created_at"],
-                updated_at=note_data["updated_at"]
-            )
-            note.save()
-            
-    # Check if we have flashcards already
-    if Flashcard.objects.count() == 0:
-        # Load mock flashcards
-        for card_data in mock_database["flashcards"]:
-            card = Flashcard(
-                id=card_data["id"],
-                title=card_data["title"],
-                question=card_data["question"],
-                answer=card_data["answer"],
-                tags=card_data["tags"],
-                created_at=card_data["created_at"]
-            )
-            card.save()
+# Number of search results returned by default, and the most a client may ask for
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+# BM25F over the inverted index, or ts_rank over PostgreSQL's tsvector columns
+search_ranking = pg_search if settings.SEARCH_BACKEND == 'postgres' else ranking
+
+# Number of tags returned by /api/tags/ by default, and the most a client may ask for
+TAGS_DEFAULT_LIMIT = 100
+TAGS_MAX_LIMIT = 1000
+
+# Largest single file accepted by the import endpoints
+IMPORT_MAX_FILE_SIZE = 10 * 1024 * 1024
+# Files (after unpacking zip archives) and total bytes accepted by one bulk import
+BULK_IMPORT_MAX_FILES = int(os.getenv("BULK_IMPORT_MAX_FILES", 500))
+BULK_IMPORT_MAX_BYTES = int(os.getenv("BULK_IMPORT_MAX_BYTES", 500 * 1024 * 1024))
+# Notes created per transaction by a bulk import
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", 100))
 
-# Try to load mock data when module is imported
-try:
-    load_mock_data()
-except Exception as e:
-    print(f"Error loading mock data: {e}")
+# Most items accepted by one request to a bulk write endpoint
+BULK_MAX_ITEMS = 1000
+# Rows inserted per statement when batch creating flashcards
+BULK_CREATE_BATCH_SIZE = 500
+
+def wants_async(request):
+    """True if the client asked for the work to be queued (?async=true or Prefer: respond-async)"""
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return True
+    flag = request.query_params.get('async', request.data.get('async', False))
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+def job_accepted(job):
+    """202 response pointing the client at the job's status URL"""
+    status_url = reverse('job_status', args=[job.id])
+    return Response(
+        {"job_id": job.id, "status": job.status, "status_url": status_url},
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Location": status_url}
+    )
+
+# Server-Sent Events helpers for the streaming mode of the AI endpoints
+def wants_stream(request):
+    """True if the client asked for a streamed response (?stream=true or "stream": true)"""
+    flag = request.query_params.get('stream', request.data.get('stream', False))
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Stream (event, data) pairs to the client as text/event-stream"""
+    def stream():
+        try:
+            for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 # Ping endpoint for health checking
 @api_view(['GET'])
@@ -80,10 +113,235 @@ def health_check(request):
         "ai_model": AI_MODEL
     })
 
+# Cache statistics endpoint
+@api_view(['GET'])
+def cache_stats(request):
+    """Hit/miss counters and sizes of the persistent caches"""
+    from .ai_utils import LLM_CACHE
+    return Response({
+        "llm": LLM_CACHE.stats(),
+        "extraction": extractors.EXTRACTION_CACHE.stats()
+    })
+
+# Bulk note writes
+def sync_indexes(doc_type, instances):
+    """Update the search, tag and embedding indexes after bulk writes, which skip the model signals"""
+    search_index.index_documents(doc_type, instances)
+    tag_index.index_tags(doc_type, instances)
+    if doc_type == "note":
+        semantic_index.schedule_index(instances)
+
+def bulk_items(request, key):
+    """The list of items of a bulk request, sent either as the body or under key"""
+    items = request.data if isinstance(request.data, list) else request.data.get(key)
+    if not isinstance(items, list):
+        return None, Response({"error": f"Expected a list of {key}"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > BULK_MAX_ITEMS:
+        return None, Response(
+            {"error": f"Too many {key}. A bulk request accepts at most {BULK_MAX_ITEMS}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return items, None
+
+def bulk_item_error(index, errors, item_id=None):
+    return {"index": index, "id": item_id, "status": "error", "errors": errors}
+
+def bulk_response(results, success_status=status.HTTP_200_OK):
+    """Per-item results, with 207 Multi-Status if any item failed"""
+    if any(result["status"] == "error" for result in results):
+        return Response({"results": results}, status=status.HTTP_207_MULTI_STATUS)
+    return Response({"results": results}, status=success_status)
+
+def bulk_create_notes(items):
+    """
+    Create many notes in one transaction.
+    
+    Existing IDs are found with a single query and handled like
+    NoteViewSet.create does: an identical note is returned as it is, a
+    different one gets a new ID.
+    
+    Returns:
+        list: One result per item, in order
+    """
+    results = [None] * len(items)
+    ids = [item.get('id') for item in items if isinstance(item, dict) and item.get('id')]
+    existing = Note.objects.in_bulk(ids)
+    
+    created, unchanged = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('id'):
+            results[index] = bulk_item_error(index, {"id": ["Note ID is required"]})
+            continue
+        serializer = NoteBulkSerializer(data=item)
+        if not serializer.is_valid():
+            results[index] = bulk_item_error(index, serializer.errors, item['id'])
+            continue
+        
+        data = serializer.validated_data
+        previous = existing.get(data['id'])
+        if previous:
+            # The same note sent again (likely a retried sync), return it without creating a duplicate
+            if previous.title == data.get('title', '') and previous.content == data.get('content', ''):
+                unchanged.append((index, previous))
+                continue
+            # A different note with the same ID, generate a new ID
+            data = {**data, "id": f"note-{uuid.uuid4()}"}
+        
+        note = Note(**data)
+        # Later items with the same ID are resolved against this one
+        existing[note.id] = note
+        created.append((index, note))
+    
+    notes = [note for _, note in created]
+    with transaction.atomic():
+        Note.objects.bulk_create(notes)
+        sync_indexes("note", notes)
+    
+    # Serialized after saving, as an item can repeat a note created earlier in the request
+    for index, note in created:
+        results[index] = {"index": index, "id": note.id, "status": "created", "note": NoteSerializer(note).data}
+    for index, note in unchanged:
+        results[index] = {"index": index, "id": note.id, "status": "exists", "note": NoteSerializer(note).data}
+    return results
+
+def bulk_update_notes(items):
+    """Apply partial updates to many notes, found with one query and written with one bulk_update"""
+    results = [None] * len(items)
+    ids = [item.get('id') for item in items if isinstance(item, dict) and item.get('id')]
+    existing = Note.objects.in_bulk(ids)
+    
+    updated, fields = [], {"updated_at"}
+    now = timezone.now()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('id'):
+            results[index] = bulk_item_error(index, {"id": ["Note ID is required"]})
+            continue
+        note = existing.get(item['id'])
+        if note is None:
+            results[index] = bulk_item_error(index, {"id": ["Note not found"]}, item['id'])
+            continue
+        serializer = NoteBulkSerializer(note, data=item, partial=True)
+        if not serializer.is_valid():
+            results[index] = bulk_item_error(index, serializer.errors, note.id)
+            continue
+        
+        for field, value in serializer.validated_data.items():
+            if field != 'id':
+                setattr(note, field, value)
+                fields.add(field)
+        # bulk_update does not touch auto_now fields
+        note.updated_at = now
+        updated.append((index, note))
+    
+    notes = list({note.id: note for _, note in updated}.values())
+    with transaction.atomic():
+        Note.objects.bulk_update(notes, sorted(fields))
+        sync_indexes("note", notes)
+    
+    for index, note in updated:
+        results[index] = {"index": index, "id": note.id, "status": "updated", "note": NoteSerializer(note).data}
+    return results
+
+def unindex_deleted(doc_type, ids):
+    """Drop deleted documents from the indexes and leave their tombstones, after bulk deletes"""
+    search_index.remove_documents(doc_type, ids)
+    tag_index.remove_tags(doc_type, ids)
+    if doc_type == "note":
+        semantic_index.schedule_removal(ids)
+    sync.record_deletions(doc_type, ids)
+
+def bulk_delete_notes(ids):
+    """Delete many notes (and their flashcards) in one transaction"""
+    with transaction.atomic():
+        notes = Note.objects.filter(id__in=ids)
+        found = set(notes.values_list('id', flat=True))
+        flashcard_ids = list(Flashcard.objects.filter(note_id__in=found).values_list('id', flat=True))
+        # The per-row delete handlers are skipped; the indexes and tombstones
+        # are updated for the whole set below
+        with signals.bulk_deletion():
+            notes.delete()
+        unindex_deleted("note", found)
+        unindex_deleted("flashcard", flashcard_ids)
+        sync.prune_tombstones()
+    return [
+        {"index": index, "id": note_id, "status": "deleted"} if note_id in found
+        else bulk_item_error(index, {"id": ["Note not found"]}, note_id)
+        for index, note_id in enumerate(ids)
+    ]
+
+# Tag filtering and field projection shared by the note and flashcard lists
+class ListViewMixin:
+    """
+    List views filtered by ?tags=a,b (all of them, or any with ?tag_mode=any)
+    that can return a compact representation (?view=compact) or only some
+    fields (?fields=a,b), reading only those columns, and are paginated with
+    ?limit= and ?cursor=.
+
+    List and detail responses carry an ETag and Last-Modified, and answer
+    a matching If-None-Match or If-Modified-Since with 304 Not Modified.
+    Lists are read from the read-only alias when there is one, and every
+    save or delete is a single transaction with its index updates.
+    """
+    doc_type = None
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            tags, mode = tag_index.parse_tag_filter(self.request.query_params)
+            queryset = tag_index.filter_by_tags(queryset, self.doc_type, tags, mode)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        with db.read_replica():
+            return self.list_page(request, *args, **kwargs)
+    
+    def list_page(self, request, *args, **kwargs):
+        try:
+            fields = projection.requested_fields(self.doc_type, request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = sync.list_validators(self.doc_type, queryset, request.get_full_path())
+        not_modified = sync.not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        page = self.paginate_queryset(queryset)
+        if fields is None:
+            data = self.get_serializer(page, many=True).data
+        else:
+            data = projection.project(self.doc_type, page, fields)
+        return sync.set_validators(self.get_paginated_response(data), etag, last_modified)
+    
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = sync.object_validators(self.doc_type, instance)
+        not_modified = sync.not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = Response(self.get_serializer(instance).data)
+        return sync.set_validators(response, etag, last_modified)
+    
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            sync.prune_tombstones()
+
 # Note viewset for CRUD operations
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(ListViewMixin, viewsets.ModelViewSet):
     queryset = Note.objects.all()
     serializer_class = NoteSerializer
+    doc_type = "note"
     
     def create(self, request, *args, **kwargs):
         """Custom create method to ensure unique IDs and prevent duplication on refresh"""
@@ -129,11 +387,28 @@ class NoteViewSet(viewsets.ModelViewSet):
             
         # No conflict, proceed with normal creation
         return super().create(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """Create (POST), update (PATCH) or delete (DELETE, a list of IDs) many notes at once"""
+        if request.method == 'DELETE':
+            ids, error = bulk_items(request, 'ids')
+            if error:
+                return error
+            return bulk_response(bulk_delete_notes([str(note_id) for note_id in ids]))
+        
+        items, error = bulk_items(request, 'notes')
+        if error:
+            return error
+        if request.method == 'POST':
+            return bulk_response(bulk_create_notes(items), status.HTTP_201_CREATED)
+        return bulk_response(bulk_update_notes(items))
 
 # Flashcard viewset for CRUD operations
-class FlashcardViewSet(viewsets.ModelViewSet):
+class FlashcardViewSet(ListViewMixin, viewsets.ModelViewSet):
     queryset = Flashcard.objects.all()
     serializer_class = FlashcardSerializer
+    doc_type = "flashcard"
     
     def create(self, request, *args, **kwargs):
         """Custom create method to ensure unique IDs and prevent duplication on refresh"""
@@ -192,6 +467,9 @@ def summarize(request):
     if not text:
         return Response({"error": "No text provided"}, status=status.HTTP_400_BAD_REQUEST)
     
+    if wants_stream(request):
+        return sse_response(stream_summary(text, ai_model))
+    
     try:
         result = summarize_text(text, ai_model)
         return Response(result)
@@ -209,73 +487,146 @@ def tag(request):
     if not text:
         return Response({"error": "No text provided"}, status=status.HTTP_400_BAD_REQUEST)
     
+    if wants_stream(request):
+        return sse_response(stream_tags(text, ai_model))
+    
     try:
         result = tag_text(text, ai_model)
         return Response(result)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# Tag counts endpoint
+@api_view(['GET'])
+def list_tags(request):
+    """Tags with the number of notes, flashcards and summaries carrying them, most used first"""
+    doc_type = request.query_params.get('type')
+    if doc_type and doc_type not in tag_index.TAGGED_MODELS:
+        return Response(
+            {"error": f"type must be one of: {', '.join(tag_index.TAGGED_MODELS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(int(request.query_params.get('limit', TAGS_DEFAULT_LIMIT)), TAGS_MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    with db.read_replica():
+        tags = tag_index.tag_counts(doc_type, request.query_params.get('prefix'), max(limit, 1))
+    return Response({"tags": tags})
+
+# Delta sync endpoint
+@api_view(['GET'])
+def sync_changes(request):
+    """
+    Notes and flashcards created, edited or deleted since ?since= (the
+    server_time of the previous sync, or seconds since the epoch).
+
+    Without since, or when since is older than the tombstone retention,
+    everything is returned with "full": true and the client should replace
+    its copy. Records changed right at the boundary may be sent twice.
+    """
+    since = request.query_params.get('since')
+    if since:
+        try:
+            since = sync.parse_since(since)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Taken before reading, so nothing written during the sync is skipped next time
+    server_time = timezone.now()
+    changes = sync.changes_since(since or None, {"note": NoteSerializer, "flashcard": FlashcardSerializer})
+    return Response({
+        "server_time": server_time.isoformat(),
+        "full": changes["full"],
+        "notes": changes["changed"]["note"],
+        "flashcards": changes["changed"]["flashcard"],
+        "deleted": {
+            "notes": changes["deleted"]["note"],
+            "flashcards": changes["deleted"]["flashcard"],
+        },
+    })
+
 # Search endpoint
 @api_view(['GET'])
 def search(request):
-    """Search across notes and flashcards"""
+    """
+    Search across notes and flashcards for the query's words, or with
+    ?mode=semantic across notes for the closest meaning
+    """
     query = request.GET.get('q', '')
+    mode = request.GET.get('mode', 'keyword')
+    
+    if mode not in ('keyword', 'semantic'):
+        return Response({"error": "mode must be keyword or semantic"}, status=status.HTTP_400_BAD_REQUEST)
+    if mode == 'semantic' and not semantic_index.SEMANTIC_SEARCH:
+        return Response(
+            {"error": "Semantic search is not enabled (SEMANTIC_SEARCH=true)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     if not query:
-        return Response({"results": []})
+        return Response({"results": [], "next_cursor": None})
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    ranker = semantic_index if mode == 'semantic' else search_ranking
+    with db.read_replica():
+        return search_page(ranker, query, limit, request.GET.get('cursor'))
+
+def search_page(ranker, query, limit, cursor):
+    """One page of search results ranked by ranker (a module with a rank function), with snippets"""
+    try:
+        ranked, next_cursor = ranker.rank(query, limit, cursor)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     try:
         results = []
-        query = query.lower()
-        
-        # Search notes from database
-        notes = Note.objects.all()
-        for note in notes:
-            note_dict = {
-                "id": note.id,
-                "title": note.title,
-                "content": note.content,
-                "summary": note.summary,
-                "tags": note.tags
-            }
-            score = calculate_search_score(note_dict, query)
-            if score > 0:
+        terms = search_index.tokenize(query)
+        
+        # Only the rows on this page are read, and only the fields needed for snippets
+        notes = Note.objects.only("id", "title", "content", "summary", "tags").in_bulk(
+            [doc.doc_id for doc in ranked if doc.doc_type == "note"]
+        )
+        flashcards = Flashcard.objects.only("id", "title", "question", "answer", "tags").in_bulk(
+            [doc.doc_id for doc in ranked if doc.doc_type == "flashcard"]
+        )
+        
+        for doc in ranked:
+            if doc.doc_type == "note" and doc.doc_id in notes:
+                note = notes[doc.doc_id]
+                snippet_source = note.summary if "summary" in doc.fields and "content" not in doc.fields else note.content
                 results.append({
                     "id": note.id,
                     "title": note.title,
-                    "summary": note.summary,
+                    "snippet": search_index.make_snippet(snippet_source, terms),
                     "tags": note.tags,
                     "type": "note",
-                    "matchScore": score
+                    "matchScore": round(doc.score, 4)
                 })
-        
-        # Search flashcards from database
-        flashcards = Flashcard.objects.all()
-        for card in flashcards:
-            card_dict = {
-                "id": card.id,
-                "title": card.title,
-                "question": card.question,
-                "answer": card.answer,
-                "tags": card.tags
-            }
-            score = calculate_flashcard_score(card_dict, query)
-            if score > 0:
+            elif doc.doc_type == "flashcard" and doc.doc_id in flashcards:
+                card = flashcards[doc.doc_id]
+                snippet_source = card.answer if "answer" in doc.fields and "question" not in doc.fields else card.question
                 results.append({
                     "id": card.id,
                     "title": card.title,
-                    "question": card.question,
-                    "answer": card.answer,
+                    "snippet": search_index.make_snippet(snippet_source, terms),
                     "tags": card.tags,
                     "type": "flashcard",
-                    "matchScore": score,
-                    "match_info": card_dict.get("match_info", {})
+                    "matchScore": round(doc.score, 4),
+                    "match_info": {
+                        "title_match": "title" in doc.fields,
+                        "tag_match": "tags" in doc.fields
+                    }
                 })
         
-        # Sort results by match score (descending)
-        results = sorted(results, key=lambda x: x["matchScore"], reverse=True)
-        
-        return Response({"results": results})
+        return Response({"results": results, "next_cursor": next_cursor})
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -283,7 +634,7 @@ def search(request):
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
 def upload_file(request):
-    """Upload and process files (PDF, TXT, MD, PNG, JPG)"""
+    """Upload and extract the text of a file of any type with a registered extractor"""
     if 'file' not in request.FILES:
         return Response({"error": "No file part in the request"}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -293,33 +644,41 @@ def upload_file(request):
         return Response({"error": "No file selected"}, status=status.HTTP_400_BAD_REQUEST)
         
     try:
-        file_ext = file.name.split('.')[-1].lower()
-        
-        if file_ext == 'pdf':
-            # Process PDF file
-            text = extract_text_from_pdf(file)
-        elif file_ext in ['txt', 'md']:
-            # Process text file
-            text = file.read().decode('utf-8')
-        elif file_ext in ['png', 'jpg', 'jpeg']:
-            # Process image file with OCR
-            image = Image.open(io.BytesIO(file.read()))
-            text = pytesseract.image_to_string(image)
-            
-            if not text or len(text.strip()) < 20:
-                return Response(
-                    {"error": "Could not extract sufficient text from image. Try a clearer image."}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        text = cached_extract_text(file)
+    except ExtractionError as e:
+        return Response({"error": str(e)}, status=e.status_code)
+        
+    return Response({"text": text})
+
+def chatbot_flashcards(title, summary, tags):
+    """Generate simple flashcards from content"""
+    return [
+        {"question": f"What is {title} about?", "answer": summary, "tags": tags[:2]},
+        {"question": f"Key concepts in {title}?", "answer": "See content for details", "tags": tags[:2]}
+    ]
+
+def stream_chatbot(content, title, tags, ai_model):
+    """Streaming chatbot: summary tokens as they arrive, then tags and the full result"""
+    # Tags are generated in the background while the summary streams
+    tags_future = None if tags else LLM_EXECUTOR.submit(tag_text, content, ai_model)
+    
+    summary_result = None
+    for event, data in stream_summary(content, ai_model):
+        if event == "done":
+            summary_result = data
         else:
-            return Response(
-                {"error": "Unsupported file type. Please upload .txt, .md, .pdf, .png, or .jpg file"}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-            
-        return Response({"text": text})
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            yield event, data
+    
+    if tags_future is not None:
+        tags = tags_future.result()["tags"]
+    yield "tags", tags
+    
+    yield "done", {
+        "tags": tags,
+        "flashcards": chatbot_flashcards(title, summary_result["summary"], tags),
+        "summary": summary_result["summary"],
+        "model_used": summary_result["model_used"]
+    }
 
 # Chatbot endpoint to generate flashcards, tags, summary
 @api_view(['POST'])
@@ -334,22 +693,23 @@ def chatbot(request):
     if not content:
         return Response({"error": "No content provided"}, status=status.HTTP_400_BAD_REQUEST)
     
+    if wants_stream(request):
+        return sse_response(stream_chatbot(content, title, tags, ai_model))
+    
     try:
-        # Generate tags if none provided
+        # Generate the summary, and tags if none provided, in parallel
         if not tags:
-            tag_result = tag_text(content, ai_model)
+            tag_result, summary_result = run_concurrently(
+                (tag_text, content, ai_model),
+                (summarize_text, content, ai_model)
+            )
             tags = tag_result["tags"]
-        
-        # Generate summary
-        summary_result = summarize_text(content, ai_model)
+        else:
+            summary_result = summarize_text(content, ai_model)
         summary = summary_result["summary"]
         model_used = summary_result["model_used"]
         
-        # Generate simple flashcards from content
-        flashcards = [
-            {"question": f"What is {title} about?", "answer": summary, "tags": tags[:2]},
-            {"question": f"Key concepts in {title}?", "answer": "See content for details", "tags": tags[:2]}
-        ]
+        flashcards = chatbot_flashcards(title, summary, tags)
             
         return Response({
             "tags": tags, 
@@ -360,6 +720,20 @@ def chatbot(request):
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def stream_flashcards(text, title):
+    """Streaming flashcard generation: one event per card as soon as it is parsed from the model's stream"""
+    count = 0
+    for card in iter_streamed_flashcards(text, title):
+        count += 1
+        yield "flashcard", card
+    
+    if not count:
+        for card in fallback_flashcards(text, title):
+            count += 1
+            yield "flashcard", card
+    
+    yield "done", {"count": count}
+
 # New endpoint to generate flashcards from text
 @api_view(['POST'])
 @parser_classes([JSONParser])
@@ -372,163 +746,48 @@ def generate_flashcards(request):
     if not text:
         return Response({"error": "No text provided"}, status=status.HTTP_400_BAD_REQUEST)
     
+    if wants_stream(request):
+        return sse_response(stream_flashcards(text, title))
+    
     try:
-        # Import AI dependencies
-        from .ai_utils import AI_MODEL, llama_api
-        
+        # Chunks are sent to the model in parallel and come back in order
         flashcards = []
-        
-        # If the text is very long, split it into chunks
-        max_token_length = 1000  # Adjust based on model capacity
-        text_chunks = []
-        
-        if len(text) > 2000:  # Roughly 500 tokens for English text
-            # Split by paragraphs first
-            paragraphs = [p for p in text.split('\n\n') if p.strip()]
-            
-            current_chunk = ""
-            for paragraph in paragraphs:
-                # If adding this paragraph exceeds our desired length, add current chunk to chunks and start a new one
-                if len(current_chunk) + len(paragraph) > 2000:
-                    if current_chunk:
-                        text_chunks.append(current_chunk)
-                    current_chunk = paragraph
-                else:
-                    current_chunk += "\n\n" + paragraph if current_chunk else paragraph
-            
-            # Add the last chunk if it contains text
-            if current_chunk:
-                text_chunks.append(current_chunk)
-        else:
-            text_chunks = [text]
-        
-        print(f"Processing {len(text_chunks)} text chunks")
-        
-        # Define a function to process each chunk with Llama API
-        def process_chunk_with_llama(chunk_text):
-            chunk_cards = []
-            
-            if AI_MODEL == 'llama' and llama_api is not None:
-                # Create prompt for Llama with better instructions
-                prompt = f"""Please create educational flashcards from the following text. Each flashcard should have a clear question on the front that tests a key concept, and a concise but complete answer on the back.
-
-Text:
-{chunk_text}
-
-Create 3-5 high-quality flashcards in this exact format:
-Q: [precise question about a key concept, term, or fact from the text]
-A: [clear, concise answer that fully addresses the question]
----
-"""
-                
-                try:
-                    # Generate flashcards with Llama 3 API
-                    response = llama_api(
-                        prompt,
-                        max_new_tokens=800,
-                        do_sample=True,
-                        top_p=0.9,
-                        temperature=0.6,  # Slightly lower temperature for more precise answers
-                    )
-                    
-                    # Handle response based on format
-                    if isinstance(response, str):
-                        result_text = response
-                    else:
-                        result_text = response[0]["generated_text"]
-                    
-                    # Extract flashcards from response
-                    cards_text = result_text.split("---")
-                    
-                    for card_text in cards_text:
-                        if "Q:" in card_text and "A:" in card_text:
-                            parts = card_text.split("A:")
-                            if len(parts) >= 2:  # Ensure we have both question and answer
-                                question = parts[0].replace("Q:", "").strip()
-                                answer = parts[1].strip()
-                                
-                                # Create flashcard if valid
-                                if question and answer and len(question) > 5 and len(answer) > 5:
-                                    # Get tags from the text
-                                    card_tags = []
-                                    if title:
-                                        card_tags.append(title)
-                                        
-                                    chunk_cards.append({
-                                        "question": question,
-                                        "answer": answer,
-                                        "tags": card_tags
-                                    })
-                except Exception as e:
-                    print(f"Error generating flashcards with Llama API: {e}")
-            
-            return chunk_cards
-        
-        # Process each chunk
-        for chunk in text_chunks:
-            chunk_flashcards = process_chunk_with_llama(chunk)
+        for chunk_flashcards in iter_flashcards(text, title):
             flashcards.extend(chunk_flashcards)
         
         # If no flashcards were generated with AI, use rule-based approach
         if not flashcards:
-            # Simple rule-based flashcard generation as fallback
-            paragraphs = [p for p in text.split('\n\n') if p.strip()]
-            if len(paragraphs) < 2:
-                paragraphs = [p for p in text.split('\n') if p.strip()]
-            
-            for i, paragraph in enumerate(paragraphs[:5]):  # Limit to first 5 paragraphs
-                if len(paragraph.strip()) < 10:
-                    continue
-                    
-                # Try to find a key term at the beginning of the paragraph
-                sentences = paragraph.split('. ')
-                
-                if len(sentences) > 1:
-                    first_sentence = sentences[0]
-                    rest = '. '.join(sentences[1:])
-                    
-                    # Create a question from the first sentence
-                    if ':' in first_sentence:
-                        # If there's a colon, use the part before it as the term
-                        parts = first_sentence.split(':', 1)
-                        term = parts[0].strip()
-                        definition = (parts[1] + '. ' + rest).strip()
-                        question = f"What is {term}?"
-                    else:
-                        # Otherwise, make a "What is X?" question
-                        words = first_sentence.split()
-                        if len(words) > 3:
-                            # Try to find a key noun phrase
-                            term = f"What is {' '.join(words[:3])}?"
-                            question = term
-                            definition = paragraph
-                        else:
-                            question = f"Explain: {first_sentence}"
-                            definition = rest
-                    
-                    # Create flashcard
-                    flashcards.append({
-                        "question": question,
-                        "answer": definition,
-                        "tags": [title] if title else []
-                    })
-                else:
-                    # Short paragraph, just create a general question
-                    flashcards.append({
-                        "question": f"What is described by: '{paragraph[:30]}...'?",
-                        "answer": paragraph,
-                        "tags": [title] if title else []
-                    })
+            flashcards = fallback_flashcards(text, title)
         
         return Response({"flashcards": flashcards})
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def save_upload(file, directory):
+    """Copy an upload into directory, keeping its extension, and return the new path"""
+    handle, path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(file.name)[1])
+    with os.fdopen(handle, 'wb') as saved:
+        for chunk in file.chunks():
+            saved.write(chunk)
+    return path
+
+@jobs.register("import_file")
+def import_file_job(path, filename):
+    """Background job: extract text from an upload saved by import_file"""
+    try:
+        with open(path, 'rb') as handle:
+            text = cached_extract_text(File(handle, name=filename))
+        return {"filename": filename, "text": text}
+    except ExtractionError as e:
+        raise jobs.JobError(str(e))
+    finally:
+        os.remove(path)
+
 # Import file endpoint
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
 def import_file(request):
-    """Import and extract text from various file types (PDF, Word, PowerPoint, Images)"""
+    """Import and extract text from various file types (PDF, Word, PowerPoint, text, images)"""
     logger = logging.getLogger(__name__)
     
     if 'file' not in request.FILES:
@@ -540,176 +799,278 @@ def import_file(request):
         return Response({"error": "No file selected"}, status=status.HTTP_400_BAD_REQUEST)
     
     # Check file size (limit to 10MB)
-    max_size = 10 * 1024 * 1024  # 10MB in bytes
-    if file.size > max_size:
+    if file.size > IMPORT_MAX_FILE_SIZE:
         return Response({"error": "File is too large. Maximum size is 10MB."}, 
                        status=status.HTTP_400_BAD_REQUEST)
-        
+    
+    logger.info(f"Processing file: {file.name} ({file.size} bytes, type: {file.content_type})")
+    
+    if wants_async(request):
+        # Keep a copy of the upload for the worker; Django removes its own temp file after the request
+        os.makedirs(jobs.JOB_UPLOAD_DIR, exist_ok=True)
+        path = save_upload(file, jobs.JOB_UPLOAD_DIR)
+        job = jobs.enqueue("import_file", {"path": path, "filename": file.name})
+        return job_accepted(job)
+    
     try:
-        filename = file.name
-        logger.info(f"Processing file: {filename} ({file.size} bytes, type: {file.content_type})")
-        file_ext = filename.split('.')[-1].lower()
-        
-        if file_ext == 'pdf':
-            # Process PDF file
-            try:
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.read()))
-                if len(pdf_reader.pages) == 0:
-                    return Response({"error": "The PDF file appears to be empty or damaged."}, 
-                                   status=status.HTTP_400_BAD_REQUEST)
-                                   
-                text = ""
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n\n"
-                
-                if not text.strip():
-                    return Response({"error": "No text could be extracted from the PDF file. It may be a scanned document or image-based PDF."}, 
-                                   status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                logger.error(f"PDF processing error: {str(e)}")
-                return Response({"error": f"Failed to process PDF file: {str(e)}"}, 
-                               status=status.HTTP_400_BAD_REQUEST)
-                
-        elif file_ext == 'docx':
-            # Process Word document
-            try:
-                doc = docx.Document(io.BytesIO(file.read()))
-                text = ""
-                for para in doc.paragraphs:
-                    if para.text:
-                        text += para.text + "\n\n"
-                        
-                if not text.strip():
-                    return Response({"error": "The Word document appears to be empty or contains no readable text."}, 
-                                   status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                logger.error(f"DOCX processing error: {str(e)}")
-                return Response({"error": f"Failed to process Word document: {str(e)}"}, 
-                               status=status.HTTP_400_BAD_REQUEST)
-                    
-        elif file_ext == 'pptx':
-            # Process PowerPoint presentation
-            try:
-                prs = Presentation(io.BytesIO(file.read()))
-                text = ""
-                for i, slide in enumerate(prs.slides):
-                    slide_text = ""
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text") and shape.text:
-                            slide_text += shape.text + "\n"
-                    
-                    if slide_text.strip():
-                        text += f"Slide {i+1}:\n{slide_text}\n---\n\n"
-                
-                if not text.strip():
-                    return Response({"error": "The PowerPoint presentation appears to be empty or contains no readable text."}, 
-                                   status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                logger.error(f"PPTX processing error: {str(e)}")
-                return Response({"error": f"Failed to process PowerPoint presentation: {str(e)}"}, 
-                               status=status.HTTP_400_BAD_REQUEST)
-                
-        elif file_ext in ['png', 'jpg', 'jpeg']:
-            # Process image file with OCR
-            try:
-                image = Image.open(io.BytesIO(file.read()))
-                
-                # Check if image is too large for processing
-                max_dimension = 4000
-                if image.width > max_dimension or image.height > max_dimension:
-                    # Resize image to reasonable dimensions
-                    resize_ratio = min(max_dimension/image.width, max_dimension/image.height)
-                    new_width = int(image.width * resize_ratio)
-                    new_height = int(image.height * resize_ratio)
-                    image = image.resize((new_width, new_height), Image.LANCZOS)
-                    logger.info(f"Resized image from {image.width}x{image.height} to {new_width}x{new_height}")
-                
-                # Check if Tesseract is installed and configured
-                try:
-                    pytesseract.get_tesseract_version()
-                except Exception as e:
-                    logger.error(f"Tesseract not properly installed or configured: {str(e)}")
-                    return Response({"error": "OCR engine (Tesseract) is not properly installed or configured on the server."}, 
-                                   status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                
-                text = pytesseract.image_to_string(image)
-                
-                if not text.strip():
-                    return Response({"error": "No text could be extracted from the image. The image may not contain readable text or the text may be unclear."}, 
-                                   status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                logger.error(f"Image processing error: {str(e)}")
-                return Response({"error": f"Failed to process image file: {str(e)}"}, 
-                               status=status.HTTP_400_BAD_REQUEST)
-            
-        else:
-            return Response(
-                {"error": f"Unsupported file type: {file_ext}. Please upload PDF, DOCX, PPTX, or image files (JPG, PNG)."}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        text = cached_extract_text(file)
+    except ExtractionError as e:
+        return Response({"error": str(e)}, status=e.status_code)
+    
+    # Return successful response with extracted text
+    return Response({
+        "filename": file.name,
+        "text": text
+    })
+
+def text_to_html(text):
+    """Turn extracted plain text into paragraphs for the note editor"""
+    paragraphs = [paragraph.strip() for paragraph in text.split("\n\n") if paragraph.strip()]
+    return "".join(
+        "<p>" + html.escape(paragraph).replace("\n", "<br>") + "</p>" for paragraph in paragraphs
+    )
+
+def save_bulk_uploads(files, directory):
+    """
+    Save the files of a bulk import into directory, unpacking zip archives.
+    
+    Returns:
+        tuple: (path, filename) pairs to extract, and failures for files rejected up front
+    """
+    sources, failed = [], []
+    total_size = 0
+    for file in files:
+        total_size += file.size
+        if total_size > BULK_IMPORT_MAX_BYTES:
+            raise ExtractionError(f"The upload is too large. Maximum total size is {BULK_IMPORT_MAX_BYTES // (1024 * 1024)}MB.")
         
-        # Validate the extracted text
-        if not text or not text.strip():
-            return Response({"error": "No text could be extracted from the file. Please try another file."}, 
-                           status=status.HTTP_400_BAD_REQUEST)
-            
-        # Return successful response with extracted text
-        logger.info(f"Successfully extracted {len(text)} characters from {filename}")
-        return Response({
-            "filename": filename,
-            "text": text.strip()
-        })
+        if extractors.file_extension(file.name) == 'zip':
+            path = save_upload(file, directory)
+            unpacked, rejected, unpacked_size = extractors.unpack_zip(
+                path, directory,
+                max_files=BULK_IMPORT_MAX_FILES - len(sources),
+                max_bytes=BULK_IMPORT_MAX_BYTES - total_size,
+                max_file_size=IMPORT_MAX_FILE_SIZE,
+            )
+            sources.extend(unpacked)
+            failed.extend(rejected)
+            os.remove(path)
+            # The budget covers what each archive expanded to, not just the archive
+            total_size += unpacked_size
+        elif file.size > IMPORT_MAX_FILE_SIZE:
+            failed.append({"filename": file.name, "error": "File is too large. Maximum size is 10MB."})
+        else:
+            sources.append((save_upload(file, directory), file.name))
         
-    except UnicodeDecodeError:
-        logger.error(f"Unicode decode error while processing {file.name}")
-        return Response({"error": "Unable to decode the file. Please ensure it's a valid text-based file."}, 
-                       status=status.HTTP_400_BAD_REQUEST)
-    except MemoryError:
-        logger.error(f"Memory error while processing {file.name}")
-        return Response({"error": "File is too large to process. Please try a smaller file."}, 
-                       status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        logger.error(f"Unexpected error processing {file.name}: {str(e)}")
-        return Response({"error": f"Error processing file: {str(e)}"}, 
-                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if len(sources) > BULK_IMPORT_MAX_FILES:
+            raise ExtractionError(f"Too many files. A bulk import accepts at most {BULK_IMPORT_MAX_FILES}.")
+    return sources, failed
+
+def create_imported_notes(results):
+    """
+    Create one note per successfully extracted file, in batched transactions.
+    
+    bulk_create skips the model signals, so each batch is added to the
+    search and tag indexes explicitly.
+    """
+    notes = [
+        Note(
+            id=f"note-{uuid.uuid4()}",
+            title=os.path.splitext(result["filename"])[0][:255] or "Imported note",
+            content=text_to_html(result["text"]),
+            tags=[],
+        )
+        for result in results
+    ]
+    for start in range(0, len(notes), BULK_IMPORT_BATCH_SIZE):
+        batch = notes[start:start + BULK_IMPORT_BATCH_SIZE]
+        with transaction.atomic():
+            Note.objects.bulk_create(batch)
+            sync_indexes("note", batch)
+    return notes
+
+def run_bulk_import(sources, failed):
+    """Extract the saved files in the extraction process pool and create their notes"""
+    results = extractors.extract_paths(sources)
+    extracted = [result for result in results if "text" in result]
+    failed = failed + [
+        {"filename": result["filename"], "error": result["error"]} for result in results if "error" in result
+    ]
+    notes = create_imported_notes(extracted)
+    return {
+        "imported": [
+            {"id": note.id, "title": note.title, "filename": result["filename"]}
+            for note, result in zip(notes, extracted)
+        ],
+        "failed": failed,
+    }
+
+@jobs.register("bulk_import")
+def bulk_import_job(directory, sources, failed):
+    """Background job: import the files saved by bulk_import"""
+    try:
+        return run_bulk_import([tuple(source) for source in sources], failed)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+# Bulk import endpoint
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+def bulk_import(request):
+    """Create a note from each of many uploaded files, or from the documents in zip archives"""
+    logger = logging.getLogger(__name__)
+    
+    files = request.FILES.getlist('files') + request.FILES.getlist('file')
+    if not files:
+        return Response({"error": "No files provided"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    run_async = wants_async(request)
+    if run_async:
+        os.makedirs(jobs.JOB_UPLOAD_DIR, exist_ok=True)
+    directory = tempfile.mkdtemp(dir=jobs.JOB_UPLOAD_DIR if run_async else None)
+    try:
+        sources, failed = save_bulk_uploads(files, directory)
+    except ExtractionError as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        return Response({"error": str(e)}, status=e.status_code)
+    
+    logger.info(f"Bulk importing {len(sources)} files")
+    
+    if run_async:
+        job = jobs.enqueue("bulk_import", {"directory": directory, "sources": sources, "failed": failed})
+        return job_accepted(job)
+    
+    try:
+        result = run_bulk_import(sources, failed)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    if not result["imported"]:
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    if result["failed"]:
+        return Response(result, status=status.HTTP_207_MULTI_STATUS)
+    return Response(result, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
 @parser_classes([JSONParser])
 def batch_create_flashcards(request):
-    """Batch create flashcards from a list of flashcard data."""
+    """
+    Batch create flashcards from a list of flashcard data.
+    
+    Cards are validated without touching the database, existing IDs and the
+    notes they point at are each looked up with one query, and all cards are
+    inserted with bulk_create in one transaction (in chunks of `batch_size`,
+    default BULK_CREATE_BATCH_SIZE). Cards without an ID get one; an
+    identical card sent again is returned as it is, and a different card
+    reusing an ID gets a new one, like FlashcardViewSet.create.
+    
+    If any card is invalid the response is 207 Multi-Status with the
+    created cards and, for each invalid one, its index, ID and errors in
+    the shape of the bulk note endpoints.
+    """
+    if not isinstance(request.data, dict):
+        return Response({"error": "Expected an object with a flashcards list"}, status=status.HTTP_400_BAD_REQUEST)
     flashcards_data = request.data.get('flashcards', [])
-    created = []
-    errors = []
-    for card_data in flashcards_data:
-        serializer = FlashcardSerializer(data=card_data)
+    if not isinstance(flashcards_data, list):
+        return Response({"error": "Expected a list of flashcards"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        batch_size = max(int(request.data.get('batch_size', BULK_CREATE_BATCH_SIZE)), 1)
+    except (TypeError, ValueError):
+        return Response({"error": "batch_size must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Results and errors by the index of the card in the request, so both keep its order
+    results = {}
+    errors = {}
+    valid = {}
+    for index, card_data in enumerate(flashcards_data):
+        serializer = FlashcardBulkSerializer(data=card_data)
         if serializer.is_valid():
-            serializer.save()
-            created.append(serializer.data)
+            valid[index] = serializer.validated_data
         else:
-            errors.append(serializer.errors)
+            card_id = card_data.get('id') if isinstance(card_data, dict) else None
+            errors[index] = bulk_item_error(index, serializer.errors, card_id)
+    
+    existing = Flashcard.objects.in_bulk([data['id'] for data in valid.values() if data.get('id')])
+    note_ids = set(Note.objects.filter(
+        id__in={data['note'] for data in valid.values() if data.get('note')}
+    ).values_list('id', flat=True))
+    
+    cards = {}
+    for index, data in valid.items():
+        if data.get('note') and data['note'] not in note_ids:
+            errors[index] = bulk_item_error(
+                index, {"note": [f'Invalid pk "{data["note"]}" - object does not exist.']}, data.get('id')
+            )
+            continue
+        
+        data = dict(data)
+        data['note_id'] = data.pop('note', None)
+        previous = existing.get(data.get('id'))
+        if previous:
+            # The same card sent again, return it without creating a duplicate
+            if (previous.title == data['title'] and previous.question == data['question'] and
+                    previous.answer == data['answer']):
+                results[index] = previous
+                continue
+            data['id'] = None
+        if not data.get('id'):
+            data['id'] = f"flashcard-{uuid.uuid4()}"
+        
+        card = Flashcard(**data)
+        # Later cards with the same ID are resolved against this one
+        existing[card.id] = card
+        cards[index] = card
+    
+    new_cards = list(cards.values())
+    with transaction.atomic():
+        Flashcard.objects.bulk_create(new_cards, batch_size=batch_size)
+        for start in range(0, len(new_cards), batch_size):
+            sync_indexes("flashcard", new_cards[start:start + batch_size])
+    results.update(cards)
+    created = [FlashcardSerializer(results[index]).data for index in sorted(results)]
+    
     if errors:
-        return Response({'created': created, 'errors': errors}, status=status.HTTP_207_MULTI_STATUS)
+        return Response(
+            {'created': created, 'errors': [errors[index] for index in sorted(errors)]},
+            status=status.HTTP_207_MULTI_STATUS
+        )
     return Response(created, status=status.HTTP_201_CREATED)
 
 # Summary Viewset
 class SummaryViewSet(viewsets.ViewSet):
     def list(self, request):
-        summaries = Summary.objects.all().order_by('-created_at')
-        data = []
-        for summary in summaries:
-            data.append({
-                "id": summary.id,
-                "title": summary.title,
-                "summary_text": summary.summary_text,
-                "original_text": summary.original_text,
-                "tags": summary.tags,
-                "created_at": summary.created_at,
-                "updated_at": summary.updated_at,
-                "model_used": summary.model_used
-            })
-        return Response(data)
+        with db.read_replica():
+            return self.list_page(request)
+
+    def list_page(self, request):
+        summaries = Summary.objects.all()
+        tags, mode = tag_index.parse_tag_filter(request.query_params)
+        summaries = tag_index.filter_by_tags(summaries, "summary", tags, mode)
+        try:
+            fields = projection.requested_fields("summary", request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        paginator = KeysetPagination()
+        summaries = paginator.paginate_queryset(summaries, request)
+        
+        if fields is not None:
+            data = projection.project("summary", summaries, fields)
+        else:
+            data = []
+            for summary in summaries:
+                data.append({
+                    "id": summary.id,
+                    "title": summary.title,
+                    "summary_text": summary.summary_text,
+                    "original_text": summary.original_text,
+                    "tags": summary.tags,
+                    "created_at": summary.created_at,
+                    "updated_at": summary.updated_at,
+                    "model_used": summary.model_used
+                })
+        
+        return paginator.get_paginated_response(data)
 
     def retrieve(self, request, pk=None):
         summary = get_object_or_404(Summary, pk=pk)
@@ -777,6 +1138,53 @@ class SummaryViewSet(viewsets.ViewSet):
         summary.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+def generate_summary(text, title, ai_model=None):
+    """Summarize and tag text, store it as a Summary and return its data"""
+    # Log the request
+    print(f"Creating summary for text ({len(text)} chars) with title: {title}")
+    
+    # Generate the summary and its tags in parallel
+    result, tags_result = run_concurrently(
+        (summarize_text, text, ai_model),
+        (tag_text, text, ai_model)
+    )
+    return save_summary(text, title, result, tags_result)
+
+def save_summary(text, title, result, tags_result):
+    """Store a generated summary and its tags as a Summary and return its data"""
+    summary_text = result["summary"]
+    model_used = result["model_used"]
+    tags = tags_result.get("tags", [])
+    
+    # Create unique ID
+    unique_id = f"summary-{int(time.time() * 1000)}"
+    
+    # Create summary in database
+    summary = Summary.objects.create(
+        id=unique_id,
+        title=title,
+        original_text=text,
+        summary_text=summary_text,
+        tags=tags,
+        model_used=model_used
+    )
+    
+    return {
+        "id": summary.id,
+        "title": summary.title,
+        "summary_text": summary.summary_text,
+        "original_text": summary.original_text,
+        "tags": summary.tags,
+        "created_at": summary.created_at,
+        "updated_at": summary.updated_at,
+        "model_used": model_used
+    }
+
+@jobs.register("create_summary")
+def create_summary_job(text, title, ai_model=None):
+    """Background job: generate and store a summary"""
+    return generate_summary(text, title, ai_model)
+
 # Add this after the existing summarize endpoint 
 @api_view(['POST'])
 def create_summary(request):
@@ -795,42 +1203,19 @@ def create_summary(request):
         if not text:
             return Response({"error": "Text content is required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Log the request
-        print(f"Creating summary for text ({len(text)} chars) with title: {title}")
-        
-        # Generate summary using AI
-        result = summarize_text(text, ai_model)
-        summary_text = result["summary"]
-        model_used = result["model_used"]
-        
-        # Generate tags for the summary
-        tags_result = tag_text(text, ai_model)
-        tags = tags_result.get("tags", [])
-        
-        # Create unique ID
-        unique_id = f"summary-{int(time.time() * 1000)}"
-        
-        # Create summary in database
-        summary = Summary.objects.create(
-            id=unique_id,
-            title=title,
-            original_text=text,
-            summary_text=summary_text,
-            tags=tags,
-            model_used=model_used
-        )
+        if wants_async(request):
+            job = jobs.enqueue("create_summary", {"text": text, "title": title, "ai_model": ai_model})
+            return job_accepted(job)
         
         # Return the created summary
-        return Response({
-            "id": summary.id,
-            "title": summary.title,
-            "summary_text": summary.summary_text,
-            "original_text": summary.original_text,
-            "tags": summary.tags,
-            "created_at": summary.created_at,
-            "updated_at": summary.updated_at,
-            "model_used": model_used
-        }, status=status.HTTP_201_CREATED)
+        return Response(generate_summary(text, title, ai_model), status=status.HTTP_201_CREATED)
     except Exception as e:
         print(f"Error in create_summary: {str(e)}")
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Background job status endpoint
+@api_view(['GET'])
+def job_status(request, job_id):
+    """Poll the state of a background job; the result is included once it has succeeded"""
+    job = get_object_or_404(Job, pk=job_id)
+    return Response(jobs.job_to_dict(job))
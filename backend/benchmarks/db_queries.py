@@ -0,0 +1,131 @@
+"""
+Benchmark the list and filter queries on notes, flashcards and summaries,
+before and after the indexes and tag table added in migration 0006.
+
+Usage (from the backend directory):
+
+    python benchmarks/db_queries.py --rows 100000
+
+A throwaway SQLite database is created in a temporary directory, migrated up
+to 0005, filled with --rows notes, flashcards and summaries, and timed; then
+it is migrated to the latest schema and timed again. The project database is
+never touched.
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import statistics
+import time
+from datetime import timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_note_organizer.settings")
+
+TAG_VOCABULARY = [f"topic-{i}" for i in range(500)]
+
+def setup_django(db_path):
+    """Point Django at the benchmark database before anything connects"""
+    from django.conf import settings
+    settings.DATABASES["default"]["NAME"] = db_path
+    # Keep the benchmark's queries out of the project's debug.log
+    settings.LOGGING = {"version": 1, "disable_existing_loggers": False}
+    import django
+    django.setup()
+
+def seed(rows):
+    """Bulk insert rows notes, flashcards and summaries (bulk_create skips the index signals)"""
+    from django.utils import timezone
+    from api.models import Note, Flashcard, Summary
+
+    rng = random.Random(42)
+    now = timezone.now()
+
+    def tags():
+        return rng.sample(TAG_VOCABULARY, 3)
+
+    def timestamp():
+        return now - timedelta(seconds=rng.randint(0, 365 * 24 * 60 * 60))
+
+    Note.objects.bulk_create([
+        Note(id=f"note-{i}", title=f"Note {i}", content=f"<p>Content of note {i}</p>",
+             tags=tags(), created_at=timestamp(), updated_at=timestamp())
+        for i in range(rows)
+    ], batch_size=5000)
+    Flashcard.objects.bulk_create([
+        Flashcard(id=f"flashcard-{i}", title=f"Card {i}", question=f"Question {i}?", answer=f"Answer {i}",
+                  tags=tags(), note_id=f"note-{rng.randrange(rows)}", created_at=timestamp())
+        for i in range(rows)
+    ], batch_size=5000)
+    Summary.objects.bulk_create([
+        Summary(id=f"summary-{i}", title=f"Summary {i}", original_text=f"Text {i}",
+                summary_text=f"Summary {i}", tags=tags(), created_at=timestamp(), updated_at=timestamp())
+        for i in range(rows)
+    ], batch_size=5000)
+
+def queries(rows, indexed):
+    """The access paths to time, as (name, callable returning a row count)"""
+    from api.models import Note, Flashcard, Summary
+
+    rng = random.Random(7)
+
+    def notes_tagged():
+        tag = rng.choice(TAG_VOCABULARY)
+        if indexed:
+            from api import tag_index
+            return Note.objects.filter(id__in=tag_index.tagged_ids("note", tag)).values_list("id", flat=True).count()
+        # Without the tag table every row's JSON has to be read and parsed
+        return sum(1 for tags in Note.objects.values_list("tags", flat=True).iterator() if tag in tags)
+
+    return [
+        ("summaries, newest 50", lambda: len(Summary.objects.order_by("-created_at")[:50])),
+        ("notes, recently updated 50", lambda: len(Note.objects.order_by("-updated_at")[:50])),
+        ("flashcards of a note, newest first", lambda: len(
+            Flashcard.objects.filter(note_id=f"note-{rng.randrange(rows)}").order_by("-created_at")
+        )),
+        ("notes with a tag", notes_tagged),
+    ]
+
+def measure(rows, indexed, repeat):
+    """Median milliseconds per query"""
+    results = {}
+    for name, query in queries(rows, indexed):
+        query()  # warm the page cache
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="rows per table (default 100000)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query (default 5)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, "benchmark.sqlite3"))
+        from django.core.management import call_command
+
+        call_command("migrate", "api", "0005", verbosity=0)
+        start = time.perf_counter()
+        seed(args.rows)
+        print(f"Seeded {args.rows} rows per table in {time.perf_counter() - start:.1f}s")
+        before = measure(args.rows, indexed=False, repeat=args.repeat)
+
+        start = time.perf_counter()
+        call_command("migrate", verbosity=0)
+        print(f"Migrated to the latest schema (indexes, tag table backfill) in {time.perf_counter() - start:.1f}s")
+        after = measure(args.rows, indexed=True, repeat=args.repeat)
+
+    print()
+    print(f"{'query':<38} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in before:
+        print(f"{name:<38} {before[name]:>10.2f} {after[name]:>10.2f} {before[name] / after[name]:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Load test the AI endpoints against a local mock OpenRouter, comparing the
+sync views (one thread per request, as under WSGI) with the async views
+served over ASGI (one event loop).
+
+Usage (from the backend directory):
+
+    python benchmarks/llm_concurrency.py --requests 500 --delay 1
+    python benchmarks/llm_concurrency.py --mock-only --port 9100
+
+The mock answers every chat completion after --delay seconds. Each mode runs
+in a fresh interpreter that sends --requests distinct texts to
+/api/summarize/ in-process: the sync views from --threads threads, the async
+views through Django's ASGI handler with up to --concurrency requests in
+flight. The LLM cache and database are throwaway files.
+
+With --mock-only the mock upstream just keeps running, so a real server
+(e.g. `OPENROUTER_API_URL=http://127.0.0.1:9100/ python run_asgi.py`) can
+be load tested with any HTTP benchmarking tool.
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_note_organizer.settings")
+
+COMPLETION = json.dumps({"choices": [{"message": {"content": "A short summary of the text."}}]}).encode("utf-8")
+
+async def handle_upstream(reader, writer, delay):
+    """Answer keep-alive HTTP/1.1 requests with a canned chat completion after delay seconds"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                name, _, value = line.partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            await asyncio.sleep(delay)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(COMPLETION), COMPLETION)
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+def start_upstream(port, delay):
+    """Run the mock upstream on its own event loop in a daemon thread; returns its URL"""
+    started = threading.Event()
+    address = {}
+
+    async def serve():
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_upstream(reader, writer, delay), "127.0.0.1", port, backlog=4096
+        )
+        address["port"] = server.sockets[0].getsockname()[1]
+        started.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return f"http://127.0.0.1:{address['port']}/"
+
+def request_body(i):
+    text = f"Request {i}. " + "Event loops let one process wait on many sockets at once. " * 4
+    return {"text": text}
+
+class ThreadCounter:
+    """Samples the number of live threads while a run is going on"""
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.05):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_sync(requests, threads):
+    """Sync views, one request per thread"""
+    from concurrent.futures import ThreadPoolExecutor
+    from django.test import Client
+
+    def send(i):
+        start = time.perf_counter()
+        response = Client().post("/api/summarize/", request_body(i), content_type="application/json")
+        return response.status_code, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(send, range(requests)))
+
+def run_async(requests, concurrency):
+    """Async views through the ASGI handler, on one event loop"""
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/summarize/", request_body(i), content_type="application/json")
+                return response.status_code, time.perf_counter() - start
+
+        try:
+            return await asyncio.gather(*(send(i) for i in range(requests)))
+        finally:
+            from api.ai_utils import get_async_session
+            await get_async_session().close()
+
+    return asyncio.run(main())
+
+def child(args):
+    """Run one mode in this interpreter and print its statistics as JSON"""
+    from django.conf import settings
+    settings.DATABASES["default"]["NAME"] = os.path.join(args.directory, "benchmark.sqlite3")
+    settings.LOGGING = {"version": 1, "disable_existing_loggers": False}
+    import django
+    django.setup()
+
+    start = time.perf_counter()
+    with ThreadCounter() as threads:
+        if args.child == "sync":
+            results = run_sync(args.requests, args.threads)
+        else:
+            results = run_async(args.requests, args.concurrency)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    print(json.dumps({
+        "ok": sum(1 for code, _ in results if code == 200),
+        "elapsed": elapsed,
+        "throughput": len(results) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "peak_threads": threads.peak,
+    }))
+
+def run_mode(mode, args, upstream, directory):
+    env = dict(
+        os.environ,
+        OPENROUTER_API_URL=upstream,
+        ASYNC_AI_VIEWS="true" if mode == "async" else "false",
+        LLM_CACHE_PATH=os.path.join(directory, f"llm_cache_{mode}.sqlite3"),
+        LLM_MAX_RETRIES="0",
+        # Room for a pooled upstream connection per thread
+        LLM_POOL_SIZE=str(args.threads),
+    )
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--directory", directory,
+               "--requests", str(args.requests), "--threads", str(args.threads),
+               "--concurrency", str(args.concurrency)]
+    result = subprocess.run(command, env=env, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f"{mode} run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="requests per mode (default 500)")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds the mock upstream takes to answer (default 1)")
+    parser.add_argument("--threads", type=int, default=50, help="request threads for the sync views (default 50)")
+    parser.add_argument("--concurrency", type=int, default=500, help="requests in flight for the async views (default 500)")
+    parser.add_argument("--mock-only", action="store_true", help="only run the mock upstream")
+    parser.add_argument("--port", type=int, default=0, help="mock upstream port (default: any free port)")
+    parser.add_argument("--child", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    upstream = start_upstream(args.port, args.delay)
+    if args.mock_only:
+        print(f"Mock OpenRouter listening on {upstream} (answers after {args.delay}s); Ctrl+C to stop")
+        threading.Event().wait()
+
+    print(f"{args.requests} summaries per mode, upstream answering after {args.delay}s")
+    print()
+    print(f"{'mode':<32} {'ok':>5} {'seconds':>8} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'threads':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, label in [("sync", f"sync views, {args.threads} threads"),
+                            ("async", f"async views, {args.concurrency} in flight")]:
+            stats = run_mode(mode, args, upstream, directory)
+            print(f"{label:<32} {stats['ok']:>5} {stats['elapsed']:>8.2f} {stats['throughput']:>8.1f} "
+                  f"{stats['p50']:>7.2f} {stats['p95']:>7.2f} {stats['peak_threads']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark /api/search/ with the inverted index on SQLite and with
+PostgreSQL full-text search.
+
+Usage (from the backend directory):
+
+    python benchmarks/search_backends.py --rows 20000
+    POSTGRES_DB=smart_notes POSTGRES_USER=smart_notes POSTGRES_PASSWORD=smart_notes \\
+        python benchmarks/search_backends.py --rows 20000
+
+Each backend gets a throwaway database with --rows notes and as many
+flashcards of generated text, indexed the way that backend indexes them,
+then the search endpoint is timed for one to three word queries. The
+PostgreSQL run needs the POSTGRES_* settings of a server to connect to
+(docker-compose.postgres.yml starts one) and works in a "test_" database
+next to POSTGRES_DB, dropped afterwards; without POSTGRES_DB only SQLite
+is measured. The project database is never touched.
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_note_organizer.settings")
+
+VOCABULARY = [f"word{i}" for i in range(5000)]
+
+def words(rng, count):
+    # Roughly Zipfian, so some terms are in most documents and most are rare
+    return " ".join(VOCABULARY[min(int(rng.paretovariate(1.0)) - 1, len(VOCABULARY) - 1)]
+                    for _ in range(count))
+
+def seed(rows):
+    """Bulk insert the notes and flashcards and index them; returns the seconds indexing took"""
+    from api.models import Note, Flashcard
+    from api import search_index
+
+    rng = random.Random(42)
+    notes = [Note(id=f"note-{i}", title=words(rng, 4), content=f"<p>{words(rng, 200)}</p>",
+                  summary=words(rng, 30), tags=words(rng, 3).split()) for i in range(rows)]
+    flashcards = [Flashcard(id=f"flashcard-{i}", title=words(rng, 4), question=words(rng, 15),
+                            answer=words(rng, 25), tags=words(rng, 3).split()) for i in range(rows)]
+    start = time.perf_counter()
+    Note.objects.bulk_create(notes, batch_size=1000)
+    Flashcard.objects.bulk_create(flashcards, batch_size=1000)
+    # bulk_create skips the signals; this is a no-op with the PostgreSQL backend
+    search_index.index_documents("note", notes)
+    search_index.index_documents("flashcard", flashcards)
+    return time.perf_counter() - start
+
+def queries(count):
+    rng = random.Random(7)
+    return [" ".join(rng.choice(VOCABULARY[:500]) for _ in range(rng.randint(1, 3))) for _ in range(count)]
+
+def time_search(count):
+    from django.test import Client
+
+    client = Client()
+    first, second, hits = [], [], 0
+    for query in queries(count):
+        start = time.perf_counter()
+        page = client.get("/api/search/", {"q": query, "limit": 20}).json()
+        first.append(time.perf_counter() - start)
+        hits += len(page["results"])
+        if page["next_cursor"]:
+            start = time.perf_counter()
+            client.get("/api/search/", {"q": query, "limit": 20, "cursor": page["next_cursor"]})
+            second.append(time.perf_counter() - start)
+    return first, second, hits
+
+def child(args):
+    """Run one backend in this interpreter and print its statistics as JSON"""
+    from django.conf import settings
+    settings.LOGGING = {"version": 1, "disable_existing_loggers": False}
+    if args.child == "sqlite":
+        from db_queries import setup_django
+        setup_django(os.path.join(args.directory, "search.sqlite3"))
+        from django.core.management import call_command
+        call_command("migrate", verbosity=0)
+    else:
+        import django
+        django.setup()
+        from django.db import connection
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+
+    try:
+        index_seconds = seed(args.rows)
+        first, second, hits = time_search(args.queries)
+    finally:
+        if args.child == "postgres":
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def ms(latencies, fraction):
+        return sorted(latencies)[max(int(len(latencies) * fraction) - 1, 0)] * 1000 if latencies else 0.0
+
+    print(json.dumps({
+        "index_seconds": index_seconds,
+        "p50": statistics.median(first) * 1000,
+        "p95": ms(first, 0.95),
+        "next_p50": statistics.median(second) * 1000 if second else 0.0,
+        "results": hits / len(first),
+    }))
+
+def run_backend(backend, args, directory):
+    env = dict(os.environ, SEARCH_BACKEND="index" if backend == "sqlite" else "postgres")
+    if backend == "sqlite":
+        env.pop("POSTGRES_DB", None)
+    command = [sys.executable, os.path.abspath(__file__), "--child", backend, "--directory", directory,
+               "--rows", str(args.rows), "--queries", str(args.queries)]
+    result = subprocess.run(command, env=env, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f"{backend} run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="notes, and flashcards, to search (default 20000)")
+    parser.add_argument("--queries", type=int, default=200, help="queries timed per backend (default 200)")
+    parser.add_argument("--child", choices=["sqlite", "postgres"], help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    backends = [("sqlite", "inverted index, SQLite")]
+    if os.getenv("POSTGRES_DB"):
+        backends.append(("postgres", "PostgreSQL full-text search"))
+    print(f"{args.rows} notes and {args.rows} flashcards, {args.queries} queries")
+    print()
+    print(f"{'backend':<30} {'index s':>8} {'p50 ms':>8} {'p95 ms':>8} {'page 2 p50':>11} {'results':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for backend, label in backends:
+            stats = run_backend(backend, args, directory)
+            print(f"{label:<30} {stats['index_seconds']:>8.1f} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+                  f"{stats['next_p50']:>11.1f} {stats['results']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
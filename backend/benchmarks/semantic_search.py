@@ -0,0 +1,103 @@
+"""
+Benchmark the semantic search scan: cosine top-k over the memory-mapped
+note embedding file.
+
+Usage (from the backend directory):
+
+    python benchmarks/semantic_search.py --rows 100000
+    python benchmarks/semantic_search.py --rows 100000 --model
+
+--rows random unit vectors of --dimension values (384, as the default
+all-MiniLM-L6-v2 model) are written to a throwaway embedding file, which is
+mapped and scanned for the --k nearest rows of random queries, as
+/api/search/?mode=semantic does. For comparison the same vectors are also
+stored as float16 and widened to float32 block by block while scanning.
+With --model the time to embed a query with EMBEDDING_MODEL is measured too
+(needs transformers and torch, and the model downloaded or cached).
+"""
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_note_organizer.settings")
+
+import numpy as np
+
+# Rows widened at a time in the float16 comparison
+BLOCK_ROWS = 16384
+
+def unit_vectors(rng, rows, dimension):
+    vectors = rng.standard_normal((rows, dimension), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def time_calls(function, queries):
+    """Milliseconds per call, after one warm-up call"""
+    function(queries[0])
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+    print(f"{label:<40} {statistics.median(latencies):>8.2f} {p95:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="embedded notes (default 100000)")
+    parser.add_argument("--dimension", type=int, default=384, help="embedding size (default 384)")
+    parser.add_argument("--k", type=int, default=20, help="results per query (default 20)")
+    parser.add_argument("--queries", type=int, default=100, help="queries timed (default 100)")
+    parser.add_argument("--model", action="store_true", help="also time embedding a query with EMBEDDING_MODEL")
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    from api.semantic_index import VectorFile, top_rows
+
+    rng = np.random.default_rng(42)
+    vectors = unit_vectors(rng, args.rows, args.dimension)
+    queries = list(unit_vectors(rng, args.queries, args.dimension))
+    count = args.k + 1
+
+    print(f"{args.rows} vectors of {args.dimension} values, top {args.k} of {args.queries} queries")
+    print()
+    print(f"{'':<40} {'p50 ms':>8} {'p95 ms':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        float32 = VectorFile(os.path.join(directory, "embeddings.f32"))
+        float32.write(range(args.rows), vectors)
+        matrix = float32.matrix(args.dimension)
+        report(f"float32 file ({matrix.nbytes / 2**20:.0f} MB)", time_calls(
+            lambda query: top_rows(float32.matrix(args.dimension), query, count), queries
+        ))
+
+        path = os.path.join(directory, "embeddings.f16")
+        vectors.astype(np.float16).tofile(path)
+        half = np.memmap(path, dtype=np.float16, mode="r", shape=(args.rows, args.dimension))
+
+        def scan_float16(query):
+            scores = np.empty(args.rows, dtype=np.float32)
+            for start in range(0, args.rows, BLOCK_ROWS):
+                scores[start:start + BLOCK_ROWS] = half[start:start + BLOCK_ROWS].astype(np.float32) @ query
+            rows = np.argpartition(-scores, count - 1)[:count]
+            return rows[np.argsort(-scores[rows])]
+
+        report(f"float16 file ({half.nbytes / 2**20:.0f} MB), widened", time_calls(scan_float16, queries))
+        del matrix, half
+
+    if args.model:
+        from api import semantic_index
+        texts = [f"How do neural networks learn representation number {i}?" for i in range(args.queries)]
+        report(f"embed query ({semantic_index.EMBEDDING_MODEL})",
+               time_calls(lambda text: semantic_index.embed_texts([text]), texts))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark concurrent note saves from several processes, as with several
+gunicorn or Uvicorn workers, with SQLite's defaults and with the tuned
+pragmas of settings.SQLITE_PRAGMAS.
+
+Usage (from the backend directory):
+
+    python benchmarks/sqlite_writers.py --writers 4 --notes 250 --readers 2
+
+For each mode a throwaway database is migrated, then --writers processes
+each create --notes notes through the ORM (so the search and tag index
+signals run too) while --readers processes keep listing the newest notes.
+Saves that fail, e.g. with "database is locked", are counted. The project
+database is never touched.
+"""
+import os
+import sys
+import argparse
+import tempfile
+import multiprocessing
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_note_organizer.settings")
+
+MODES = {
+    "default": {"SQLITE_TUNING": "false"},
+    "tuned": {"SQLITE_TUNING": "true"},
+}
+
+def setup(db_path, mode):
+    os.environ.update(MODES[mode])
+    from db_queries import setup_django
+    setup_django(db_path)
+
+def writer(db_path, mode, worker, notes, barrier, results):
+    setup(db_path, mode)
+    from django.db import OperationalError, connection, transaction
+    from api.models import Note
+
+    # Connect before the clock starts, like a worker that is already serving
+    connection.ensure_connection()
+    barrier.wait()
+    start = time.perf_counter()
+    saved = failed = 0
+    for i in range(notes):
+        try:
+            # One transaction per save, with its index updates, as the note endpoints do
+            with transaction.atomic():
+                Note.objects.create(
+                    id=f"note-{worker}-{i}", title=f"Note {i} from worker {worker}",
+                    content=f"<p>Saved by worker {worker}, note number {i}.</p>",
+                    tags=[f"worker-{worker}", "benchmark"],
+                )
+            saved += 1
+        except OperationalError:
+            failed += 1
+    results.put(("writer", saved, failed, time.perf_counter() - start))
+
+def reader(db_path, mode, stop, barrier, results):
+    setup(db_path, mode)
+    from django.db import OperationalError, connection
+    from api.models import Note
+
+    connection.ensure_connection()
+    barrier.wait()
+    reads = failed = 0
+    while not stop.is_set():
+        try:
+            list(Note.objects.order_by("-created_at", "-id")[:50])
+            reads += 1
+        except OperationalError:
+            failed += 1
+    results.put(("reader", reads, failed, None))
+
+def run(mode, args, directory):
+    db_path = os.path.join(directory, f"{mode}.sqlite3")
+    setup(db_path, mode)
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.writers + args.readers + 1)
+    stop = context.Event()
+    results = context.Queue()
+    writers = [context.Process(target=writer, args=(db_path, mode, worker, args.notes, barrier, results))
+               for worker in range(args.writers)]
+    readers = [context.Process(target=reader, args=(db_path, mode, stop, barrier, results))
+               for _ in range(args.readers)]
+    for process in writers + readers:
+        process.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    finished = [results.get() for _ in writers]
+    elapsed = time.perf_counter() - start
+    stop.set()
+    finished += [results.get() for _ in readers]
+    for process in writers + readers:
+        process.join()
+
+    saved = sum(row[1] for row in finished if row[0] == "writer")
+    return {
+        "saved": saved,
+        "failed": sum(row[2] for row in finished if row[0] == "writer"),
+        "writes_per_s": saved / elapsed,
+        "reads_per_s": sum(row[1] for row in finished if row[0] == "reader") / elapsed,
+        "read_errors": sum(row[2] for row in finished if row[0] == "reader"),
+        "elapsed": elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4, help="writer processes (default 4)")
+    parser.add_argument("--notes", type=int, default=250, help="notes saved per writer (default 250)")
+    parser.add_argument("--readers", type=int, default=2, help="reader processes listing notes meanwhile (default 2)")
+    parser.add_argument("--mode", choices=sorted(MODES), help="run one mode only")
+    args = parser.parse_args()
+
+    modes = [args.mode] if args.mode else list(MODES)
+    print(f"{args.writers} writers x {args.notes} notes, {args.readers} readers")
+    print()
+    print(f"{'mode':<10} {'saved':>7} {'failed':>7} {'seconds':>8} {'writes/s':>9} {'reads/s':>9} {'read errors':>12}")
+    for mode in modes:
+        # A fresh interpreter per mode, since the pragmas are read from the environment at settings import
+        if len(modes) > 1:
+            import subprocess
+            command = [sys.executable, os.path.abspath(__file__), "--mode", mode, "--writers", str(args.writers),
+                       "--notes", str(args.notes), "--readers", str(args.readers)]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            print(output.strip().splitlines()[-1])
+            continue
+        with tempfile.TemporaryDirectory() as directory:
+            stats = run(mode, args, directory)
+        print(f"{mode:<10} {stats['saved']:>7} {stats['failed']:>7} {stats['elapsed']:>8.2f} "
+              f"{stats['writes_per_s']:>9.1f} {stats['reads_per_s']:>9.1f} {stats['read_errors']:>12}")
+
+if __name__ == "__main__":
+    main()
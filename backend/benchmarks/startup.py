@@ -0,0 +1,126 @@
+"""
+Benchmark worker cold start: the time, memory and database queries it takes
+to set up Django and import the API's URLs and views.
+
+Usage (from the backend directory):
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --compare /tmp/before/backend
+
+To compare with an older revision, check it out next to this one first,
+e.g. `git worktree add /tmp/before <rev>`. Each run is a fresh interpreter
+pointed at a throwaway, migrated SQLite database; the project database is
+never touched. The slowest imports under `api` are listed from a
+`python -X importtime` run.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Optional parsers that only file uploads and imports need
+PARSER_MODULES = ["pytesseract", "PIL", "PyPDF2", "docx", "pptx"]
+
+# Run in a fresh interpreter inside the tree being measured
+CHILD = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_note_organizer.settings")
+from django.conf import settings
+settings.DATABASES["default"]["NAME"] = sys.argv[1]
+settings.LOGGING = {"version": 1, "disable_existing_loggers": False}
+import django
+django.setup()
+setup = time.perf_counter()
+if sys.argv[2] == "migrate":
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+    sys.exit()
+
+from django.db import connection
+queries = []
+with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+    import api.urls
+end = time.perf_counter()
+print(json.dumps({
+    "setup_ms": (setup - start) * 1000,
+    "import_ms": (end - setup) * 1000,
+    "total_ms": (end - start) * 1000,
+    "queries": len(queries),
+    "modules": len(sys.modules),
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "parsers": [name for name in %r if name in sys.modules],
+}))
+""" % (PARSER_MODULES,)
+
+def run_child(tree, db_path, mode, *flags):
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", CHILD, db_path, mode],
+        cwd=tree, capture_output=True, text=True, check=True,
+    )
+    return result
+
+def measure(tree, repeat):
+    """Median timings over repeat cold starts of tree, plus its slowest api imports"""
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "benchmark.sqlite3")
+        run_child(tree, db_path, "migrate")
+        runs = [json.loads(run_child(tree, db_path, "import").stdout.strip().splitlines()[-1])
+                for _ in range(repeat)]
+        importtime = run_child(tree, db_path, "import", "-X", "importtime").stderr
+
+    summary = {key: statistics.median(run[key] for run in runs)
+               for key in ("setup_ms", "import_ms", "total_ms", "queries", "modules", "max_rss_mb")}
+    summary["parsers"] = runs[0]["parsers"]
+
+    # -X importtime lines are "import time: self | cumulative | name"
+    imports = []
+    for line in importtime.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip().startswith("api."):
+            imports.append((int(parts[1]) / 1000, parts[2].strip()))
+    summary["api_imports"] = sorted(imports, reverse=True)
+    return summary
+
+def report(label, summary, top):
+    print(f"{label}:")
+    print(f"  django.setup()           {summary['setup_ms']:8.1f} ms")
+    print(f"  import api.urls          {summary['import_ms']:8.1f} ms")
+    print(f"  total                    {summary['total_ms']:8.1f} ms")
+    print(f"  queries during import    {summary['queries']:8.0f}")
+    print(f"  modules loaded           {summary['modules']:8.0f}")
+    print(f"  max RSS                  {summary['max_rss_mb']:8.1f} MB")
+    print(f"  parsers loaded           {', '.join(summary['parsers']) or 'none'}")
+    print(f"  slowest api imports (cumulative ms):")
+    for elapsed, name in summary["api_imports"][:top]:
+        print(f"    {elapsed:8.1f}  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--compare", metavar="BACKEND_DIR", help="backend directory of another revision to measure first")
+    parser.add_argument("--repeat", type=int, default=10, help="cold starts per tree (default 10)")
+    parser.add_argument("--top", type=int, default=8, help="api imports to list (default 8)")
+    args = parser.parse_args()
+
+    trees = [("before", os.path.abspath(args.compare))] if args.compare else []
+    trees.append(("current", BACKEND_DIR))
+    results = {}
+    for label, tree in trees:
+        results[label] = measure(tree, args.repeat)
+        report(f"{label} ({tree})", results[label], args.top)
+        print()
+
+    if args.compare:
+        before, after = results["before"], results["current"]
+        print(f"import api.urls: {before['import_ms']:.1f} -> {after['import_ms']:.1f} ms, "
+              f"max RSS: {before['max_rss_mb']:.1f} -> {after['max_rss_mb']:.1f} MB, "
+              f"queries: {before['queries']:.0f} -> {after['queries']:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""
+Production server: Uvicorn serving the ASGI application on port 8000.
+
+WEB_CONCURRENCY worker processes (default: one per CPU) each run one event
+loop. The AI endpoints are async there, so a worker keeps hundreds of
+OpenRouter calls in flight at once; the other endpoints are sync views,
+which asgi.py hands to Django's WSGI handler on WEB_THREADS threads per
+worker.
+
+Background jobs run in threads of the workers, so jobs left unfinished
+when the server last stopped are failed (manage.py recover_jobs) before
+the workers start.
+"""
+
+import os
+
+def recover_jobs():
+    """Fail the jobs lost when the server last stopped; skipped until the database is migrated"""
+    import django
+    from django.core.management import call_command
+    from django.db import DatabaseError, connections
+    
+    django.setup()
+    try:
+        call_command('recover_jobs')
+    except DatabaseError as e:
+        print(f"Skipping job recovery: {e}")
+    finally:
+        connections.close_all()
+
+def main():
+    """Run Uvicorn with several worker processes"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_note_organizer.settings')
+    
+    try:
+        import uvicorn
+    except ImportError as exc:
+        raise ImportError(
+            "Couldn't import uvicorn. Install it with `pip install uvicorn`."
+        ) from exc
+    
+    recover_jobs()
+    
+    uvicorn.run(
+        'smart_note_organizer.asgi:application',
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', 8000)),
+        workers=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)),
+        # Django does not implement the ASGI lifespan protocol
+        lifespan='off',
+        timeout_keep_alive=int(os.getenv('KEEP_ALIVE_TIMEOUT', 5)),
+        proxy_headers=True,
+    )
+
+if __name__ == '__main__':
+    main()
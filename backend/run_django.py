@@ -7,6 +7,20 @@ Custom Django server script that runs on port 8000 (Django's default port).
 import os
 import sys
 
+def recover_jobs():
+    """Fail the jobs lost when the server last stopped; skipped until the database is migrated"""
+    import django
+    from django.core.management import call_command
+    from django.db import DatabaseError, connections
+    
+    django.setup()
+    try:
+        call_command('recover_jobs')
+    except DatabaseError as e:
+        print(f"Skipping job recovery: {e}")
+    finally:
+        connections.close_all()
+
 def main():
     """Run Django server on port 8000"""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_note_organizer.settings')
@@ -18,6 +32,9 @@ def main():
             "Couldn't import Django. Are you sure it's installed?"
         ) from exc
         
+    # Background jobs run in the server process, so any left unfinished were lost when it last stopped
+    recover_jobs()
+    
     # Run on port 8000
     sys.argv = [sys.argv[0], 'runserver', '0.0.0.0:8000']
     execute_from_command_line(sys.argv)
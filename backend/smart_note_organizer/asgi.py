@@ -8,9 +8,43 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import asyncio
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_note_organizer.settings')
+# Route the AI endpoints to their async views, which wait on OpenRouter without holding a thread
+os.environ.setdefault('ASYNC_AI_VIEWS', 'true')
 
-application = get_asgi_application()
+# Threads per worker for the sync views; 0 leaves them to Django's ASGI handler
+WEB_THREADS = int(os.getenv('WEB_THREADS', 10))
+
+django_asgi = get_asgi_application()
+
+if WEB_THREADS > 0:
+    from a2wsgi import WSGIMiddleware
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import Resolver404, resolve
+
+    # Django's ASGI handler runs every sync view on one shared thread, so a
+    # worker would serve CRUD, search and uploads one request at a time.
+    # They go through the WSGI handler on a pool of threads instead.
+    django_wsgi = WSGIMiddleware(get_wsgi_application(), workers=WEB_THREADS)
+
+    def is_async_view(path):
+        try:
+            return asyncio.iscoroutinefunction(resolve(path).func)
+        except Resolver404:
+            return False
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'http':
+            path = scope['path']
+            root_path = scope.get('root_path', '')
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            if not is_async_view(path):
+                return await django_wsgi(scope, receive, send)
+        return await django_asgi(scope, receive, send)
+else:
+    application = django_asgi
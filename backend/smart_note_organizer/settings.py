@@ -32,6 +32,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '*']
 
+# Serve the AI endpoints with async views (asgi.py turns this on)
+ASYNC_AI_VIEWS = os.getenv('ASYNC_AI_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
 
 # Application definition
 
@@ -95,13 +98,64 @@ WSGI_APPLICATION = 'smart_note_organizer.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for several worker processes (see SQLITE_PRAGMAS); SQLITE_TUNING=false restores the defaults
+SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'true').lower() in ('1', 'true', 'yes')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # Same as django.db.backends.sqlite3, but transactions begin with BEGIN IMMEDIATE
+        'ENGINE': 'api.sqlite_backend' if SQLITE_TUNING else 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Pragmas api.db applies to every new SQLite connection. WAL lets readers
+# run alongside a writer, and the busy timeout makes concurrent writers from
+# several workers wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    # Negative sizes are in KiB
+    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', 20000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+} if SQLITE_TUNING else {}
+
+# Optional read-only connection for the search and list endpoints, on the
+# same file or on a replica of it kept up to date by other means
+if os.getenv('SQLITE_READ_ALIAS', 'false').lower() in ('1', 'true', 'yes'):
+    read_path = Path(os.getenv('SQLITE_READ_REPLICA', DATABASES['default']['NAME'])).resolve()
+    DATABASES['readonly'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"{read_path.as_uri()}?mode=ro",
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# PostgreSQL instead of SQLite when POSTGRES_DB is set, for installs that
+# outgrow one node (docker-compose.postgres.yml runs one locally)
+if os.getenv('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', 60)),
+        }
+    }
+
+# "index": the inverted index of api.search_index, on any database.
+# "postgres": PostgreSQL full-text search over the tsvector columns of migration 0010.
+SEARCH_BACKEND = os.getenv(
+    'SEARCH_BACKEND',
+    'postgres' if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' else 'index'
+)
+
+DATABASE_ROUTERS = ['api.db.ReadReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
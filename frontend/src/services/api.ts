@@ -100,6 +100,25 @@ export interface ApiResponse<T> {
   error?: string;
 }
 
+// Largest page the list endpoints return
+const LIST_PAGE_SIZE = 500;
+
+// Fetch every item of a paginated list, following next_cursor until it is null
+const fetchAllPages = async (url: string): Promise<any[]> => {
+  const items: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams({ limit: String(LIST_PAGE_SIZE) });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${url}?${params}`);
+    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+    const page = await response.json();
+    items.push(...page.results);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
+};
+
 // Search result interface for local search
 export interface SearchResultItem {
   id: string;
@@ -461,9 +480,7 @@ export const api = {
     }
 
     try {
-      const response = await fetch(`${API_BASE_URL}/notes/`);
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const rawData = await response.json();
+      const rawData = await fetchAllPages(`${API_BASE_URL}/notes/`);
       
       // Transform the raw data to match our Note interface
       const data = rawData.map((note: any) => ({
@@ -637,9 +654,7 @@ export const api = {
     }
 
     try {
-      const response = await fetch(`${API_BASE_URL}/flashcards/`);
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const rawData = await response.json();
+      const rawData = await fetchAllPages(`${API_BASE_URL}/flashcards/`);
       
       // Transform the raw data to match our AppFlashcard interface
       const data = rawData.map((card: any) => ({
@@ -1196,8 +1211,13 @@ export const api = {
         throw new Error(errorData.error || `Failed to save flashcards: ${response.status}`);
       }
       const data = await response.json();
+      // 207 Multi-Status when some cards were invalid: the saved ones are under created
+      const cards = Array.isArray(data) ? data : data.created;
+      if (!Array.isArray(data)) {
+        console.warn('Some flashcards were not saved:', data.errors);
+      }
       // Map backend response to AppFlashcard[]
-      const saved = data.map((card: any) => ({
+      const saved = cards.map((card: any) => ({
         id: card.id,
         front: card.question || card.front,
         back: card.answer || card.back,
@@ -1217,9 +1237,7 @@ export const api = {
     }
 
     try {
-      const response = await fetch(`${API_BASE_URL}/summaries/`);
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const rawData = await response.json();
+      const rawData = await fetchAllPages(`${API_BASE_URL}/summaries/`);
       
       // Transform the raw data to match our Summary interface
       const data = rawData.map((summary: any) => ({